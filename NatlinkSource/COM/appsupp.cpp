@@ -365,6 +365,11 @@ STDMETHODIMP CDgnAppSupport::UnRegister()
 {
 	OutputDebugString( TEXT( "CDgnAppSupport::UnRegister, calling natDisconnect" ) );
 
+	// we may have released the Python lock while idle (see
+	// CDragonCode::releasePythonIfIdle); it is not released again because
+	// the interpreter is finalized below
+	PyGILState_Ensure();
+
 	// simulate calling natlink.natDisconnect()
 	m_pDragCode->natDisconnect();
 
@@ -0,0 +1,211 @@
+/*
+ Python Macro Language for Dragon NaturallySpeaking
+	(c) Copyright 1999 by Joel Gould
+	Portions (c) Copyright 1999 by Dragon Systems, Inc.
+
+ CallbackStats.cpp
+	Latency histograms for the results callbacks.  Recording a value is a
+	few integer operations so the statistics are always collected.
+*/
+
+#include "stdafx.h"
+#include "CallbackStats.h"
+
+static const char * s_aStageNames[ STATS_STAGES ] = {
+	"sink", "queue", "callback", "total" };
+
+//---------------------------------------------------------------------------
+
+LONGLONG statsNow()
+{
+	LARGE_INTEGER liNow;
+	QueryPerformanceCounter( &liNow );
+	return liNow.QuadPart;
+}
+
+//---------------------------------------------------------------------------
+
+DWORD statsMicroseconds( LONGLONG qwFrom, LONGLONG qwTo )
+{
+	static LONGLONG s_qwFrequency = 0;
+	if( s_qwFrequency == 0 )
+	{
+		LARGE_INTEGER liFrequency;
+		QueryPerformanceFrequency( &liFrequency );
+		s_qwFrequency = liFrequency.QuadPart;
+	}
+
+	if( qwFrom == 0 || qwTo <= qwFrom )
+	{
+		return 0;
+	}
+
+	ULONGLONG qwMicroseconds =
+		(ULONGLONG)( qwTo - qwFrom ) * 1000000 / s_qwFrequency;
+	return qwMicroseconds > 0xFFFFFFFF ? 0xFFFFFFFF : (DWORD)qwMicroseconds;
+}
+
+//---------------------------------------------------------------------------
+// The bucket of a value: values below 2*STATS_SUBBUCKETS have their own
+// bucket, above that every power of two is split in STATS_SUBBUCKETS.
+
+static int bucketIndex( DWORD dwValue )
+{
+	if( dwValue < 2 * STATS_SUBBUCKETS )
+	{
+		return (int)dwValue;
+	}
+
+	int nShift = 0;
+	while( ( dwValue >> nShift ) >= 2 * STATS_SUBBUCKETS )
+	{
+		nShift += 1;
+	}
+	return ( nShift + 1 ) * STATS_SUBBUCKETS +
+		(int)( dwValue >> nShift ) - STATS_SUBBUCKETS;
+}
+
+// the highest value which falls in a bucket
+static DWORD bucketLimit( int nIndex )
+{
+	if( nIndex < 2 * STATS_SUBBUCKETS )
+	{
+		return (DWORD)nIndex;
+	}
+
+	int nShift = nIndex / STATS_SUBBUCKETS - 1;
+	ULONGLONG qwLow = (ULONGLONG)( STATS_SUBBUCKETS +
+		nIndex % STATS_SUBBUCKETS ) << nShift;
+	ULONGLONG qwHigh = qwLow + ( (ULONGLONG)1 << nShift ) - 1;
+	return qwHigh > 0xFFFFFFFF ? 0xFFFFFFFF : (DWORD)qwHigh;
+}
+
+/////////////////////////////////////////////////////////////////////////////
+//
+// CLatencyHistogram
+//
+
+void CLatencyHistogram::reset()
+{
+	m_nCount = 0;
+	m_qwTotal = 0;
+	m_dwMin = 0;
+	m_dwMax = 0;
+	memset( m_aBuckets, 0, sizeof( m_aBuckets ) );
+}
+
+//---------------------------------------------------------------------------
+
+void CLatencyHistogram::record( DWORD dwMicroseconds )
+{
+	if( m_nCount == 0 || dwMicroseconds < m_dwMin )
+	{
+		m_dwMin = dwMicroseconds;
+	}
+	if( dwMicroseconds > m_dwMax )
+	{
+		m_dwMax = dwMicroseconds;
+	}
+	m_nCount += 1;
+	m_qwTotal += dwMicroseconds;
+	m_aBuckets[ bucketIndex( dwMicroseconds ) ] += 1;
+}
+
+//---------------------------------------------------------------------------
+
+DWORD CLatencyHistogram::percentile( double dFraction )
+{
+	if( m_nCount == 0 )
+	{
+		return 0;
+	}
+
+	ULONGLONG qwTarget = (ULONGLONG)( dFraction * m_nCount + 0.999999 );
+	if( qwTarget == 0 )
+	{
+		qwTarget = 1;
+	}
+
+	ULONGLONG qwSeen = 0;
+	for( int i = 0; i < STATS_BUCKETS; i++ )
+	{
+		qwSeen += m_aBuckets[ i ];
+		if( qwSeen >= qwTarget )
+		{
+			DWORD dwLimit = bucketLimit( i );
+			return dwLimit > m_dwMax ? m_dwMax : dwLimit;
+		}
+	}
+	return m_dwMax;
+}
+
+//---------------------------------------------------------------------------
+
+PyObject * CLatencyHistogram::toPython()
+{
+	return Py_BuildValue(
+		"{s:k,s:k,s:k,s:k,s:k,s:k,s:k,s:k}",
+		"count", m_nCount,
+		"min", m_dwMin,
+		"max", m_dwMax,
+		"mean", m_nCount ? (DWORD)( m_qwTotal / m_nCount ) : 0,
+		"p50", percentile( 0.50 ),
+		"p90", percentile( 0.90 ),
+		"p99", percentile( 0.99 ),
+		"p999", percentile( 0.999 ) );
+}
+
+/////////////////////////////////////////////////////////////////////////////
+//
+// CCallbackStats
+//
+
+void CCallbackStats::reset()
+{
+	for( int i = 0; i < STATS_STAGES; i++ )
+	{
+		m_aStages[ i ].reset();
+	}
+}
+
+//---------------------------------------------------------------------------
+
+void CCallbackStats::record(
+	LONGLONG qwPhraseFinish, LONGLONG qwPosted, LONGLONG qwBegin,
+	LONGLONG qwEnd, LONGLONG qwReleased )
+{
+	m_aStages[ STATS_SINK ].record(
+		statsMicroseconds( qwPhraseFinish, qwPosted ) );
+	m_aStages[ STATS_QUEUE ].record(
+		statsMicroseconds( qwPosted, qwBegin ) );
+	m_aStages[ STATS_CALLBACK ].record(
+		statsMicroseconds( qwBegin, qwEnd ) );
+	m_aStages[ STATS_TOTAL ].record(
+		statsMicroseconds( qwPhraseFinish, qwReleased ) );
+}
+
+//---------------------------------------------------------------------------
+
+PyObject * CCallbackStats::toPython()
+{
+	PyObject * pDict = PyDict_New();
+	if( pDict == NULL )
+	{
+		return NULL;
+	}
+
+	for( int i = 0; i < STATS_STAGES; i++ )
+	{
+		PyObject * pStage = m_aStages[ i ].toPython();
+		if( pStage == NULL ||
+			PyDict_SetItemString( pDict, s_aStageNames[ i ], pStage ) < 0 )
+		{
+			Py_XDECREF( pStage );
+			Py_DECREF( pDict );
+			return NULL;
+		}
+		Py_DECREF( pStage );
+	}
+
+	return pDict;
+}
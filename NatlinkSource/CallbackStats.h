@@ -0,0 +1,81 @@
+/*
+ Python Macro Language for Dragon NaturallySpeaking
+	(c) Copyright 1999 by Joel Gould
+	Portions (c) Copyright 1999 by Dragon Systems, Inc.
+
+ CallbackStats.h
+	Latency histograms for the results callbacks, returned to Python by
+	natlink.getCallbackStats.
+*/
+
+// the stages of a results callback which are timed
+#define STATS_SINK		0	// PhraseFinish until the callback is posted
+#define STATS_QUEUE		1	// posted until the Python callback starts
+#define STATS_CALLBACK	2	// the Python callback itself
+#define STATS_TOTAL		3	// PhraseFinish until the recognizer is released
+#define STATS_STAGES	4
+
+// The histograms have 16 buckets for every power of two microseconds (all
+// values below 32 microseconds have a bucket of their own), so a
+// percentile is off by at most 1/16.  Values up to 2^32 microseconds (more
+// than an hour) fit.
+#define STATS_SUBBUCKETS	16
+#define STATS_BUCKETS		464
+
+// returns the current time of the monotonic performance counter
+LONGLONG statsNow();
+
+// returns the number of microseconds between two statsNow times
+DWORD statsMicroseconds( LONGLONG qwFrom, LONGLONG qwTo );
+
+//---------------------------------------------------------------------------
+
+class CLatencyHistogram
+{
+ public:
+	CLatencyHistogram() { reset(); }
+
+	void reset();
+	void record( DWORD dwMicroseconds );
+
+	// returns a dictionary with the count, minimum, maximum, mean and the
+	// percentiles p50, p90, p99 and p999 (all in microseconds), or NULL
+	// after a Python error
+	PyObject * toPython();
+
+	DWORD count() { return m_nCount; }
+
+ protected:
+	DWORD percentile( double dFraction );
+
+	DWORD m_nCount;
+	ULONGLONG m_qwTotal;
+	DWORD m_dwMin;
+	DWORD m_dwMax;
+	DWORD m_aBuckets[ STATS_BUCKETS ];
+};
+
+//---------------------------------------------------------------------------
+
+class CCallbackStats
+{
+ public:
+	void reset();
+
+	// records the times of one results callback; qwPhraseFinish is when
+	// PhraseFinish arrived, qwPosted when the callback was posted,
+	// qwBegin and qwEnd bracket the Python callback and qwReleased is when
+	// the recognizer was released
+	void record(
+		LONGLONG qwPhraseFinish, LONGLONG qwPosted, LONGLONG qwBegin,
+		LONGLONG qwEnd, LONGLONG qwReleased );
+
+	// returns a dictionary with one entry per stage ('sink', 'queue',
+	// 'callback', 'total') or NULL after a Python error
+	PyObject * toPython();
+
+	DWORD count() { return m_aStages[ STATS_TOTAL ].count(); }
+
+ protected:
+	CLatencyHistogram m_aStages[ STATS_STAGES ];
+};
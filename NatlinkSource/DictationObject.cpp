@@ -13,6 +13,7 @@
 #include "DictationObject.h"
 #include "ResultObject.h"
 #include "Exceptions.h"
+#include "WideString.h"
 #include <string>
 
 // We use this macro to make sure the dictation object is usable
@@ -188,7 +189,9 @@ STDMETHODIMP CVDct0NotifySink::TextSelChanged()
 	m_pParent->m_pDragCode->logMessage("+ CVDct0NotifySink::TextSelChanged\n");
 	if( m_pParent )
 	{
+		PyGILState_STATE gstate = PyGILState_Ensure();
 		m_pParent->TextSelChanged();
+		PyGILState_Release( gstate );
 	}
 
 	m_pParent->m_pDragCode->logMessage("- CVDct0NotifySink::TextSelChanged\n");
@@ -206,7 +209,9 @@ STDMETHODIMP CVDct0NotifySink::TextChanged( DWORD dwReason )
 	m_pParent->m_pDragCode->logMessage("+ CVDct0NotifySink::TextChanged\n");
 	if( m_pParent )
 	{
+		PyGILState_STATE gstate = PyGILState_Ensure();
 		m_pParent->TextChanged( dwReason );
+		PyGILState_Release( gstate );
 	}
 
 	m_pParent->m_pDragCode->logMessage("- CVDct0NotifySink::TextChanged\n");
@@ -224,7 +229,9 @@ STDMETHODIMP CVDct0NotifySink::JITPause()
 	m_pParent->m_pDragCode->logMessage("+ CVDct0NotifySink::JITPause\n");
 	if( m_pParent )
 	{
+		PyGILState_STATE gstate = PyGILState_Ensure();
 		m_pParent->JITPause();
+		PyGILState_Release( gstate );
 	}
 
 	m_pParent->m_pDragCode->logMessage("- CVDct0NotifySink::JITPause\n");
@@ -573,19 +580,7 @@ PyObject * CDictationObject::getText(int nStart, int nEnd )
 	}
 	else
 	{
-		#ifdef UNICODE
-			int size_needed = ::WideCharToMultiByte( CP_UTF8, 0, (wchar_t *)sData.pData, -1, NULL, 0,  NULL, NULL);
-			char * pDataA = new char[ size_needed ];
-			::WideCharToMultiByte( CP_UTF8, 0, (wchar_t *)sData.pData, -1, pDataA, size_needed, NULL, NULL );
-
-			PyObject * pRetn = Py_BuildValue( "s", pDataA );
-
-			if ( pDataA )
-				delete [] pDataA;
-
-		#else
-			PyObject * pRetn = Py_BuildValue( "s", (char *)(sData.pData) );
-		#endif
+		PyObject * pRetn = pyStringFromWide( (const wchar_t *)sData.pData );
 		CoTaskMemFree( sData.pData );
 		return pRetn;
 	}
@@ -770,23 +765,13 @@ BOOL CDictationObject::TextChanged(DWORD dwReason )
 		}
 		else
 		{
-			#ifdef UNICODE
+			if( g_nDebugLevel >= DEBUGLEVEL_ARGS )
+			{
 				OutputDebugString((std::wstring(L"CDictationObject::TextChanged ")+(wchar_t *)sData.pData).c_str() );
-				int size_needed = ::WideCharToMultiByte( CP_UTF8, 0, (wchar_t *)sData.pData, -1, NULL, 0,  NULL, NULL);
-				char * pDataA = new char[ size_needed ];
-				::WideCharToMultiByte( CP_UTF8, 0, (wchar_t *)sData.pData, -1, pDataA, size_needed, NULL, NULL );
-
-				pArgs = Py_BuildValue( "(iisii)",
-					dwOldStart, dwOldEnd, pDataA,
-					dwSelStart, dwSelStart+dwSelCount );
-				if ( pDataA )
-					delete [] pDataA;
-
-			#else
-				pArgs = Py_BuildValue( "(iisii)",
-					dwOldStart, dwOldEnd, (char *)sData.pData,
-					dwSelStart, dwSelStart+dwSelCount );
-			#endif
+			}
+			pArgs = Py_BuildValue( "(iiNii)",
+				dwOldStart, dwOldEnd, pyStringFromWide( (const wchar_t *)sData.pData ),
+				dwSelStart, dwSelStart+dwSelCount );
 			CoTaskMemFree( sData.pData );
 		}
 	}
@@ -797,6 +782,13 @@ BOOL CDictationObject::TextChanged(DWORD dwReason )
 		pArgs = Py_BuildValue( "(iisii)",
 			dwOldStart, dwOldEnd, "", dwSelStart, dwSelStart+dwSelCount );
 	}
+	if( pArgs == NULL )
+	{
+		// the changed text could not be converted, there is nobody to
+		// raise the exception to
+		PyErr_Print();
+		return FALSE;
+	}
 
 	// now make the callback (this calls DECREF on pArgs)
 	m_pDragCode->makeResultsCallback( m_pChangeCallback, pArgs );
@@ -119,6 +119,7 @@
 
 #include "stdafx.h"
 #include "Resource.h"
+#include "CallbackStats.h"
 #include "DragonCode.h"
 #include "GrammarObject.h"
 #include "ResultObject.h"
@@ -184,8 +185,9 @@ class CInFunction
 
 //---------------------------------------------------------------------------
 // This class is used to ensure that we aquire the Python global lock around
-// callbacks.  We do nothing is pThreadState is NULL which means that we are
-// not supporting threads.
+// callbacks.  If pThreadState is NULL we are not supporting threads; we
+// then normally already hold the lock (PyGILState_Ensure does nothing) but
+// not after releasePythonIfIdle released it.
 
 class CLockPython
 {
@@ -196,6 +198,10 @@ class CLockPython
 		{
 			PyEval_AcquireThread( m_pThreadState );
 		}
+		else
+		{
+			m_gstate = PyGILState_Ensure();
+		}
 	}
 
 	~CLockPython() {
@@ -203,10 +209,37 @@ class CLockPython
 		{
 			PyEval_ReleaseThread( m_pThreadState );
 		}
+		else
+		{
+			PyGILState_Release( m_gstate );
+		}
 	}
 
  protected:
 	PyThreadState * m_pThreadState;
+	PyGILState_STATE m_gstate;
+};
+
+//---------------------------------------------------------------------------
+// This class calls releasePythonIfIdle when our message window procedure
+// returns, after the CLockPython of the message is gone.
+
+class CReleaseIfIdle
+{
+ public:
+	CReleaseIfIdle( HWND hwnd ) {
+		m_pDragCode = (CDragonCode *)GetWindowLong( hwnd, 0 );
+	}
+
+	~CReleaseIfIdle() {
+		if( m_pDragCode )
+		{
+			m_pDragCode->releasePythonIfIdle();
+		}
+	}
+
+ protected:
+	CDragonCode * m_pDragCode;
 };
 
 //---------------------------------------------------------------------------
@@ -251,9 +284,46 @@ class CLockPython
 // For the tray icon
 #define WM_TRAYICON (WM_USER+352)
 
+// For when we should check the results filter of a grammar which only wants
+// the results of some other grammars
+#define WM_FILTERRESULTS (WM_USER+353)
+
+// For when we should send results callback of a grammar with asynchronous
+// results
+#define WM_SENDASYNCRESULTS (WM_USER+354)
+
+// For when a thread has called postWakeup
+#define WM_WAKEUP (WM_USER+355)
+
+// For when a script of execScriptAsync changes its status (see
+// ExecutionStatus); when it is done we get WM_EXECUTION
+#define WM_EXECUTIONSTATUS (WM_USER+356)
+
+//---------------------------------------------------------------------------
+// A results callback which has been posted to our message window (the
+// wParam of WM_SENDRESULTS and WM_SENDASYNCRESULTS).  We hold references
+// to the callback and the grammar object until the message arrives.
+
+struct CResultsCall
+{
+	PyObject * pFunc;
+	PyObject * pArgs;
+	CGrammarObject * pGramObj;		// NULL when we do not keep statistics
+	LONGLONG qwPhraseFinish;
+	LONGLONG qwPosted;
+	DWORD dwUtterance;				// see m_dwUtteranceCount
+};
+
 // These are the bits for m_dwPendingCallback
 #define PENDING_SPEAKER	0x0001
 #define PENDING_MICSTATE 0x0002
+#define PENDING_TIMER	0x0004
+#define PENDING_WAKEUP	0x0008
+#define PENDING_EXECUTION 0x0010
+
+// the client codes of execScript and execScriptAsync, which share the
+// WM_EXECUTION message
+static DWORD s_dwScriptCode = 1;
 
 // invalid flag for testFileName
 #define INVALID_WAVEFILE 0xFFFFFFFF
@@ -474,7 +544,12 @@ STDMETHODIMP CDgnSSvcActionNotifySink::ExecutionStatus(
 	m_pParent->logMessage("+ CDgnSSvcActionNotifySink::ExecutionStatus\n");
 	if( dwStatus != 0 && m_pParent )
 	{
+		PyGILState_STATE gstate = PyGILState_Ensure();
 		m_pParent->resetPauseRecog();
+		PyGILState_Release( gstate );
+
+		// for execScriptAsync, which tells Python about it
+		m_pParent->postMessage( WM_EXECUTIONSTATUS, dwClientCode, dwStatus );
 	}
 	m_pParent->logMessage("- CDgnSSvcActionNotifySink::ExecutionStatus\n");
 	return S_OK;
@@ -577,6 +652,7 @@ LRESULT CALLBACK hiddenWndProc(
 	HWND hwnd, UINT uMsg, WPARAM wParam, LPARAM lParam )
 {
 	CDragonCode * pDragCode;
+	CReleaseIfIdle cReleaseIfIdle( hwnd );
 
 	switch( uMsg )
 	{
@@ -625,12 +701,47 @@ LRESULT CALLBACK hiddenWndProc(
 		pDragCode->logMessage("- hiddenWndProc WM_SENDRESULTS\n");
 		return 0;
 
+	 case WM_FILTERRESULTS:
+		pDragCode = (CDragonCode *)GetWindowLong( hwnd, 0 );
+		pDragCode->logMessage("+ hiddenWndProc WM_FILTERRESULTS\n");
+		if( pDragCode )
+		{
+			CLockPython cLockPython( pDragCode->getThreadState() );
+			pDragCode->onFilterResults( wParam, lParam );
+		}
+		pDragCode->logMessage("- hiddenWndProc WM_FILTERRESULTS\n");
+		return 0;
+
+	 case WM_SENDASYNCRESULTS:
+		pDragCode = (CDragonCode *)GetWindowLong( hwnd, 0 );
+		pDragCode->logMessage("+ hiddenWndProc WM_SENDASYNCRESULTS\n");
+		if( pDragCode )
+		{
+			CLockPython cLockPython( pDragCode->getThreadState() );
+			pDragCode->onSendAsyncResults( wParam, lParam );
+		}
+		pDragCode->logMessage("- hiddenWndProc WM_SENDASYNCRESULTS\n");
+		return 0;
+
 	 case WM_PLAYBACK:
+		pDragCode = (CDragonCode *)GetWindowLong( hwnd, 0 );
+		pDragCode->logMessage("+ hiddenWndProc WM_PLAYBACK\n");
+		// this is handled in its message loop
+		pDragCode->logMessage("- hiddenWndProc WM_PLAYBACK\n");
+		return 0;
+
 	 case WM_EXECUTION:
+	 case WM_EXECUTIONSTATUS:
 		pDragCode = (CDragonCode *)GetWindowLong( hwnd, 0 );
-		pDragCode->logMessage("+ hiddenWndProc WM_PLAYBACK/WM_EXECUTION\n");
-		// these are handled in their respective message loops
-		pDragCode->logMessage("- hiddenWndProc WM_PLAYBACK/WM_EXECUTION\n");
+		pDragCode->logMessage("+ hiddenWndProc WM_EXECUTION/WM_EXECUTIONSTATUS\n");
+		// the scripts of execScript are handled in their message loop,
+		// onExecution only looks at those of execScriptAsync
+		if( pDragCode )
+		{
+			CLockPython cLockPython( pDragCode->getThreadState() );
+			pDragCode->onExecution( uMsg, wParam, lParam );
+		}
+		pDragCode->logMessage("- hiddenWndProc WM_EXECUTION/WM_EXECUTIONSTATUS\n");
 		return 0;
 
 	 case WM_TIMER:
@@ -644,6 +755,17 @@ LRESULT CALLBACK hiddenWndProc(
 		pDragCode->logMessage("- hiddenWndProc WM_TIMER\n");
 		return 0;
 
+	 case WM_WAKEUP:
+		pDragCode = (CDragonCode *)GetWindowLong( hwnd, 0 );
+		pDragCode->logMessage("+ hiddenWndProc WM_WAKEUP\n");
+		if( pDragCode )
+		{
+			CLockPython cLockPython( pDragCode->getThreadState() );
+			pDragCode->onWakeup();
+		}
+		pDragCode->logMessage("- hiddenWndProc WM_WAKEUP\n");
+		return 0;
+
 	 case WM_TRAYICON:
 		pDragCode = (CDragonCode *)GetWindowLong( hwnd, 0 );
 		pDragCode->logMessage("+ hiddenWndProc WM_TRAYICON\n");
@@ -703,6 +825,10 @@ void CDragonCode::freeModule()
 
 void CDragonCode::releaseObjects()
 {
+	// the shared results object is released like all the others below
+	clearSharedResObj();
+	clearResultsWinner();
+
 	// iterate over all the grammar objects and free them; note that when we
 	// call unload on a grammar object, the first grammar object in our
 	// linked list changes
@@ -784,6 +910,11 @@ void CDragonCode::doPausedProcessing( QWORD dwCookie )
 	HRESULT rc;
 
 	logCookie("enter doPausedProcessing",dwCookie);
+
+	// a new recognition is starting, all grammars are done with the
+	// results of the previous one
+	clearSharedResObj();
+
 	// Note: we ignore recognitions which occur during our initialization
 
 	if( !m_bDuringInit )
@@ -948,6 +1079,100 @@ void CDragonCode::removeResObj(CResultObject * pResObj )
 
 //---------------------------------------------------------------------------
 
+CResultObject * CDragonCode::getSharedResObj( LPUNKNOWN pIUnknown )
+{
+	// two interface pointers belong to the same COM object when their
+	// IUnknown pointers are the same
+
+	IUnknown * pIdentity = NULL;
+	HRESULT rc = pIUnknown->QueryInterface(
+		__uuidof(IUnknown), (void**)&pIdentity );
+	if( FAILED(rc) )
+	{
+		return NULL;
+	}
+
+	if( m_pSharedResObj != NULL &&
+		m_pSharedResUnknown == pIdentity &&
+		m_pSharedResObj->m_pISRResBasic != NULL )
+	{
+		pIdentity->Release();
+		Py_INCREF( (PyObject *)m_pSharedResObj );
+		return m_pSharedResObj;
+	}
+
+	clearSharedResObj();
+
+	CResultObject * pObj = resobj_new();
+	if( pObj == NULL || !pObj->create( this, pIUnknown ) )
+	{
+		Py_XDECREF( (PyObject *)pObj );
+		pIdentity->Release();
+		return NULL;
+	}
+
+	// we keep the reference from QueryInterface in m_pSharedResUnknown
+	m_pSharedResObj = pObj;
+	m_pSharedResUnknown = pIdentity;
+	m_dwUtteranceCount += 1;
+
+	Py_INCREF( (PyObject *)pObj );
+	return pObj;
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::clearSharedResObj()
+{
+	if( m_pSharedResObj )
+	{
+		PyObject * pResObj = (PyObject *)m_pSharedResObj;
+		m_pSharedResObj = NULL;
+		Py_DECREF( pResObj );
+	}
+
+	if( m_pSharedResUnknown )
+	{
+		m_pSharedResUnknown->Release();
+		m_pSharedResUnknown = NULL;
+	}
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::clearResultsWinner()
+{
+	if( m_pWinnerResUnknown )
+	{
+		m_pWinnerResUnknown->Release();
+		m_pWinnerResUnknown = NULL;
+	}
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::setResultsWinner( LPUNKNOWN pIUnknown, GUID & guidGrammar )
+{
+	IUnknown * pIdentity = NULL;
+	HRESULT rc = pIUnknown->QueryInterface(
+		__uuidof(IUnknown), (void**)&pIdentity );
+	if( FAILED(rc) )
+	{
+		return;
+	}
+
+	// the winner is kept when the shared results object is rebuilt, a
+	// grammar with a results filter may still need it; it is only replaced
+	// by the winner of the next recognition
+	clearResultsWinner();
+
+	// we keep the reference from QueryInterface
+	m_pWinnerResUnknown = pIdentity;
+	m_guidWinner = guidGrammar;
+}
+
+//---------------------------------------------------------------------------
+
 void CDragonCode::addDictObj(CDictationObject * pDictObj )
 {
 	assert( pDictObj != NULL );
@@ -1007,10 +1232,26 @@ void CDragonCode::makeCallback( PyObject *pFunc, PyObject *pArgs )
 	// This procedure requires Python's GIL to be held.
 	PyGILState_STATE gstate = PyGILState_Ensure();
 
+	// remember what the outermost callback is, for getCallbackInfo
+	if( m_nCallbackDepth == 0 )
+	{
+		m_qwCallbackStart = statsNow();
+		m_dwCallbackSerial += 1;
+		m_dwCallbackThread = GetCurrentThreadId();
+		Py_XINCREF( pFunc );
+		m_pCallbackFunc = pFunc;
+	}
+
 	m_nCallbackDepth += 1;
 	PyObject * pRetn = PyEval_CallObject( pFunc, pArgs );
 	m_nCallbackDepth -= 1;
 
+	if( m_nCallbackDepth == 0 )
+	{
+		Py_XDECREF( m_pCallbackFunc );
+		m_pCallbackFunc = NULL;
+	}
+
 	if( PyErr_Occurred() )
 	{
 		PyErr_Print();
@@ -1034,6 +1275,35 @@ void CDragonCode::makeCallback( PyObject *pFunc, PyObject *pArgs )
 			m_dwPendingCallback &= ~PENDING_MICSTATE;
 			onAttribChanged( DGNSRAC_MICSTATE );
 		}
+		// a timer tick which came during the callback is not lost but
+		// delivered after the current message
+		if( ( m_dwPendingCallback & PENDING_TIMER ) == PENDING_TIMER )
+		{
+			m_dwPendingCallback &= ~PENDING_TIMER;
+			postMessage( WM_TIMER, m_nTimer, 0 );
+		}
+		// the same for a wakeup, unless the callback has been cleared since;
+		// a wakeup which is already on its way is enough
+		if( ( m_dwPendingCallback & PENDING_WAKEUP ) == PENDING_WAKEUP )
+		{
+			m_dwPendingCallback &= ~PENDING_WAKEUP;
+			if( m_pWakeupCallback &&
+				InterlockedExchange( &m_lWakeupPosted, 1 ) == 0 )
+			{
+				postMessage( WM_WAKEUP, 0, 0 );
+			}
+		}
+		// and for the scripts of execScriptAsync
+		if( ( m_dwPendingCallback & PENDING_EXECUTION ) == PENDING_EXECUTION )
+		{
+			m_dwPendingCallback &= ~PENDING_EXECUTION;
+			for( size_t i = 0; i < m_vPendingExecution.size(); i++ )
+			{
+				const MSG & msg = m_vPendingExecution[i];
+				postMessage( msg.message, msg.wParam, msg.lParam );
+			}
+			m_vPendingExecution.clear();
+		}
 	}
 
 	PyGILState_Release( gstate );
@@ -1046,6 +1316,7 @@ void CDragonCode::makeCallback( PyObject *pFunc, PyObject *pArgs )
 LPARAM CDragonCode::messageLoop( UINT message, WPARAM wParam )
 {
 	MY_BEGIN_ALLOW_THREADS
+	m_nMessageLoopDepth += 1;
 
 	// Create a message stack entry
 	m_pMessageStack = new CMessageStack( message, wParam, m_pMessageStack );
@@ -1084,6 +1355,7 @@ LPARAM CDragonCode::messageLoop( UINT message, WPARAM wParam )
 		}
 	}
 
+	m_nMessageLoopDepth -= 1;
 	MY_END_ALLOW_THREADS
 
 	return lParam;
@@ -1190,13 +1462,102 @@ void CDragonCode::onTimer()
 		}
 	}
 
-	// make the Python callback (if we are not in another callback)
+	// make the Python callback (if we are not in another callback, then
+	// we make it when that callback is done)
 
 	else
 	if( m_nCallbackDepth == 0 )
 	{
 		makeCallback( m_pTimerCallback, Py_BuildValue( "()" ) );
 	}
+	else
+	{
+		m_dwPendingCallback |= PENDING_TIMER;
+	}
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::onWakeup()
+{
+	// a postWakeup from now on needs a new message, also when it comes
+	// from the callback itself
+	InterlockedExchange( &m_lWakeupPosted, 0 );
+
+	if( !m_pWakeupCallback )
+	{
+		return;
+	}
+
+	// like the timer, a wakeup during another callback is delivered when
+	// that callback is done
+	if( m_nCallbackDepth == 0 )
+	{
+		makeCallback( m_pWakeupCallback, Py_BuildValue( "()" ) );
+	}
+	else
+	{
+		m_dwPendingCallback |= PENDING_WAKEUP;
+	}
+}
+
+//---------------------------------------------------------------------------
+// WM_EXECUTION (posted by ExecutionDone and ExecutionAborted) and
+// WM_EXECUTIONSTATUS; wParam is the client code of the script.
+
+void CDragonCode::onExecution( UINT message, WPARAM wParam, LPARAM lParam )
+{
+	DWORD dwClientCode = (DWORD)wParam;
+
+	// not one of ours: the message loop of execScript takes care of it
+	if( m_setAsyncScripts.find( dwClientCode ) == m_setAsyncScripts.end() )
+	{
+		return;
+	}
+
+	// like the timer, this is delivered when the other callback is done
+	if( m_nCallbackDepth )
+	{
+		MSG msg = { 0 };
+		msg.message = message;
+		msg.wParam = wParam;
+		msg.lParam = lParam;
+		m_vPendingExecution.push_back( msg );
+		m_dwPendingCallback |= PENDING_EXECUTION;
+		return;
+	}
+
+	PyObject * pArgs;
+	if( message == WM_EXECUTIONSTATUS )
+	{
+		pArgs = Py_BuildValue( "(isii)", dwClientCode, "status", (int)lParam, 0 );
+	}
+	else
+	{
+		// the script is done; ExecutionAborted allocated two DWORDs with
+		// the error code and the line number
+		m_setAsyncScripts.erase( dwClientCode );
+		DWORD * pErrorInfo = (DWORD *)lParam;
+		if( pErrorInfo )
+		{
+			pArgs = Py_BuildValue( "(isii)", dwClientCode, "aborted",
+				pErrorInfo[0], pErrorInfo[1] );
+			delete [] pErrorInfo;
+		}
+		else
+		{
+			pArgs = Py_BuildValue( "(isii)", dwClientCode, "done", 0, 0 );
+		}
+	}
+
+	if( m_pExecutionCallback )
+	{
+		makeCallback( m_pExecutionCallback, pArgs );
+	}
+	else
+	{
+		Py_XDECREF( pArgs );
+	}
 }
 
 //---------------------------------------------------------------------------
@@ -1228,6 +1589,8 @@ void CDragonCode::onMenuCommand( WPARAM wParam )
 		setChangeCallback( Py_None );
 		setBeginCallback( Py_None );
 		setTimerCallback( Py_None );
+		setWakeupCallback( Py_None );
+		setExecutionCallback( Py_None );
 		setTrayIcon( "", "", Py_None );
 
 		// note: we do not release objects here any more because it
@@ -1276,27 +1639,177 @@ void CDragonCode::onTrayIcon( WPARAM wParam, LPARAM lParam )
 
 void CDragonCode::onSendResults( WPARAM wParam, LPARAM lParam )
 {
-	PyObject *pFunc = (PyObject *)wParam;
-	PyObject *pArgs = (PyObject *)lParam;
-	assert( pFunc );
-	assert( pArgs );
+	CResultsCall * pCall = (CResultsCall *)wParam;
+	assert( pCall );
 
 	// makeCallback calls DECREF on pArgs
-	makeCallback( pFunc, pArgs );
+	LONGLONG qwBegin = statsNow();
+	m_dwCallbackUtterance = pCall->dwUtterance;
+	makeCallback( pCall->pFunc, pCall->pArgs );
+	m_dwCallbackUtterance = 0;
+	LONGLONG qwEnd = statsNow();
 
 	// now that results are processed, we can resume recognitions
 	resetPauseRecog();
+
+	finishResultsCall( pCall, qwBegin, qwEnd, statsNow() );
+}
+
+//---------------------------------------------------------------------------
+
+CResultsCall * CDragonCode::newResultsCall(
+	PyObject *pFunc, PyObject *pArgs,
+	CGrammarObject * pGramObj, LONGLONG qwPhraseFinish )
+{
+	CResultsCall * pCall = new CResultsCall;
+	pCall->pFunc = pFunc;
+	pCall->pArgs = pArgs;
+	pCall->pGramObj = qwPhraseFinish ? pGramObj : NULL;
+	pCall->qwPhraseFinish = qwPhraseFinish;
+	pCall->qwPosted = statsNow();
+	pCall->dwUtterance = pGramObj ? m_dwUtteranceCount : 0;
+
+	Py_XINCREF( pFunc );
+	Py_XINCREF( (PyObject *)pCall->pGramObj );
+	return pCall;
 }
 
 //---------------------------------------------------------------------------
 
-void CDragonCode::makeResultsCallback( PyObject *pFunc, PyObject *pArgs )
+void CDragonCode::finishResultsCall(
+	CResultsCall * pCall, LONGLONG qwBegin, LONGLONG qwEnd,
+	LONGLONG qwReleased )
+{
+	if( pCall->pGramObj )
+	{
+		if( m_pCallbackStats == NULL )
+		{
+			m_pCallbackStats = new CCallbackStats;
+		}
+		m_pCallbackStats->record(
+			pCall->qwPhraseFinish, pCall->qwPosted, qwBegin, qwEnd,
+			qwReleased );
+		pCall->pGramObj->recordCallbackStats(
+			pCall->qwPhraseFinish, pCall->qwPosted, qwBegin, qwEnd,
+			qwReleased );
+	}
+
+	Py_XDECREF( pCall->pFunc );
+	Py_XDECREF( (PyObject *)pCall->pGramObj );
+	delete pCall;
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::onFilterResults( WPARAM wParam, LPARAM lParam )
+{
+	CGrammarObject * pGramObj = (CGrammarObject *)wParam;
+	IUnknown * pIUnknown = (IUnknown *)lParam;
+	assert( pGramObj );
+	assert( pIUnknown );
+
+	// by now every grammar has seen the PhraseFinish so if one of our
+	// grammars produced this recognition we know which one
+
+	IUnknown * pIdentity = NULL;
+	HRESULT rc = pIUnknown->QueryInterface(
+		__uuidof(IUnknown), (void**)&pIdentity );
+	BOOL bKnown = SUCCEEDED(rc) && pIdentity == m_pWinnerResUnknown;
+	if( pIdentity )
+	{
+		pIdentity->Release();
+	}
+
+	pGramObj->filterOtherResults( bKnown ? &m_guidWinner : NULL, pIUnknown );
+
+	pIUnknown->Release();
+	Py_DECREF( (PyObject *)pGramObj );
+
+	// now that results are processed, we can resume recognitions
+	resetPauseRecog();
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::makeFilteredResultsCallback(
+	CGrammarObject * pGramObj, LPUNKNOWN pIUnknown )
+{
+	// the grammar object and the SAPI results object are kept alive until
+	// we get the message
+	Py_INCREF( (PyObject *)pGramObj );
+	pIUnknown->AddRef();
+
+	// like makeResultsCallback, delay the next recognition until this
+	// message has been processed
+	m_nPauseRecog += 1;
+
+	postMessage( WM_FILTERRESULTS, (WPARAM)pGramObj, (LPARAM)pIUnknown );
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::onSendAsyncResults( WPARAM wParam, LPARAM lParam )
+{
+	CResultsCall * pCall = (CResultsCall *)wParam;
+	assert( pCall );
+
+	// makeCallback calls DECREF on pArgs; there is no pause to reset
+	LONGLONG qwBegin = statsNow();
+	m_dwCallbackUtterance = pCall->dwUtterance;
+	makeCallback( pCall->pFunc, pCall->pArgs );
+	m_dwCallbackUtterance = 0;
+	LONGLONG qwEnd = statsNow();
+
+	finishResultsCall( pCall, qwBegin, qwEnd, qwEnd );
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::makeAsyncResultsCallback(
+	PyObject *pFunc, PyObject *pArgs,
+	CGrammarObject * pGramObj, LONGLONG qwPhraseFinish )
+{
+	// from now on the Python threads should get a chance to run while we
+	// are waiting for NatSpeak
+	m_bReleaseWhenIdle = TRUE;
+
+	postMessage( WM_SENDASYNCRESULTS,
+		(WPARAM)newResultsCall( pFunc, pArgs, pGramObj, qwPhraseFinish ), 0 );
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::releasePythonIfIdle()
+{
+	// we can only give up the lock when no Python code is further up the
+	// stack: not during initialization, not in a callback and not in one of
+	// our own message loops (which are called from Python).  When threads
+	// are enabled, CLockPython already releases the lock.
+
+	if( !m_bReleaseWhenIdle || m_pThreadState != NULL || m_bDuringInit ||
+		m_nCallbackDepth != 0 || m_nMessageLoopDepth != 0 )
+	{
+		return;
+	}
+
+	if( Py_IsInitialized() && PyGILState_Check() )
+	{
+		PyEval_SaveThread();
+	}
+}
+
+//---------------------------------------------------------------------------
+
+void CDragonCode::makeResultsCallback(
+	PyObject *pFunc, PyObject *pArgs,
+	CGrammarObject * pGramObj, LONGLONG qwPhraseFinish )
 {
 	// setting this will delay recognition at the start of the next
 	// utterance until results are processed
 	m_nPauseRecog += 1;
 
-	postMessage( WM_SENDRESULTS, (WPARAM)pFunc, (LPARAM)pArgs );
+	postMessage( WM_SENDRESULTS,
+		(WPARAM)newResultsCall( pFunc, pArgs, pGramObj, qwPhraseFinish ), 0 );
 }
 
 //---------------------------------------------------------------------------
@@ -1881,6 +2394,25 @@ BOOL CDragonCode::natDisconnect()
 	// kill the tray icon
 	setTrayIcon( "", "", Py_None );
 
+	// a wakeup which is still on its way finds no callback
+	Py_XDECREF( m_pWakeupCallback );
+	m_pWakeupCallback = NULL;
+
+	// nor do the scripts of execScriptAsync; the error information of
+	// those which were aborted during a callback is freed
+	Py_XDECREF( m_pExecutionCallback );
+	m_pExecutionCallback = NULL;
+	for( size_t i = 0; i < m_vPendingExecution.size(); i++ )
+	{
+		if( m_vPendingExecution[i].message == WM_EXECUTION )
+		{
+			delete [] (DWORD *)m_vPendingExecution[i].lParam;
+		}
+	}
+	m_vPendingExecution.clear();
+	m_dwPendingCallback &= ~PENDING_EXECUTION;
+	m_setAsyncScripts.clear();
+
 	// free all grammar objects
 	releaseObjects();
 
@@ -1965,6 +2497,84 @@ PyObject * CDragonCode::getCallbackDepth()
 	return Py_BuildValue( "i", m_nCallbackDepth );
 }
 
+//---------------------------------------------------------------------------
+
+PyObject * CDragonCode::getCallbackInfo()
+{
+	if( m_nCallbackDepth == 0 || m_pCallbackFunc == NULL )
+	{
+		Py_INCREF( Py_None );
+		return Py_None;
+	}
+
+	double dElapsed = statsMicroseconds( m_qwCallbackStart, statsNow() ) / 1e6;
+	return Py_BuildValue(
+		"(kdkOk)", m_dwCallbackSerial, dElapsed, m_dwCallbackThread,
+		m_pCallbackFunc, m_dwCallbackUtterance );
+}
+
+//---------------------------------------------------------------------------
+
+PyObject * CDragonCode::getCallbackStats( BOOL bReset )
+{
+	PyObject * pDict = PyDict_New();
+	if( pDict == NULL )
+	{
+		return NULL;
+	}
+
+	if( m_pCallbackStats == NULL )
+	{
+		m_pCallbackStats = new CCallbackStats;
+	}
+
+	PyObject * pStats = m_pCallbackStats->toPython();
+	if( pStats == NULL || PyDict_SetItemString( pDict, "all", pStats ) < 0 )
+	{
+		Py_XDECREF( pStats );
+		Py_DECREF( pDict );
+		return NULL;
+	}
+	Py_DECREF( pStats );
+
+	// one entry for every loaded grammar which made a results callback
+	CGrammarObject * pGramObj;
+	for( pGramObj = m_pFirstGramObj;
+		 pGramObj != NULL;
+		 pGramObj = pGramObj->m_pNextGramObj )
+	{
+		if( pGramObj->m_pCallbackStats == NULL )
+		{
+			continue;
+		}
+		pStats = pGramObj->m_pCallbackStats->toPython();
+		if( pStats == NULL ||
+			PyDict_SetItem( pDict, (PyObject *)pGramObj, pStats ) < 0 )
+		{
+			Py_XDECREF( pStats );
+			Py_DECREF( pDict );
+			return NULL;
+		}
+		Py_DECREF( pStats );
+	}
+
+	if( bReset )
+	{
+		m_pCallbackStats->reset();
+		for( pGramObj = m_pFirstGramObj;
+			 pGramObj != NULL;
+			 pGramObj = pGramObj->m_pNextGramObj )
+		{
+			if( pGramObj->m_pCallbackStats )
+			{
+				pGramObj->m_pCallbackStats->reset();
+			}
+		}
+	}
+
+	return pDict;
+}
+
 
 static std::string stringinfo(char const word[])
 {
@@ -2395,9 +3005,12 @@ BOOL CDragonCode::execScript(
 	{
 		pszComment = "execScript";
 	}
-	std::string msg("execScript: ");
-	msg.append(pszScript);
-	OutputDebugStringA(msg.c_str());
+	if( g_nDebugLevel >= DEBUGLEVEL_ARGS )
+	{
+		std::string msg("execScript: ");
+		msg.append(pszScript);
+		OutputDebugStringA(msg.c_str());
+	}
 
 	// Although this is optional, if we check the script syntax first, we
 	// can report errors in a cleaner way.
@@ -2429,8 +3042,7 @@ BOOL CDragonCode::execScript(
 	}
 
 	// can match up ExecutionDone callbacks.
-	static DWORD dwUnique = 1;
-	DWORD dwClientCode = ++dwUnique;
+	DWORD dwClientCode = ++s_dwScriptCode;
 
 	// We use this for if there are no list parameters
 
@@ -2443,10 +3055,10 @@ BOOL CDragonCode::execScript(
 			CComBSTR bstrComment( pszComment );
 
 			rc = m_pIDgnSSvcInterpreter->ExecuteScript(
-						bstrScript, &dwErrorCode, &dwLineNumber, bstrComment, dwUnique );
+						bstrScript, &dwErrorCode, &dwLineNumber, bstrComment, dwClientCode );
 		#else
 			rc = m_pIDgnSSvcInterpreter->ExecuteScript(
-				pszScript, &dwErrorCode, &dwLineNumber, pszComment, dwUnique );
+				pszScript, &dwErrorCode, &dwLineNumber, pszComment, dwClientCode );
 		#endif
 	}
 
@@ -2467,11 +3079,11 @@ BOOL CDragonCode::execScript(
 
 			rc = m_pIDgnSSvcInterpreter->ExecuteScriptWithListResults(
 				bstrScript, dwListSize, pszList,
-				&dwErrorCode, &dwLineNumber, bstrComment, dwUnique );
+				&dwErrorCode, &dwLineNumber, bstrComment, dwClientCode );
 		#else
 			rc = m_pIDgnSSvcInterpreter->ExecuteScriptWithListResults(
 				pszScript, dwListSize, pszList,
-				&dwErrorCode, &dwLineNumber, pszComment, dwUnique );
+				&dwErrorCode, &dwLineNumber, pszComment, dwClientCode );
 		#endif
 
 		delete pszList;
@@ -2501,6 +3113,92 @@ BOOL CDragonCode::execScript(
 
 //---------------------------------------------------------------------------
 
+PyObject * CDragonCode::execScriptAsync(
+	const char * pszScript, const char * pszComment )
+{
+	HRESULT rc;
+
+	NOTBEFORE_INIT( "execScriptAsync" );
+	NOTDURING_INIT( "execScriptAsync" );
+	NOTDURING_PAUSED( "execScriptAsync" );
+
+	if( m_pExecutionCallback == NULL )
+	{
+		reportError( errNatError,
+			"Calling execScriptAsync is not allowed before calling setExecutionCallback" );
+		return NULL;
+	}
+
+	if( pszComment == NULL )
+	{
+		pszComment = "execScriptAsync";
+	}
+
+	// syntax errors are reported at once, like in execScript
+
+	DWORD dwErrorCode;
+	DWORD dwLineNumber;
+
+	#ifdef UNICODE
+		CComBSTR bstrScript( pszScript );
+		rc = m_pIDgnSSvcInterpreter->CheckScript(
+			bstrScript, &dwErrorCode, &dwLineNumber );
+	#else
+		rc = m_pIDgnSSvcInterpreter->CheckScript(
+			pszScript, &dwErrorCode, &dwLineNumber );
+	#endif
+
+	RETURNIFERROR( rc, "IDgnSSvcInterpreter::CheckScript" );
+
+	if( dwErrorCode )
+	{
+		reportError( errSyntaxError,
+			 "Error %d compiling script %s (line %d)",
+			 dwErrorCode, pszComment, dwLineNumber );
+		return NULL;
+	}
+
+	DWORD dwClientCode = ++s_dwScriptCode;
+
+	#ifdef UNICODE
+		CComBSTR bstrComment( pszComment );
+		rc = m_pIDgnSSvcInterpreter->ExecuteScript(
+			bstrScript, &dwErrorCode, &dwLineNumber, bstrComment, dwClientCode );
+	#else
+		rc = m_pIDgnSSvcInterpreter->ExecuteScript(
+			pszScript, &dwErrorCode, &dwLineNumber, pszComment, dwClientCode );
+	#endif
+
+	RETURNIFERROR( rc, "IDgnSSvcInterpreter::ExecuteScript" );
+
+	// we do not wait: WM_EXECUTION arrives in hiddenWndProc, and
+	// onExecution calls the execution callback with the client code
+	m_setAsyncScripts.insert( dwClientCode );
+
+	return Py_BuildValue( "i", dwClientCode );
+}
+
+//---------------------------------------------------------------------------
+
+BOOL CDragonCode::setExecutionCallback( PyObject * pCallback )
+{
+	NOTBEFORE_INIT( "setExecutionCallback" );
+
+	// the scripts which are still running are forgotten when they finish
+	Py_XDECREF( m_pExecutionCallback );
+	m_pExecutionCallback = NULL;
+
+	if( pCallback != Py_None )
+	{
+		Py_XINCREF( pCallback );
+		m_pExecutionCallback = pCallback;
+	}
+
+	return TRUE;
+}
+
+//---------------------------------------------------------------------------
+
 BOOL CDragonCode::recognitionMimic( PCCHAR * ppWords )
 {
 	HRESULT rc;
@@ -2624,12 +3322,14 @@ BOOL CDragonCode::waitForSpeech( int nTimeout )
 	// pass in the timeout as the parameter
 
 	MY_BEGIN_ALLOW_THREADS
+	m_nMessageLoopDepth += 1;
 
 	HINSTANCE hInstance = _Module.GetModuleInstance();
 	DialogBoxParam(
 		hInstance, MAKEINTRESOURCE( IDD_WAITFOR ),
 		NULL /* no parent */, waitDialogProc, (LPARAM) nTimeout );
 
+	m_nMessageLoopDepth -= 1;
 	MY_END_ALLOW_THREADS
 
 	return TRUE;
@@ -2751,6 +3451,54 @@ BOOL CDragonCode::setTimerCallback( PyObject * pCallback, int nMilliseconds )
 	return TRUE;
 }
 
+//---------------------------------------------------------------------------
+
+BOOL CDragonCode::setWakeupCallback( PyObject * pCallback )
+{
+	NOTBEFORE_INIT( "setWakeupCallback" );
+
+	Py_XDECREF( m_pWakeupCallback );
+	m_pWakeupCallback = NULL;
+
+	if( pCallback != Py_None )
+	{
+		Py_XINCREF( pCallback );
+		m_pWakeupCallback = pCallback;
+
+		// the threads which call postWakeup have to get a chance to run
+		// while we are waiting for NatSpeak
+		m_bReleaseWhenIdle = TRUE;
+	}
+
+	return TRUE;
+}
+
+//---------------------------------------------------------------------------
+// This can be called from any Python thread.  Only the first call after a
+// wakeup callback posts a message, so a burst of calls costs one callback.
+
+PyObject * CDragonCode::postWakeup()
+{
+	if( m_hMsgWnd == NULL || m_pWakeupCallback == NULL )
+	{
+		reportError( errNatError,
+			"Calling postWakeup is not allowed before calling setWakeupCallback" );
+		return NULL;
+	}
+
+	BOOL bPosted = FALSE;
+	if( InterlockedExchange( &m_lWakeupPosted, 1 ) == 0 )
+	{
+		bPosted = PostMessage( m_hMsgWnd, WM_WAKEUP, 0, 0 );
+		if( !bPosted )
+		{
+			InterlockedExchange( &m_lWakeupPosted, 0 );
+		}
+	}
+
+	return Py_BuildValue( "i", bPosted );
+}
+
 //---------------------------------------------------------------------------
 PyObject * CDragonCode::getTrainingMode()
 {
@@ -9,6 +9,9 @@
 	which implement the export Python natlink functions.
 */
 
+#include <set>
+#include <vector>
+
 struct CGrammarObject;
 struct CResultObject;
 struct CDictationObject;
@@ -16,9 +19,17 @@ class CDgnSRNotifySink;
 class CDgnAppSupport;
 class MessageWindow;
 class CMessageStack;
+class CCallbackStats;
+struct CResultsCall;
 
 typedef const char * PCCHAR;
 
+// set with natlink.setDebugLevel; from DEBUGLEVEL_ARGS on the arguments of
+// execScript, recognitionMimic, addWord and correction, and the text of
+// dictation changes, are sent to OutputDebugString on every call
+extern int g_nDebugLevel;
+#define DEBUGLEVEL_ARGS 1
+
 //---------------------------------------------------------------------------
 
 class CDragonCode
@@ -54,6 +65,21 @@ class CDragonCode
 		m_pIDgnSSvcOutputEvent=0;
 		m_pIDgnSSvcInterpreter=0;
 		m_pIDgnSSvcInterpreterA=0;
+		m_pSharedResObj = NULL;
+		m_pSharedResUnknown = NULL;
+		m_pWinnerResUnknown = NULL;
+		m_bReleaseWhenIdle = FALSE;
+		m_nMessageLoopDepth = 0;
+		m_pCallbackStats = NULL;
+		m_qwCallbackStart = 0;
+		m_dwCallbackSerial = 0;
+		m_dwCallbackThread = 0;
+		m_pCallbackFunc = NULL;
+		m_dwUtteranceCount = 0;
+		m_dwCallbackUtterance = 0;
+		m_pWakeupCallback = NULL;
+		m_lWakeupPosted = 0;
+		m_pExecutionCallback = NULL;
 
 	}
 
@@ -75,12 +101,16 @@ class CDragonCode
 	BOOL recognitionMimic( PCCHAR * ppWords );
 	BOOL execScript(
 		const char * pszScript, PCCHAR * ppWords, const char * pszComment );
+	PyObject * execScriptAsync( const char * pszScript, const char * pszComment );
+	BOOL setExecutionCallback( PyObject * pCallback );
 	BOOL playEvents( DWORD dwCount, HOOK_EVENTMSG * pEvents );
 	BOOL waitForSpeech( int nTimeout );
 	BOOL inputFromFile(
 		const char * pszFileName, BOOL bRealTime,
 		DWORD dwPlayList, DWORD * adwPlayList, int nUttDetect );
 	BOOL setTimerCallback( PyObject * pCallback, int nMilliseconds = 0 );
+	BOOL setWakeupCallback( PyObject * pCallback );
+	PyObject * postWakeup();
 	BOOL startTraining( char * pMode );
 	BOOL finishTraining( BOOL bNoCancel );
 	BOOL createUser(
@@ -96,6 +126,8 @@ class CDragonCode
 	PyObject * getCurrentUser();
 	PyObject * getMicState();
 	PyObject * getCallbackDepth();
+	PyObject * getCallbackStats( BOOL bReset );
+	PyObject * getCallbackInfo();
 	PyObject * getCursorPos();
 	PyObject * getScreenSize();
 	PyObject * getTrainingMode();
@@ -129,6 +161,23 @@ class CDragonCode
 	void addResObj(CResultObject * pResObj );
 	void removeResObj(CResultObject * pResObj );
 
+	// when the grammar objects get PhraseFinish for a recognition they call
+	// this to get the results object (a new reference) for it.  All the
+	// grammars which get the same recognition share one results object.
+	// Returns NULL if the results object can not be created.
+	CResultObject * getSharedResObj( LPUNKNOWN pIUnknown );
+
+	// the grammar object which produced a recognition calls this from its
+	// PhraseFinish notification (without Python's GIL) to tell us its GUID
+	void setResultsWinner( LPUNKNOWN pIUnknown, GUID & guidGrammar );
+
+	// a grammar object which only wants the results of some other grammars
+	// calls this from PhraseFinish.  We post ourself a message and call its
+	// filterOtherResults when all grammars have seen the PhraseFinish and
+	// we know which grammar produced the recognition.
+	void makeFilteredResultsCallback(
+		CGrammarObject * pGramObj, LPUNKNOWN pIUnknown );
+
 	// these functions are called from CDictationObject
 	void addDictObj(CDictationObject * pDictObj );
 	void removeDictObj(CDictationObject * pDictObj );
@@ -145,7 +194,11 @@ class CDragonCode
 	void onPaused( WPARAM wParam );
 	void onAttribChanged( WPARAM wParam );
 	void onSendResults( WPARAM wParam, LPARAM lParam );
+	void onFilterResults( WPARAM wParam, LPARAM lParam );
+	void onSendAsyncResults( WPARAM wParam, LPARAM lParam );
 	void onTimer();
+	void onWakeup();
+	void onExecution( UINT message, WPARAM wParam, LPARAM lParam );
 	void onTrayIcon( WPARAM wParam, LPARAM lParam );
 
 	// these functions are called when we get a window message
@@ -153,9 +206,25 @@ class CDragonCode
 
 	// when the grammar object wants to make a results callback from a
 	// PhraseFinish notification it calls this function.  We then post
-	// ourself a message to make the actual callback.  The third argument
-	// is the type of callback
-	void makeResultsCallback( PyObject *pFunc, PyObject *pArgs );
+	// ourself a message to make the actual callback.  When pGramObj is
+	// given, the latency of the callback (counted from qwPhraseFinish, a
+	// statsNow time) is added to the callback statistics.
+	void makeResultsCallback(
+		PyObject *pFunc, PyObject *pArgs,
+		CGrammarObject * pGramObj = NULL, LONGLONG qwPhraseFinish = 0 );
+
+	// the same for grammars with asynchronous results.  The callback is
+	// still made from a posted message but we do not hold the next
+	// recognition until it is done.
+	void makeAsyncResultsCallback(
+		PyObject *pFunc, PyObject *pArgs,
+		CGrammarObject * pGramObj = NULL, LONGLONG qwPhraseFinish = 0 );
+
+	// called when our message window is done with a message.  When
+	// asynchronous results are used we release Python's GIL when we return
+	// to NatSpeak so the Python threads which handle the results can run;
+	// every entry point reacquires it with PyGILState_Ensure.
+	void releasePythonIfIdle();
 
 	// this is what we call to reset m_nPauseRecog and process any deferred
 	// pause request
@@ -272,6 +341,75 @@ class CDragonCode
 	// set when the message window is started
 	PyObject * m_pMessageWindowCallback;
 
+	// the results object of the last recognition and the COM identity
+	// (IUnknown pointer, with a reference) of the SAPI results object it
+	// wraps.  We keep these until the next recognition starts so every
+	// grammar which gets PhraseFinish for the recognition shares them.
+	CResultObject * m_pSharedResObj;
+	IUnknown * m_pSharedResUnknown;
+
+	// the COM identity of the SAPI results object of the last recognition
+	// produced by one of our grammars, and the GUID of that grammar
+	IUnknown * m_pWinnerResUnknown;
+	GUID m_guidWinner;
+
+	// releases the shared results object; the winning grammar is kept
+	void clearSharedResObj();
+
+	// forgets the winning grammar
+	void clearResultsWinner();
+
+	// set when a grammar has used asynchronous results; see
+	// releasePythonIfIdle
+	BOOL m_bReleaseWhenIdle;
+
+	// the number of nested message loops (messageLoop, waitForSpeech) we
+	// are in; Python code is further up the stack when this is not zero
+	int m_nMessageLoopDepth;
+
+	// the latency statistics of all results callbacks, see
+	// getCallbackStats; allocated with the first results callback
+	CCallbackStats * m_pCallbackStats;
+
+	// the outermost callback which is running (see getCallbackInfo): the
+	// statsNow time it started, its serial number, the thread it runs on
+	// and the function (a reference); m_pCallbackFunc is NULL when no
+	// callback is running
+	LONGLONG m_qwCallbackStart;
+	DWORD m_dwCallbackSerial;
+	DWORD m_dwCallbackThread;
+	PyObject * m_pCallbackFunc;
+
+	// the number of recognitions for which we created a results object,
+	// and the number of the recognition whose results callback is running
+	// (0 for other callbacks)
+	DWORD m_dwUtteranceCount;
+	DWORD m_dwCallbackUtterance;
+
+	// the function set with setWakeupCallback (NULL for none), and 1 while
+	// a WM_WAKEUP message is on its way; postWakeup is called from any
+	// thread, so m_lWakeupPosted is only changed with Interlocked calls
+	PyObject * m_pWakeupCallback;
+	volatile LONG m_lWakeupPosted;
+
+	// the function set with setExecutionCallback (NULL for none), the
+	// client codes of the scripts of execScriptAsync which did not finish
+	// yet, and the WM_EXECUTION and WM_EXECUTIONSTATUS messages of those
+	// scripts which came during another callback (posted again when it is
+	// done)
+	PyObject * m_pExecutionCallback;
+	std::set<DWORD> m_setAsyncScripts;
+	std::vector<MSG> m_vPendingExecution;
+
+	// a posted results callback is a CResultsCall; newResultsCall creates
+	// it, finishResultsCall records its times and frees it
+	CResultsCall * newResultsCall(
+		PyObject *pFunc, PyObject *pArgs,
+		CGrammarObject * pGramObj, LONGLONG qwPhraseFinish );
+	void finishResultsCall(
+		CResultsCall * pCall, LONGLONG qwBegin, LONGLONG qwEnd,
+		LONGLONG qwReleased );
+
 	// This is what we call when we are ready to recume recognition
 	void doPausedProcessing( QWORD dwCookie );
 
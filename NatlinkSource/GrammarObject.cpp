@@ -9,16 +9,15 @@
 */
 
 #include "stdafx.h"
+#include "CallbackStats.h"
 #include "DragonCode.h"
 #include "GrammarObject.h"
 #include "ResultObject.h"
 #include "Exceptions.h"
+#include "WideString.h"
 #include <fstream>
 #include <vector>
 
-// defined in PythWrap.cpp
-CResultObject * resobj_new();
-
 // This macro is used at the top of functions which can not be called
 // when no grammar has been loaded
 #define NEEDGRAMMAR( func ) \
@@ -120,6 +119,15 @@ STDMETHODIMP CSRGramNotifySink::PhraseFinish(
 
 	if( m_pParent )
 	{
+		m_pParent->m_qwPhraseFinish = statsNow();
+		m_pParent->noteResultsWinner( dwFlags, pIUnknown );
+
+		// results which do not pass the results filter never get to Python
+		if( !m_pParent->wantsResults( dwFlags, pIUnknown ) )
+		{
+			return S_OK;
+		}
+
 		// This call requires Python's GIL to be held.
 		PyGILState_STATE gstate = PyGILState_Ensure();
 		m_pParent->PhraseFinish( dwFlags, pSRPhrase, pIUnknown );
@@ -161,6 +169,13 @@ void CGrammarObject::create(CDragonCode * pDragCode )
 	m_pResultsCallback = NULL;
 	m_pHypothesisCallback = NULL;
 	m_bAllResults = FALSE;
+	m_bAsyncResults = FALSE;
+	m_dwResultsFilter = RESULTSFILTER_ALL;
+	m_pFilterGuids = NULL;
+	m_nFilterGuids = 0;
+	m_dwFilterScore = 0;
+	m_pCallbackStats = NULL;
+	m_qwPhraseFinish = 0;
 	m_pISRGramCommon = NULL;
 	m_pDragCode = pDragCode;
 	m_pNextGramObj = NULL;
@@ -172,6 +187,7 @@ void CGrammarObject::destroy()
 {
 	setBeginCallback( Py_None );
 	setResultsCallback( Py_None );
+	setResultsFilter( RESULTSFILTER_ALL, NULL, 0, 0 );
 	unload();
 }
 
@@ -187,6 +203,10 @@ BOOL CGrammarObject::unload()
 		m_pDragCode->removeGramObj( this );
 	}
 
+	// the statistics are about the loaded grammar
+	delete m_pCallbackStats;
+	m_pCallbackStats = NULL;
+
 	return TRUE;
 }
 
@@ -320,20 +340,51 @@ BOOL CGrammarObject::setBeginCallback(PyObject *pCallback )
 
 //---------------------------------------------------------------------------
 
-BOOL CGrammarObject::setResultsCallback(PyObject *pCallback )
+BOOL CGrammarObject::setResultsCallback(PyObject *pCallback, BOOL bAsync )
 {
 	if( pCallback == Py_None )
 	{
 		Py_XDECREF( m_pResultsCallback );
 		m_pResultsCallback = NULL;
+		m_bAsyncResults = FALSE;
 	}
 	else
 	{
 		Py_XINCREF( pCallback );
 		Py_XDECREF( m_pResultsCallback );
 		m_pResultsCallback = pCallback;
+		m_bAsyncResults = bAsync;
+	}
+
+	return TRUE;
+}
+
+//---------------------------------------------------------------------------
+// pGuids is copied; pass NULL to pass on the results of all other grammars.
+
+BOOL CGrammarObject::setResultsFilter(
+	DWORD dwCategories, GUID * pGuids, DWORD nGuids, DWORD dwMaxScore )
+{
+	if( m_pFilterGuids )
+	{
+		delete [] m_pFilterGuids;
+		m_pFilterGuids = NULL;
+		m_nFilterGuids = 0;
+	}
+
+	if( pGuids )
+	{
+		m_pFilterGuids = new GUID[ nGuids ? nGuids : 1 ];
+		for( DWORD i = 0; i < nGuids; i++ )
+		{
+			m_pFilterGuids[i] = pGuids[i];
+		}
+		m_nFilterGuids = nGuids;
 	}
 
+	m_dwResultsFilter = dwCategories & RESULTSFILTER_ALL;
+	m_dwFilterScore = dwMaxScore;
+
 	return TRUE;
 }
 
@@ -548,15 +599,40 @@ BOOL CGrammarObject::PhraseFinish(
 		return TRUE;
 	}
 
-	// here we create a results object which will be returned
+	// we only know which grammar produced the recognition after all
+	// grammars have seen the PhraseFinish, so when we only want the results
+	// from some other grammars CDragonCode calls us back later
 
-	CResultObject * pObj = resobj_new();
+	if( bOther && !bReject && m_pFilterGuids != NULL )
+	{
+		m_pDragCode->makeFilteredResultsCallback( this, pIUnknown );
+		return TRUE;
+	}
+
+	return sendResults( bReject, bOther, pIUnknown );
+}
+
+//---------------------------------------------------------------------------
+
+BOOL CGrammarObject::sendResults(
+	BOOL bReject, BOOL bOther, LPUNKNOWN pIUnknown )
+{
+	// the callback may have been removed while we were waiting
+
+	if( m_pResultsCallback == NULL )
+	{
+		return TRUE;
+	}
+
+	// here we get the results object which will be returned; it is shared
+	// with the other grammars which get this recognition
+
+	CResultObject * pObj = m_pDragCode->getSharedResObj( pIUnknown );
 	PyObject * pResObj = (PyObject*)pObj;
 
-	if( pObj == NULL || !pObj->create( m_pDragCode, pIUnknown ) )
+	if( pObj == NULL )
 	{
 		// can't create results object
-		Py_XDECREF( pResObj );
 		return TRUE;
 	}
 
@@ -575,6 +651,8 @@ BOOL CGrammarObject::PhraseFinish(
 	}
 	else
 	{
+		// the results are converted only once per recognition, each
+		// callback gets its own copy of the list
 		pDetails = pObj->getResults( 0 );
 		if( pDetails == NULL )
 		{
@@ -586,15 +664,145 @@ BOOL CGrammarObject::PhraseFinish(
 
 	// now make the callback
 
-	m_pDragCode->makeResultsCallback(
-		m_pResultsCallback,
-		Py_BuildValue( "(OO)", pDetails, pResObj ) );
+	if( m_bAsyncResults )
+	{
+		m_pDragCode->makeAsyncResultsCallback(
+			m_pResultsCallback,
+			Py_BuildValue( "(OO)", pDetails, pResObj ),
+			this, m_qwPhraseFinish );
+	}
+	else
+	{
+		m_pDragCode->makeResultsCallback(
+			m_pResultsCallback,
+			Py_BuildValue( "(OO)", pDetails, pResObj ),
+			this, m_qwPhraseFinish );
+	}
 	Py_XDECREF( pDetails );
 	Py_XDECREF( pResObj );
 
 	return TRUE;
 }
 
+//---------------------------------------------------------------------------
+// This is called from the notify sink without Python's GIL so we can not
+// call into Python or report errors here.  Returns FALSE when the results
+// filter rejects the recognition.
+
+BOOL CGrammarObject::wantsResults( DWORD dwFlags, LPUNKNOWN pIUnknown )
+{
+	HRESULT rc;
+
+	if( m_pResultsCallback == NULL || pIUnknown == NULL )
+	{
+		return FALSE;
+	}
+
+	BOOL bReject = ( dwFlags & ISRNOTEFIN_RECOGNIZED ) == 0;
+	BOOL bOther  = ( dwFlags & ISRNOTEFIN_THISGRAMMAR ) == 0;
+
+	if( ( bReject || bOther ) && !m_bAllResults )
+	{
+		return FALSE;
+	}
+
+	DWORD dwCategory =
+		bReject ? RESULTSFILTER_REJECT :
+		bOther ? RESULTSFILTER_OTHER : RESULTSFILTER_OWN;
+	if( ( m_dwResultsFilter & dwCategory ) == 0 )
+	{
+		return FALSE;
+	}
+
+	// the score of a recognition is the score of its first word (see
+	// ResObj.getWordInfo); rejections are not scored
+
+	if( m_dwFilterScore && !bReject )
+	{
+		ISRResGraphPtr pGraph;
+		rc = pIUnknown->QueryInterface(
+			__uuidof(ISRResGraph), (void**)&pGraph );
+		if( FAILED(rc) )
+		{
+			return TRUE;
+		}
+
+		DWORD aPath[ 512 ];
+		DWORD pathSize;
+		rc = pGraph->BestPathWord( 0, aPath, sizeof(aPath), &pathSize );
+		if( FAILED(rc) || pathSize < sizeof(DWORD) )
+		{
+			return TRUE;
+		}
+
+		SRRESWORDNODE node;
+		BYTE aBuffer[ 140 ];
+		DWORD sizeNeeded;
+		rc = pGraph->GetWordNode(
+			aPath[0], &node, (SRWORD *)aBuffer, sizeof(aBuffer), &sizeNeeded );
+		if( SUCCEEDED(rc) && node.dwWordScore > m_dwFilterScore )
+		{
+			return FALSE;
+		}
+	}
+
+	return TRUE;
+}
+
+//---------------------------------------------------------------------------
+// Also called from the notify sink without Python's GIL.
+
+void CGrammarObject::noteResultsWinner( DWORD dwFlags, LPUNKNOWN pIUnknown )
+{
+	HRESULT rc;
+
+	if( pIUnknown == NULL || m_pISRGramCommon == NULL ||
+		( dwFlags & ISRNOTEFIN_RECOGNIZED ) == 0 ||
+		( dwFlags & ISRNOTEFIN_THISGRAMMAR ) == 0 )
+	{
+		return;
+	}
+
+	IDgnSRGramCommonPtr pIDgnSRGramCommon;
+	rc = m_pISRGramCommon->QueryInterface(
+		__uuidof(IDgnSRGramCommon), (void **)&pIDgnSRGramCommon );
+	if( FAILED(rc) )
+	{
+		return;
+	}
+
+	GUID guid;
+	rc = pIDgnSRGramCommon->Identify( &guid );
+	if( SUCCEEDED(rc) )
+	{
+		m_pDragCode->setResultsWinner( pIUnknown, guid );
+	}
+}
+
+//---------------------------------------------------------------------------
+
+BOOL CGrammarObject::filterOtherResults(
+	GUID * pWinnerGuid, LPUNKNOWN pIUnknown )
+{
+	// do nothing if the grammar was unloaded or the filter was changed
+	// while we were waiting
+
+	if( m_pISRGramCommon == NULL || m_pFilterGuids == NULL )
+	{
+		return TRUE;
+	}
+
+	for( DWORD i = 0; pWinnerGuid && i < m_nFilterGuids; i++ )
+	{
+		if( IsEqualGUID( m_pFilterGuids[i], *pWinnerGuid ) )
+		{
+			return sendResults( FALSE, TRUE, pIUnknown );
+		}
+	}
+
+	return TRUE;
+}
+
 //---------------------------------------------------------------------------
 
 BOOL CGrammarObject::PhraseHypothesis(DWORD dwFlags, PSRPHRASE pSRPhrase )
@@ -616,32 +824,11 @@ BOOL CGrammarObject::PhraseHypothesis(DWORD dwFlags, PSRPHRASE pSRPhrase )
 
 	// now convert the results into a list
 
-	PyObject * pList = PyList_New( 0 );
-
-	SRWORD * pWord = (SRWORD *) pSRPhrase->abWords;
-	DWORD dwRemaining = pSRPhrase->dwSize - sizeof( SRPHRASE );
-
-	while( dwRemaining > 0 )
+	PyObject * pList = pyWordsFromPhrase( pSRPhrase );
+	if( pList == NULL )
 	{
-		// add the word to the list
-		#ifdef UNICODE
-			int size_needed = ::WideCharToMultiByte( CP_UTF8, 0, pWord->szWord, -1, NULL, 0,  NULL, NULL);
-			char * szWordA = new char[ size_needed ];
-			::WideCharToMultiByte( CP_UTF8, 0, pWord->szWord, -1, szWordA, size_needed, NULL, NULL );
-
-			PyObject * pyWord = Py_BuildValue( "s", szWordA );
-
-			if ( szWordA )
-				delete [] szWordA;
-		#else
-			PyObject * pyWord = Py_BuildValue( "s", pWord->szWord );
-		#endif
-		PyList_Append( pList, pyWord );
-		Py_DECREF( pyWord );
-
-		// move to the next word
-		dwRemaining -= pWord->dwSize;
-		pWord = (PSRWORD) ((BYTE*) pWord + pWord->dwSize);
+		PyErr_Print();
+		return TRUE;
 	}
 
 	// now make the callback
@@ -764,18 +951,7 @@ PyObject * CGrammarObject::getSelectText()
 	rc = pIDgnSRGramSelect->WordsGet( &sData );
 	RETURNIFERROR( rc, "IDgnSRGramSelect::WordsGet" );
 
-	#ifdef UNICODE
-		int size_needed = ::WideCharToMultiByte( CP_UTF8, 0, (const wchar_t*)sData.pData, -1, NULL, 0,  NULL, NULL);
-		char * pDataA = new char[ size_needed ];
-		::WideCharToMultiByte( CP_UTF8, 0, (const wchar_t*)sData.pData, -1, pDataA, size_needed, NULL, NULL );
-
-		PyObject * pRetn = Py_BuildValue( "s", pDataA );
-
-		if ( pDataA )
-			delete [] pDataA;
-	#else
-		PyObject * pRetn = Py_BuildValue( "s", sData.pData );
-	#endif
+	PyObject * pRetn = pyStringFromWide( (const wchar_t *)sData.pData );
 
 	CoTaskMemFree( sData.pData );
 
@@ -784,6 +960,20 @@ PyObject * CGrammarObject::getSelectText()
 
 //---------------------------------------------------------------------------
 
+void CGrammarObject::recordCallbackStats(
+	LONGLONG qwPhraseFinish, LONGLONG qwPosted, LONGLONG qwBegin,
+	LONGLONG qwEnd, LONGLONG qwReleased )
+{
+	if( m_pCallbackStats == NULL )
+	{
+		m_pCallbackStats = new CCallbackStats;
+	}
+	m_pCallbackStats->record(
+		qwPhraseFinish, qwPosted, qwBegin, qwEnd, qwReleased );
+}
+
+//---------------------------------------------------------------------------
+
 BOOL CGrammarObject::getGrammarGuid(GUID * pGrammarGuid )
 {
 	HRESULT rc;
@@ -10,6 +10,14 @@
 */
 
 class CDragonCode;
+class CCallbackStats;
+
+// These are the bits for CGrammarObject::m_dwResultsFilter, the kinds of
+// results which are passed to the results callback
+#define RESULTSFILTER_OWN		0x0001
+#define RESULTSFILTER_OTHER		0x0002
+#define RESULTSFILTER_REJECT	0x0004
+#define RESULTSFILTER_ALL		0x0007
 
 //---------------------------------------------------------------------------
 // This is a struct not a class to make sure we are compatibile with Python
@@ -38,6 +46,22 @@ struct CGrammarObject
 	// callback when when they correspond to other grammars or rejections
 	BOOL m_bAllResults;
 
+	// set with the asyncResults parameter of setResultsCallback.  When set,
+	// the results callback does not hold up the next recognition.
+	BOOL m_bAsyncResults;
+
+	// the results filter set with setResultsFilter.  m_dwResultsFilter is a
+	// combination of the RESULTSFILTER_ bits.  When m_pFilterGuids is not
+	// NULL, results of other grammars are only passed on when they come
+	// from one of the m_nFilterGuids grammars in that array.  When
+	// m_dwFilterScore is not zero, results with a worse (higher) score are
+	// not passed on.  The filter is tested in the PhraseFinish notification
+	// before we touch Python.
+	DWORD m_dwResultsFilter;
+	GUID * m_pFilterGuids;
+	DWORD m_nFilterGuids;
+	DWORD m_dwFilterScore;
+
 	// these are pointers to the COM grammar object; this is NOT a smart
 	// pointer since we can not guarentee the class constructor/destructor
 	ISRGramCommon * m_pISRGramCommon;
@@ -51,6 +75,12 @@ struct CGrammarObject
 	// linked list
 	CGrammarObject * m_pNextGramObj;
 
+	// the latency statistics of the results callbacks of this grammar
+	// (NULL until the first callback) and the statsNow time at which the
+	// last PhraseFinish arrived
+	CCallbackStats * m_pCallbackStats;
+	LONGLONG m_qwPhraseFinish;
+
 	//-----
 	// functions
 	
@@ -69,8 +99,10 @@ struct CGrammarObject
 	BOOL load( BYTE * pData, DWORD dwSize, BOOL bAllResults, BOOL bHypothesis );
 	BOOL unload();
 	BOOL setBeginCallback( PyObject *pCallback );
-	BOOL setResultsCallback( PyObject *pCallback );
+	BOOL setResultsCallback( PyObject *pCallback, BOOL bAsync = FALSE );
 	BOOL setHypothesisCallback( PyObject *pCallback );
+	BOOL setResultsFilter(
+		DWORD dwCategories, GUID * pGuids, DWORD nGuids, DWORD dwMaxScore );
 	BOOL activate( char * ruleName, HWND hWnd );
 	BOOL deactivate( char * ruleName );
 	BOOL emptyList( char * listName );
@@ -85,9 +117,30 @@ struct CGrammarObject
 	// callback from the grammar notify sink
 	BOOL PhraseFinish(
 		DWORD dwFlags, PSRPHRASE pSRPhrase, LPUNKNOWN pIUnknown );
+
+	// also called from the grammar notify sink, but without holding
+	// Python's GIL.  wantsResults applies the category and score parts of
+	// the results filter, noteResultsWinner tells CDragonCode which grammar
+	// produced the recognition.
+	BOOL wantsResults( DWORD dwFlags, LPUNKNOWN pIUnknown );
+	void noteResultsWinner( DWORD dwFlags, LPUNKNOWN pIUnknown );
+
+	// called from CDragonCode once all grammars have seen the PhraseFinish
+	// of a recognition which another grammar produced; we make the results
+	// callback when that grammar passes our results filter
+	BOOL filterOtherResults( GUID * pWinnerGuid, LPUNKNOWN pIUnknown );
+
+	// creates the results object and makes the results callback
+	BOOL sendResults( BOOL bReject, BOOL bOther, LPUNKNOWN pIUnknown );
 	BOOL PhraseHypothesis(
 		DWORD dwFlags, PSRPHRASE pSRPhrase );
 
+	// called from CDragonCode when a results callback of this grammar is
+	// done; adds the times to m_pCallbackStats
+	void recordCallbackStats(
+		LONGLONG qwPhraseFinish, LONGLONG qwPosted, LONGLONG qwBegin,
+		LONGLONG qwEnd, LONGLONG qwReleased );
+
 	// This is called from the result object to get the GUID for this
 	// grammar.  It will return FALSE in the case of an error which
 	// is already reported to Python.
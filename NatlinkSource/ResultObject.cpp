@@ -12,6 +12,7 @@
 #include "ResultObject.h"
 #include "Exceptions.h"
 #include "GrammarObject.h"
+#include "WideString.h"
 
 // This macro is used at the top of functions which can not be called
 // when no grammar has been loaded
@@ -99,6 +100,7 @@ BOOL CResultObject::create(CDragonCode * pDragCode, LPUNKNOWN pIUnknown )
 	m_pISRResBasic = NULL;
 	m_pDragCode = pDragCode;
 	m_pNextResObj = NULL;
+	m_pResultsSnapshot = NULL;
 
 	m_pDragCode->addResObj( this );
 
@@ -132,6 +134,9 @@ BOOL CResultObject::create(CDragonCode * pDragCode, LPUNKNOWN pIUnknown )
 
 void CResultObject::destroy()
 {
+	Py_XDECREF( m_pResultsSnapshot );
+	m_pResultsSnapshot = NULL;
+
 	if( m_pISRResBasic )
 	{
 		m_pISRResBasic->Release();
@@ -141,6 +146,53 @@ void CResultObject::destroy()
 	}
 }
 
+//---------------------------------------------------------------------------
+// Utility subroutine.  Takes a best path (an array of word node numbers
+// returned from ISRResGraph::BestPathWord) and returns a new Python list of
+// (word,ruleNumber) tuples.  Returns NULL on error.
+
+static PyObject * pathToResults(
+	ISRResGraph * pGraph, DWORD * aPath, DWORD nCount )
+{
+	HRESULT rc;
+
+	PyObject * pList = PyList_New( 0 );
+	if( pList == NULL )
+	{
+		return NULL;
+	}
+
+	for( DWORD i = 0; i < nCount; i++ )
+	{
+		SRRESWORDNODE node;
+
+		// we support a maximum word size of 128 plus overhead
+		BYTE aBuffer[ 140 ];
+		SRWORD * pWord = (SRWORD *)aBuffer;
+		DWORD sizeNeeded;
+
+		rc = pGraph->GetWordNode(
+			aPath[i], &node, pWord, sizeof(aBuffer), &sizeNeeded );
+		if( FAILED(rc) )
+		{
+			Py_DECREF( pList );
+			reportComError( rc, "ISRResGraph::GetWordNode", __FILE__, __LINE__ );
+			return NULL;
+		}
+		PyObject * pTuple = Py_BuildValue(
+			"(Ni)", pyStringFromWide( pWord->szWord ), node.dwCFGParse );
+		if( pTuple == NULL || PyList_Append( pList, pTuple ) )
+		{
+			Py_XDECREF( pTuple );
+			Py_DECREF( pList );
+			return NULL;
+		}
+		Py_DECREF( pTuple );
+	}
+
+	return pList;
+}
+
 //---------------------------------------------------------------------------
 
 PyObject * CResultObject::getResults(int nChoice )
@@ -149,12 +201,25 @@ PyObject * CResultObject::getResults(int nChoice )
 
 	MUSTBETINITED( "ResObj.getResults" );
 
+	// the first choice is converted once and then copied; every caller gets
+	// its own list
+
+	if( nChoice == 0 )
+	{
+		PyObject * pSnapshot = getResultsSnapshot();
+		if( pSnapshot == NULL )
+		{
+			return NULL;
+		}
+		PyObject * pList = PySequence_List( pSnapshot );
+		Py_DECREF( pSnapshot );
+		return pList;
+	}
+
 	// our goal is to produce a Python array of tuples where each tuple is
 	// the recognized word (string) and the rule number which contains that
 	// word (integer).
 
-	PyObject * pList = PyList_New( 0 );
-
 	ISRResGraphPtr pGraph;
 	rc = m_pISRResBasic->QueryInterface(
 		__uuidof(ISRResGraph), (void**)&pGraph );
@@ -170,39 +235,97 @@ PyObject * CResultObject::getResults(int nChoice )
 	RETURNIFERROR( rc, "ISRResGraph::BestPathWord" );
 
 	// value returned is actually the byte count
-	DWORD nCount = pathSize / sizeof(DWORD);
+	return pathToResults( pGraph, aPath, pathSize / sizeof(DWORD) );
+}
 
-	for( DWORD i = 0; i < nCount; i++ )
+//---------------------------------------------------------------------------
+
+PyObject * CResultObject::getResultsSnapshot()
+{
+	HRESULT rc;
+
+	MUSTBETINITED( "ResObj.getResults" );
+
+	if( m_pResultsSnapshot == NULL )
 	{
-		SRRESWORDNODE node;
+		ISRResGraphPtr pGraph;
+		rc = m_pISRResBasic->QueryInterface(
+			__uuidof(ISRResGraph), (void**)&pGraph );
+		RETURNIFERROR( rc, "QueryInterface(ResGraph)" );
+
+		DWORD aPath[ 512 ];
+		DWORD pathSize;
+		rc = pGraph->BestPathWord( 0, aPath, sizeof(aPath), &pathSize );
+		onVALUEOUTOFRANGE( rc, "There is no result number %d", 0 );
+		RETURNIFERROR( rc, "ISRResGraph::BestPathWord" );
+
+		PyObject * pList =
+			pathToResults( pGraph, aPath, pathSize / sizeof(DWORD) );
+		if( pList == NULL )
+		{
+			return NULL;
+		}
+		m_pResultsSnapshot = PyList_AsTuple( pList );
+		Py_DECREF( pList );
+		if( m_pResultsSnapshot == NULL )
+		{
+			return NULL;
+		}
+	}
 
-		// we support a maximum word size of 128 plus overhead
-		BYTE aBuffer[ 140 ];
-		SRWORD * pWord = (SRWORD *)aBuffer;
-		DWORD sizeNeeded;
+	Py_INCREF( m_pResultsSnapshot );
+	return m_pResultsSnapshot;
+}
 
-		rc = pGraph->GetWordNode(
-			aPath[i], &node, pWord, sizeof(aBuffer), &sizeNeeded );
-		RETURNIFERROR( rc, "ISRResGraph::GetWordNode" );
-		#ifdef UNICODE
-			int size_needed = ::WideCharToMultiByte( CP_UTF8, 0, pWord->szWord, -1, NULL, 0,  NULL, NULL);
-			char * szWordA = new char[ size_needed ];
-			::WideCharToMultiByte( CP_UTF8, 0, pWord->szWord, -1, szWordA, size_needed, NULL, NULL );
+//---------------------------------------------------------------------------
+// Returns the results for choice 0 up to (but not including) nLimit, or all
+// choices when nLimit is zero or negative, as a list of lists in the format
+// of getResults.  We query the graph interface once and stop quietly at the
+// first choice the engine does not have, so callers do not have to probe
+// for the number of alternatives by catching OutOfRange.
 
-			PyObject * pTuple =
-				Py_BuildValue( "(si)", szWordA, node.dwCFGParse );
+PyObject * CResultObject::getAlternates( int nLimit )
+{
+	HRESULT rc;
 
-			if ( szWordA )
-				delete [] szWordA;
-		#else
-			PyObject * pTuple =
-				Py_BuildValue( "(si)", pWord->szWord, node.dwCFGParse );
-#endif
-		PyList_Append( pList, pTuple );
-		Py_XDECREF( pTuple );
+	MUSTBETINITED( "ResObj.alternates" );
+
+	ISRResGraphPtr pGraph;
+	rc = m_pISRResBasic->QueryInterface(
+		__uuidof(ISRResGraph), (void**)&pGraph );
+	RETURNIFERROR( rc, "QueryInterface(ResGraph)" );
+
+	PyObject * pAlternates = PyList_New( 0 );
+
+	for( int nChoice = 0; nLimit <= 0 || nChoice < nLimit; nChoice++ )
+	{
+		DWORD aPath[ 512 ];
+		DWORD pathSize;
+		rc = pGraph->BestPathWord( nChoice, aPath, sizeof(aPath), &pathSize );
+		if( rc == SRERR_VALUEOUTOFRANGE )
+		{
+			// no more alternatives
+			break;
+		}
+		if( FAILED(rc) )
+		{
+			Py_DECREF( pAlternates );
+			reportComError( rc, "ISRResGraph::BestPathWord", __FILE__, __LINE__ );
+			return NULL;
+		}
+
+		PyObject * pResults =
+			pathToResults( pGraph, aPath, pathSize / sizeof(DWORD) );
+		if( pResults == NULL )
+		{
+			Py_DECREF( pAlternates );
+			return NULL;
+		}
+		PyList_Append( pAlternates, pResults );
+		Py_DECREF( pResults );
 	}
 
-	return pList;
+	return pAlternates;
 }
 
 //---------------------------------------------------------------------------
@@ -237,35 +360,7 @@ PyObject * CResultObject::getWords(int nChoice )
 
 	// now convert the results into a list
 
-	PyObject * pList = PyList_New( 0 );
-
-    SRWORD * pWord = (SRWORD *) pPhrase->abWords;
-    DWORD dwRemaining = pPhrase->dwSize - sizeof( SRPHRASE );
-
-    while( dwRemaining > 0 )
-    {
-		// add the word to the list
-		#ifdef UNICODE
-			int size_needed = ::WideCharToMultiByte( CP_UTF8, 0, pWord->szWord, -1, NULL, 0,  NULL, NULL);
-			char * szWordA = new char[ size_needed ];
-			::WideCharToMultiByte( CP_UTF8, 0, pWord->szWord, -1, szWordA, size_needed, NULL, NULL );
-
-			PyObject * pyWord = Py_BuildValue( "s", szWordA );
-
-			if ( szWordA )
-				delete [] szWordA;
-		#else
-			PyObject * pyWord = Py_BuildValue( "s", pWord->szWord );
-		#endif
-		PyList_Append( pList, pyWord );
-		Py_DECREF( pyWord );
-
-        // move to the next word
-        dwRemaining -= pWord->dwSize;
-        pWord = (PSRWORD) ((BYTE*) pWord + pWord->dwSize);
-    }
-
-	return pList;
+	return pyWordsFromPhrase( (SRPHRASE *)pPhrase );
 }
 
 //---------------------------------------------------------------------------
@@ -310,7 +405,7 @@ PyObject * CResultObject::getWave()
 	onNOTENOUGHDATA( rc, "The wave data is no longer available for this result" );
 	RETURNIFERROR( rc, "ISRResAudio::GetWAV" );
 
-	PyObject * pData = Py_BuildValue( "s#", (char *)(sData.pData), sData.dwSize );
+	PyObject * pData = Py_BuildValue( "y#", (char *)(sData.pData), (Py_ssize_t)sData.dwSize );
 	CoTaskMemFree( sData.pData );
 	return pData;
 }
@@ -333,6 +428,10 @@ PyObject * CResultObject::getWordInfo(int nChoice )
 	// word (integer).
 
 	PyObject * pList = PyList_New( 0 );
+	if( pList == NULL )
+	{
+		return NULL;
+	}
 
 	ISRResGraphPtr pGraph;
 	rc = m_pISRResBasic->QueryInterface(
@@ -400,39 +499,20 @@ PyObject * CResultObject::getWordInfo(int nChoice )
 			(BYTE*)&info, sizeof(DgnEngineInfo), &dwInfoSize );
 		RETURNIFERROR( rc, "ILexPronounce::Get" )
 
-		#ifdef UNICODE
-			int size_needed = ::WideCharToMultiByte( CP_UTF8, 0, pWord->szWord, -1, NULL, 0,  NULL, NULL);
-			char * szWordA = new char[ size_needed ];
-			::WideCharToMultiByte( CP_UTF8, 0, pWord->szWord, -1, szWordA, size_needed, NULL, NULL );
-
-			size_needed = ::WideCharToMultiByte( CP_UTF8, 0, pronBuf, -1, NULL, 0,  NULL, NULL);
-			char * pronBufA = new char[ size_needed ];
-			::WideCharToMultiByte( CP_UTF8, 0, pronBuf, -1, pronBufA, size_needed, NULL, NULL );
-
-			PyObject * pTuple =
-				Py_BuildValue(
-					"(siiiiis)",
-					szWordA, node.dwCFGParse, node.dwWordScore,
-					(int)(node.qwStartTime - qwStartTime),
-					(int)(node.qwEndTime - qwStartTime),
-					info.dwFlags, pronBufA );
-
-			if ( szWordA )
-				delete [] szWordA;
-			if ( pronBufA )
-				delete [] pronBufA;
-		#else
-			PyObject * pTuple =
-				Py_BuildValue(
-					"(siiiiis)",
-					pWord->szWord, node.dwCFGParse, node.dwWordScore,
-					(int)(node.qwStartTime - qwStartTime),
-					(int)(node.qwEndTime - qwStartTime),
-					info.dwFlags, pronBuf );
-		#endif
-
-		PyList_Append( pList, pTuple );
-		Py_XDECREF( pTuple );
+		PyObject * pTuple =
+			Py_BuildValue(
+				"(NiiiiiN)",
+				pyStringFromWide( pWord->szWord ), node.dwCFGParse, node.dwWordScore,
+				(int)(node.qwStartTime - qwStartTime),
+				(int)(node.qwEndTime - qwStartTime),
+				info.dwFlags, pyStringFromWide( pronBuf ) );
+		if( pTuple == NULL || PyList_Append( pList, pTuple ) )
+		{
+			Py_XDECREF( pTuple );
+			Py_DECREF( pList );
+			return NULL;
+		}
+		Py_DECREF( pTuple );
 	}
 
 	return pList;
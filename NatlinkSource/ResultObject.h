@@ -36,6 +36,12 @@ struct CResultObject
 	// linked list
 	CResultObject * m_pNextResObj;
 
+	// the results for choice 0 (a tuple of (word,ruleNumber) tuples) are
+	// computed once and kept here; a results object is shared by all the
+	// grammars which get the same recognition so this saves converting the
+	// same results for every allResults grammar.  NULL until first needed.
+	PyObject * m_pResultsSnapshot;
+
 	//-----
 	// functions
 
@@ -53,11 +59,16 @@ struct CResultObject
 	// return TRUE on success or FALSE on error.  Otherwise, we return
 	// a Python object on success or NULL on error.
 	PyObject * getResults( int nChoice );
+	PyObject * getAlternates( int nLimit );
 	PyObject * getWords( int nChoice );
 	PyObject * correction( PCCHAR * ppWords );
 	PyObject * getWave();
 	PyObject * getWordInfo( int nChoice );
 	PyObject * getSelectInfo(CGrammarObject * pGrammar, int nChoice );
+
+	// returns a new reference to the (immutable) results snapshot for
+	// choice 0, computing it on first use.  Returns NULL on error.
+	PyObject * getResultsSnapshot();
 	
 
 };
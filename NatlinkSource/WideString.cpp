@@ -0,0 +1,188 @@
+/*
+ Python Macro Language for Dragon NaturallySpeaking
+	(c) Copyright 1999 by Joel Gould
+	Portions (c) Copyright 1999 by Dragon Systems, Inc.
+
+ WideString.cpp
+	Python strings from UTF-16, see WideString.h.  With
+	WIDESTRING_TEST_MODULE defined this file alone builds the module
+	_widestring_test, which the tests use.
+*/
+
+#ifndef WIDESTRING_TEST_MODULE
+#include "stdafx.h"
+#else
+#include <Python.h>
+#endif
+#include <string.h>
+#include <stdint.h>
+#include "WideString.h"
+
+//---------------------------------------------------------------------------
+
+PyObject * pyStringFromUtf16( const char16_t * pszText, size_t nChars )
+{
+	// nearly all words are ASCII or Latin-1, and then they have no
+	// surrogates; Python narrows the characters itself
+	for( size_t i = 0; i < nChars; i++ )
+	{
+		if( pszText[i] >= 0xD800 && pszText[i] < 0xE000 )
+		{
+			// surrogate pairs need the codec; Windows is little endian
+			int nByteOrder = -1;
+			return PyUnicode_DecodeUTF16(
+				(const char *)pszText, (Py_ssize_t)( nChars * 2 ), "replace", &nByteOrder );
+		}
+	}
+	return PyUnicode_FromKindAndData( PyUnicode_2BYTE_KIND, pszText, (Py_ssize_t)nChars );
+}
+
+//---------------------------------------------------------------------------
+
+PyObject * pyStringFromUtf16( const char16_t * pszText )
+{
+	if( pszText == NULL )
+	{
+		return PyUnicode_FromStringAndSize( "", 0 );
+	}
+	size_t nChars = 0;
+	while( pszText[ nChars ] )
+	{
+		nChars++;
+	}
+	return pyStringFromUtf16( pszText, nChars );
+}
+
+//---------------------------------------------------------------------------
+
+static uint32_t readDword( const unsigned char * pData )
+{
+	uint32_t dwValue;
+	memcpy( &dwValue, pData, sizeof( dwValue ) );
+	return dwValue;
+}
+
+// the DWORDs in front of the word in an SRWORD
+#define WORD_HEADER 8
+
+PyObject * pyWordsFromPhrase( const void * pPhrase )
+{
+	const unsigned char * pData = (const unsigned char *)pPhrase;
+	uint32_t dwRemaining = readDword( pData );
+	dwRemaining = dwRemaining < 4 ? 0 : dwRemaining - 4;
+	pData += 4;
+
+	PyObject * pList = PyList_New( 0 );
+	if( pList == NULL )
+	{
+		return NULL;
+	}
+
+	while( dwRemaining >= WORD_HEADER )
+	{
+		uint32_t dwWordSize = readDword( pData );
+		if( dwWordSize < WORD_HEADER || dwWordSize > dwRemaining )
+		{
+			break;
+		}
+
+		// the word ends with a NUL, or at the end of the SRWORD
+		size_t nMaxChars = ( dwWordSize - WORD_HEADER ) / 2;
+		const unsigned char * pWord = pData + WORD_HEADER;
+		size_t nChars = 0;
+		while( nChars < nMaxChars &&
+			   ( pWord[ 2 * nChars ] || pWord[ 2 * nChars + 1 ] ) )
+		{
+			nChars++;
+		}
+
+		PyObject * pyWord;
+		if( ( (uintptr_t)pWord & 1 ) == 0 )
+		{
+			pyWord = pyStringFromUtf16( (const char16_t *)pWord, nChars );
+		}
+		else
+		{
+			// an SRWORD at an odd address, the characters are copied
+			char16_t * pCopy = new char16_t[ nChars + 1 ];
+			memcpy( pCopy, pWord, nChars * 2 );
+			pyWord = pyStringFromUtf16( pCopy, nChars );
+			delete [] pCopy;
+		}
+		if( pyWord == NULL || PyList_Append( pList, pyWord ) )
+		{
+			Py_XDECREF( pyWord );
+			Py_DECREF( pList );
+			return NULL;
+		}
+		Py_DECREF( pyWord );
+
+		// move to the next word
+		dwRemaining -= dwWordSize;
+		pData += dwWordSize;
+	}
+
+	return pList;
+}
+
+#ifdef WIDESTRING_TEST_MODULE
+
+//---------------------------------------------------------------------------
+// _widestring_test.stringFromUtf16( data ), data is little endian UTF-16
+// (bytes) with or without a terminating NUL
+
+static PyObject * test_stringFromUtf16( PyObject * self, PyObject * args )
+{
+	Py_buffer buffer;
+	if( !PyArg_ParseTuple( args, "y*:stringFromUtf16", &buffer ) )
+	{
+		return NULL;
+	}
+	size_t nChars = (size_t)buffer.len / 2;
+	char16_t * pText = new char16_t[ nChars + 1 ];
+	memcpy( pText, buffer.buf, nChars * 2 );
+	pText[ nChars ] = 0;
+	PyBuffer_Release( &buffer );
+
+	PyObject * pRetn = pyStringFromUtf16( pText );
+	delete [] pText;
+	return pRetn;
+}
+
+//---------------------------------------------------------------------------
+// _widestring_test.wordsFromPhrase( data ), data is an SRPHRASE (bytes)
+
+static PyObject * test_wordsFromPhrase( PyObject * self, PyObject * args )
+{
+	Py_buffer buffer;
+	if( !PyArg_ParseTuple( args, "y*:wordsFromPhrase", &buffer ) )
+	{
+		return NULL;
+	}
+	if( buffer.len < 4 ||
+		readDword( (const unsigned char *)buffer.buf ) > (uint32_t)buffer.len )
+	{
+		PyBuffer_Release( &buffer );
+		PyErr_SetString( PyExc_ValueError, "the size of the phrase is wrong" );
+		return NULL;
+	}
+	PyObject * pRetn = pyWordsFromPhrase( buffer.buf );
+	PyBuffer_Release( &buffer );
+	return pRetn;
+}
+
+static PyMethodDef test_methods[] = {
+	{ "stringFromUtf16", test_stringFromUtf16, METH_VARARGS },
+	{ "wordsFromPhrase", test_wordsFromPhrase, METH_VARARGS },
+	{ NULL, NULL }
+};
+
+static struct PyModuleDef test_module = {
+	PyModuleDef_HEAD_INIT, "_widestring_test", NULL, -1, test_methods };
+
+PyMODINIT_FUNC PyInit__widestring_test( void )
+{
+	return PyModule_Create( &test_module );
+}
+
+#endif
@@ -0,0 +1,42 @@
+/*
+ Python Macro Language for Dragon NaturallySpeaking
+	(c) Copyright 1999 by Joel Gould
+	Portions (c) Copyright 1999 by Dragon Systems, Inc.
+
+ WideString.h
+	Python strings from the UTF-16 strings NatSpeak gives us: words,
+	dictation text and the words of an SRPHRASE.  The strings are built
+	directly from the wide characters, without converting them to UTF-8 in
+	a buffer first.  This does not need Windows, so it is tested on other
+	systems too (pythonsrc/tests/test_widestring.py).
+*/
+
+#include <stddef.h>
+
+// Returns a new Python str from nChars UTF-16 characters.  Surrogates
+// without their other half become U+FFFD, like with WideCharToMultiByte.
+// Returns NULL, with a Python exception, on error.
+PyObject * pyStringFromUtf16( const char16_t * pszText, size_t nChars );
+
+// the same for a NUL terminated string; NULL gives an empty string
+PyObject * pyStringFromUtf16( const char16_t * pszText );
+
+// Returns a Python list with the words of an SRPHRASE: a DWORD with the
+// size of the phrase followed by SRWORDs (a DWORD with the size of the
+// word, a DWORD with the word number and the NUL terminated word).  Words
+// which do not fit in the sizes end the list.
+PyObject * pyWordsFromPhrase( const void * pPhrase );
+
+#ifdef _WIN32
+// a wchar_t is a UTF-16 character on Windows
+
+inline PyObject * pyStringFromWide( const wchar_t * pszText, size_t nChars )
+{
+	return pyStringFromUtf16( (const char16_t *)pszText, nChars );
+}
+
+inline PyObject * pyStringFromWide( const wchar_t * pszText )
+{
+	return pyStringFromUtf16( (const char16_t *)pszText );
+}
+#endif
@@ -25,6 +25,8 @@ PyMem_DEL.  Changing these calls to PyObject_Del below eliminated the crashes.
 #include "DictationObject.h"
 #include "Exceptions.h"
 #include <string>
+#include <vector>
+#include <unordered_map>
 
 
 /*
@@ -39,82 +41,164 @@ PyMem_DEL.  Changing these calls to PyObject_Del below eliminated the crashes.
 CDragonCode cDragon;
 
 //---------------------------------------------------------------------------
-// This utility subroutine takes a PyObject which reprents the arguments
-// passed to a Python routine and fills in an array of strings with the
-// strings extracted from the Python argument.  The last entry in the array
-// will be a NULL pointer.
-//
-// The caller must delete the array.  This function returns 0 on error (in
-// which case the array does not need to be deleted).
+// set with natlink.setDebugLevel, see DragonCode.h
+
+int g_nDebugLevel = 0;
+
+//---------------------------------------------------------------------------
+// The Windows-1252 encodings of the words which are not ASCII, by their
+// UTF-8 form.  recognitionMimic is called with the same few words over and
+// over (by test scripts thousands of times), so each is encoded once.  The
+// cache is only used with the Python lock held; when it is full it is
+// emptied.
 
+#define MAX_ENCODED_WORDS 4096
 
-PCCHAR * parseStringArray( const char * funcName, PyObject * args )
+static std::unordered_map<std::string, std::string> s_mapEncoded;
+
+static const std::string * encodeWord( PyObject * pyWord )
 {
-	PCCHAR * ppWords = NULL;
-	std::string output_message(std::string("parseStringArray function ") + funcName);
-	std::string space(" ");
+	Py_ssize_t nSize;
+	const char * pszUtf8 = PyUnicode_AsUTF8AndSize( pyWord, &nSize );
+	if( pszUtf8 == NULL )
+	{
+		return NULL;
+	}
+
+	std::string sKey( pszUtf8, nSize );
+	std::unordered_map<std::string, std::string>::iterator it =
+		s_mapEncoded.find( sKey );
+	if( it != s_mapEncoded.end() )
+	{
+		return &it->second;
+	}
+
+	// this raises UnicodeEncodeError for characters Windows-1252 lacks
+	PyObject * pEncoded = PyUnicode_AsEncodedString( pyWord, "windows-1252", NULL );
+	if( pEncoded == NULL )
+	{
+		return NULL;
+	}
 
+	if( s_mapEncoded.size() >= MAX_ENCODED_WORDS )
+	{
+		s_mapEncoded.clear();
+	}
+	std::string & sEncoded = s_mapEncoded[ sKey ];
+	sEncoded.assign( PyBytes_AS_STRING( pEncoded ), PyBytes_GET_SIZE( pEncoded ) );
+	Py_DECREF( pEncoded );
+	return &sEncoded;
+}
 
+//---------------------------------------------------------------------------
+// This utility class takes a PyObject which reprents the arguments passed
+// to a Python routine and fills in an array of Windows-1252 strings with
+// the strings extracted from the Python argument.  The last entry in the
+// array will be a NULL pointer.
+//
+// Everything belongs to the CStringArgs, so it is freed when that goes out
+// of scope, also when the call fails.  ASCII strings (nearly all words) do
+// not need encoding: the array points into the Python strings, and we keep
+// a tuple with them so they stay alive while the Python lock is released.
+// The encoded forms of the other strings (from s_mapEncoded) are copied
+// into m_sBuffer.
+
+class CStringArgs
+{
+ public:
+	CStringArgs() : m_pItems( NULL ) { }
+	~CStringArgs() { Py_XDECREF( m_pItems ); }
+
+	// returns NULL, with a Python exception, on error
+	PCCHAR * parse( const char * funcName, PyObject * args );
+
+ protected:
+	PyObject * m_pItems;
+	std::vector<PCCHAR> m_vWords;
+	std::string m_sBuffer;
+};
+
+#define NOT_COPIED ((size_t)-1)
 
+PCCHAR * CStringArgs::parse( const char * funcName, PyObject * args )
+{
 	// make sure that we have at least one parameter
 	int len = PyTuple_Size( args );
 	if( len == 0 )
 	{
-		OutputDebugStringA((std::string(funcName)+" requires at least 1 argument").c_str());
 		PyErr_Format( PyExc_TypeError, "%s requires at least 1 argument", funcName );
 		return NULL;
 	}
 
 	// if we are passed exactly one list then we use the contents of that
 	// list instead of the passed tuple
-	BOOL bList = FALSE;
+	PyObject * pItems = args;
 	if( len == 1 )
 	{
 		PyObject * pFirst = PyTuple_GetItem( args, 0 );
 		if( PyList_Check( pFirst ) && PyList_Size( pFirst ) )
 		{
-			bList = TRUE;
-			args = pFirst;
-			len = PyList_Size( args );
+			pItems = pFirst;
 		}
 	}
 
-	// now we extract the strings
-	ppWords = new PCCHAR[ len + 1 ];
-	ppWords[len] = 0;
-	for( int i = 0; i < len; i++ )
+	// our own tuple (the same one when we got a tuple), a list could be
+	// changed by another thread
+	m_pItems = PySequence_Tuple( pItems );
+	if( m_pItems == NULL )
 	{
-		PyObject * pyWord =
-			bList ? PyList_GetItem( args, i ) :
-					PyTuple_GetItem( args, i );
+		return NULL;
+	}
+	len = (int)PyTuple_GET_SIZE( m_pItems );
 
-		if( !pyWord || !PyUnicode_Check( pyWord ) )
+	// now we extract the strings; the offsets of the copied ones are made
+	// pointers when m_sBuffer does not grow any more
+	std::vector<size_t> vOffsets( len, NOT_COPIED );
+	m_vWords.assign( len + 1, NULL );
+	for( int i = 0; i < len; i++ )
+	{
+		PyObject * pyWord = PyTuple_GET_ITEM( m_pItems, i );
+		if( !PyUnicode_Check( pyWord ) )
 		{
 			PyErr_Format( PyExc_TypeError, "all arguments passed to %s must be strings", funcName );
-			delete [] ppWords;
-			return 0;
+			return NULL;
 		}
 
-	
-		PyObject *encoded = PyUnicode_AsEncodedString(pyWord, "windows-1252", NULL);
-		if (encoded == NULL) {
-			PyErr_SetString(PyExc_UnicodeEncodeError, "Failed to encode input string using windows-1252 codec.");
-			Py_XDECREF(encoded);
-			delete [] ppWords;
-			return NULL;
+		if( PyUnicode_IS_ASCII( pyWord ) )
+		{
+			m_vWords[i] = (PCCHAR)PyUnicode_DATA( pyWord );
+			continue;
 		}
-		// TODO: Should be calling DECREF here, but PyBytes_AsString
-		// returns a pointer to internal data
 
-		char *converted = PyBytes_AsString(encoded);
-		output_message.append(space);
-		output_message.append(converted);
-		ppWords[i] = converted;
+		const std::string * pEncoded = encodeWord( pyWord );
+		if( pEncoded == NULL )
+		{
+			return NULL;
+		}
+		vOffsets[i] = m_sBuffer.size();
+		m_sBuffer.append( *pEncoded );
+		m_sBuffer.push_back( 0 );
+	}
+	for( int i = 0; i < len; i++ )
+	{
+		if( vOffsets[i] != NOT_COPIED )
+		{
+			m_vWords[i] = m_sBuffer.data() + vOffsets[i];
+		}
 	}
-	OutputDebugStringA(output_message.c_str());
 
+	if( g_nDebugLevel >= DEBUGLEVEL_ARGS )
+	{
+		std::string output_message( std::string( "arguments of " ) + funcName + ":" );
+		for( int i = 0; i < len; i++ )
+		{
+			output_message.append( " " );
+			output_message.append( m_vWords[i] );
+		}
+		OutputDebugStringA( output_message.c_str() );
+	}
 
-	return ppWords;
+	return &m_vWords[0];
 }
 
 //---------------------------------------------------------------------------
@@ -572,6 +656,103 @@ natlink_getCallbackDepth( PyObject *self, PyObject *args )
 	return pRetn;
 }
 
+//---------------------------------------------------------------------------
+// natlink.getCallbackInfo()
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+natlink_getCallbackInfo( PyObject *self, PyObject *args )
+{
+	if( !PyArg_ParseTuple( args, "" ) )
+	{
+		return NULL;
+	}
+
+	return cDragon.getCallbackInfo();
+}
+
+//---------------------------------------------------------------------------
+// natlink.setDebugLevel( level )
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+natlink_setDebugLevel( PyObject *self, PyObject *args )
+{
+	int nLevel;
+	if( !PyArg_ParseTuple( args, "i:setDebugLevel", &nLevel ) )
+	{
+		return NULL;
+	}
+
+	int nPrevious = g_nDebugLevel;
+	g_nDebugLevel = nLevel;
+	return Py_BuildValue( "i", nPrevious );
+}
+
+//---------------------------------------------------------------------------
+// natlink.setWakeupCallback( pCallback )
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+natlink_setWakeupCallback( PyObject *self, PyObject *args )
+{
+	PyObject *pFunc;
+	if( !PyArg_ParseTuple( args, "O:setWakeupCallback", &pFunc ) )
+	{
+		return NULL;
+	}
+
+	if( pFunc != Py_None && !PyCallable_Check( pFunc ) )
+	{
+		PyErr_SetString( PyExc_TypeError, "parameter must be callable" );
+		return NULL;
+	}
+
+	if( !cDragon.setWakeupCallback( pFunc ) )
+	{
+		return NULL;
+	}
+
+	Py_INCREF( Py_None );
+	return Py_None;
+}
+
+//---------------------------------------------------------------------------
+// natlink.postWakeup()
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+natlink_postWakeup( PyObject *self, PyObject *args )
+{
+	if( !PyArg_ParseTuple( args, "" ) )
+	{
+		return NULL;
+	}
+
+	return cDragon.postWakeup();
+}
+
+//---------------------------------------------------------------------------
+// natlink.getCallbackStats( reset )
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+natlink_getCallbackStats( PyObject *self, PyObject *args )
+{
+	int bReset = 0;
+	if( !PyArg_ParseTuple( args, "|i:getCallbackStats", &bReset ) )
+	{
+		return NULL;
+	}
+
+	return cDragon.getCallbackStats( bReset != 0 );
+}
+
 //---------------------------------------------------------------------------
 // natlink.execScript()
 //
@@ -581,7 +762,10 @@ natlink_getCallbackDepth( PyObject *self, PyObject *args )
 extern "C" static PyObject *
 natlink_execScript( PyObject *self, PyObject *args )
 {
-	OutputDebugStringA("natlink_execScript");
+	if( g_nDebugLevel >= DEBUGLEVEL_ARGS )
+	{
+		OutputDebugStringA("natlink_execScript");
+	}
 	char * pScript=0;
 	int pScriptLength=0;
 	PyObject * pList = NULL;
@@ -650,6 +834,54 @@ natlink_execScript( PyObject *self, PyObject *args )
 	return Py_None;
 }
 
+//---------------------------------------------------------------------------
+// natlink.execScriptAsync( script, comment )
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+natlink_execScriptAsync( PyObject *self, PyObject *args )
+{
+	char * pScript = NULL;
+	Py_ssize_t nScriptLength = 0;
+	char * pComment = NULL;
+	if( !PyArg_ParseTuple( args, "s#|s:execScriptAsync", &pScript, &nScriptLength, &pComment ) )
+	{
+		return NULL;
+	}
+
+	return cDragon.execScriptAsync( pScript, pComment );
+}
+
+//---------------------------------------------------------------------------
+// natlink.setExecutionCallback( pCallback )
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+natlink_setExecutionCallback( PyObject *self, PyObject *args )
+{
+	PyObject *pFunc;
+	if( !PyArg_ParseTuple( args, "O:setExecutionCallback", &pFunc ) )
+	{
+		return NULL;
+	}
+
+	if( pFunc != Py_None && !PyCallable_Check( pFunc ) )
+	{
+		PyErr_SetString( PyExc_TypeError, "parameter must be callable" );
+		return NULL;
+	}
+
+	if( !cDragon.setExecutionCallback( pFunc ) )
+	{
+		return NULL;
+	}
+
+	Py_INCREF( Py_None );
+	return Py_None;
+}
+
 //---------------------------------------------------------------------------
 // natlink.recognitionMimic()
 //
@@ -658,7 +890,8 @@ natlink_execScript( PyObject *self, PyObject *args )
 extern "C" static PyObject *
 natlink_recognitionMimic( PyObject *self, PyObject *args )
 {
-	PCCHAR * ppWords = parseStringArray( "recognitionMimic", args );
+	CStringArgs cWords;
+	PCCHAR * ppWords = cWords.parse( "recognitionMimic", args );
 	if( ppWords == NULL )
 	{
 		return NULL;
@@ -669,7 +902,6 @@ natlink_recognitionMimic( PyObject *self, PyObject *args )
 		return NULL;
 	}
 
-	delete [] ppWords;
 	Py_INCREF( Py_None );
 	return Py_None;
 }
@@ -683,16 +915,56 @@ extern "C" static PyObject *
 natlink_playEvents( PyObject *self, PyObject *args )
 {
 	PyObject * pList = NULL;
-	if( !PyArg_ParseTuple( args, "O:execScript", &pList ) )
+	if( !PyArg_ParseTuple( args, "O:playEvents", &pList ) )
 	{
 		return NULL;
 	}
 
+	// a buffer of packed 32 bit integers (array('I'), a NumPy array) has
+	// the layout of HOOK_EVENTMSG already, so we pass it on without copying
+	// it; we keep the buffer until the playback is done
+
+	if( !PyList_Check( pList ) && PyObject_CheckBuffer( pList ) )
+	{
+		Py_buffer view;
+		if( PyObject_GetBuffer( pList, &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT ) < 0 )
+		{
+			return NULL;
+		}
+
+		const char * pszFormat = view.format ? view.format : "B";
+		if( *pszFormat == '<' || *pszFormat == '=' || *pszFormat == '@' )
+		{
+			pszFormat++;
+		}
+		if( view.itemsize != sizeof(DWORD) || strchr( "IiLl", *pszFormat ) == NULL ||
+			pszFormat[1] != '\0' ||
+			view.len % sizeof(HOOK_EVENTMSG) != 0 )
+		{
+			PyBuffer_Release( &view );
+			PyErr_SetString(
+				PyExc_TypeError,
+				"a buffer passed to playEvents must hold 32 bit integers, three per event" );
+			return NULL;
+		}
+
+		BOOL bOK = cDragon.playEvents(
+			(DWORD)( view.len / sizeof(HOOK_EVENTMSG) ), (HOOK_EVENTMSG *)view.buf );
+		PyBuffer_Release( &view );
+		if( !bOK )
+		{
+			return NULL;
+		}
+
+		Py_INCREF( Py_None );
+		return Py_None;
+	}
+
 	if( !PyList_Check( pList ) )
 	{
 		PyErr_SetString(
 			PyExc_TypeError,
-			"the argument to playEvents must be a list of tuples" );
+			"the argument to playEvents must be a list of tuples or a buffer of integers" );
 		return NULL;
 	}
 
@@ -719,8 +991,9 @@ natlink_playEvents( PyObject *self, PyObject *args )
 		DWORD paramL = 0;
 		DWORD paramH = 0;
 		if( !PyArg_ParseTuple(
-			pTuple, "l|ll:execScript", &message, &paramL, &paramH ) )
+			pTuple, "l|ll:playEvents", &message, &paramL, &paramH ) )
 		{
+			delete [] pEvents;
 			return NULL;
 		}
 
@@ -1107,11 +1380,12 @@ natlink_addWord( PyObject *self, PyObject *args )
 	// Decode the pronunciations which is either mussing, a single string or
 	// a list of strings.
 
+	CStringArgs cProns;
 	PCCHAR * ppProns = NULL;
 	if( pyProns )
 	{
 		pyProns = Py_BuildValue( "(O)", pyProns );
-		ppProns = parseStringArray( "addWord", pyProns );
+		ppProns = cProns.parse( "addWord", pyProns );
 		Py_XDECREF( pyProns );
 		if( ppProns == NULL )
 		{
@@ -1119,12 +1393,7 @@ natlink_addWord( PyObject *self, PyObject *args )
 		}
 	}
 
-	PyObject * pRetn = cDragon.addWord( wordName, wordInfo, ppProns );
-	if( ppProns != NULL )
-	{
-		delete [] ppProns;
-	}
-	return pRetn;
+	return cDragon.addWord( wordName, wordInfo, ppProns );
 }
 
 //---------------------------------------------------------------------------
@@ -1358,7 +1627,8 @@ gramobj_setBeginCallback( PyObject *self, PyObject *args )
 }
 
 //---------------------------------------------------------------------------
-// gramObj = natlink.GramObj(); gramObj.setResultsCallback( pCallback ) from Python
+// gramObj = natlink.GramObj();
+// gramObj.setResultsCallback( pCallback, asyncResults ) from Python
 //
 // See natlink.txt for documentation.
 
@@ -1366,7 +1636,8 @@ extern "C" static PyObject *
 gramobj_setResultsCallback( PyObject *self, PyObject *args )
 {
 	PyObject *pFunc;
-	if( !PyArg_ParseTuple( args, "O:setResultsCallback", &pFunc ) )
+	int bAsync = 0;
+	if( !PyArg_ParseTuple( args, "O|i:setResultsCallback", &pFunc, &bAsync ) )
 	{
 		return NULL;
 	}
@@ -1378,11 +1649,128 @@ gramobj_setResultsCallback( PyObject *self, PyObject *args )
 	}
 
 	CGrammarObject * pObj = (CGrammarObject *)self;
-	if( !pObj->setResultsCallback( pFunc ) )
+	if( !pObj->setResultsCallback( pFunc, bAsync != 0 ) )
+	{
+		return NULL;
+	}
+
+	Py_INCREF( Py_None );
+	return Py_None;
+}
+
+//---------------------------------------------------------------------------
+// gramObj = natlink.GramObj();
+// gramObj.setResultsFilter( categories, grammars, maxScore ) from Python
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+gramobj_setResultsFilter( PyObject *self, PyObject *args )
+{
+	char * pszCategories = NULL;
+	PyObject * pGrammars = Py_None;
+	int nMaxScore = 0;
+	if( !PyArg_ParseTuple( args, "|zOi:setResultsFilter",
+			&pszCategories, &pGrammars, &nMaxScore ) )
+	{
+		return NULL;
+	}
+
+	// the categories are a string of the words own, other and reject
+
+	DWORD dwCategories = RESULTSFILTER_ALL;
+	if( pszCategories != NULL )
+	{
+		dwCategories = 0;
+		std::string categories( pszCategories );
+		size_t start = 0;
+		while( start < categories.size() )
+		{
+			size_t end = categories.find_first_of( " ,", start );
+			if( end == std::string::npos )
+			{
+				end = categories.size();
+			}
+			std::string word = categories.substr( start, end - start );
+			if( word == "own" )
+			{
+				dwCategories |= RESULTSFILTER_OWN;
+			}
+			else if( word == "other" )
+			{
+				dwCategories |= RESULTSFILTER_OTHER;
+			}
+			else if( word == "reject" )
+			{
+				dwCategories |= RESULTSFILTER_REJECT;
+			}
+			else if( !word.empty() )
+			{
+				PyErr_Format( PyExc_ValueError,
+					"unknown results category '%s' (expected own, other or reject)",
+					word.c_str() );
+				return NULL;
+			}
+			start = end + 1;
+		}
+	}
+
+	if( nMaxScore < 0 )
+	{
+		PyErr_SetString( PyExc_ValueError, "maxScore can not be negative" );
+		return NULL;
+	}
+
+	// the grammars are a sequence of loaded GramObj instances; we remember
+	// their GUIDs
+
+	CGrammarObject * pObj = (CGrammarObject *)self;
+
+	if( pGrammars == Py_None )
+	{
+		pObj->setResultsFilter( dwCategories, NULL, 0, nMaxScore );
+		Py_INCREF( Py_None );
+		return Py_None;
+	}
+
+	PyObject * pSeq = PySequence_Fast(
+		pGrammars, "grammars must be a sequence of GramObj instances" );
+	if( pSeq == NULL )
 	{
 		return NULL;
 	}
 
+	Py_ssize_t nGrammars = PySequence_Fast_GET_SIZE( pSeq );
+	std::vector<GUID> guids( nGrammars ? nGrammars : 1 );
+	for( Py_ssize_t i = 0; i < nGrammars; i++ )
+	{
+		PyObject * pItem = PySequence_Fast_GET_ITEM( pSeq, i );
+		if( Py_TYPE( pItem ) != Py_TYPE( self ) )
+		{
+			Py_DECREF( pSeq );
+			PyErr_SetString( PyExc_TypeError,
+				"grammars must be a sequence of GramObj instances" );
+			return NULL;
+		}
+		if( ((CGrammarObject *)pItem)->m_pISRGramCommon == NULL )
+		{
+			Py_DECREF( pSeq );
+			reportError( errNatError,
+				"Grammar %d passed to GramObj.setResultsFilter is not loaded",
+				(int)i );
+			return NULL;
+		}
+		if( !((CGrammarObject *)pItem)->getGrammarGuid( &guids[i] ) )
+		{
+			Py_DECREF( pSeq );
+			return NULL;
+		}
+	}
+	Py_DECREF( pSeq );
+
+	pObj->setResultsFilter(
+		dwCategories, guids.data(), (DWORD)nGrammars, nMaxScore );
+
 	Py_INCREF( Py_None );
 	return Py_None;
 }
@@ -1566,6 +1954,7 @@ static struct PyMethodDef gramobj_methods[] = {
 	{ "deactivate", gramobj_deactivate, METH_VARARGS },
 	{ "setBeginCallback", gramobj_setBeginCallback, METH_VARARGS },
 	{ "setResultsCallback", gramobj_setResultsCallback, METH_VARARGS },
+	{ "setResultsFilter", gramobj_setResultsFilter, METH_VARARGS },
 	{ "setHypothesisCallback", gramobj_setHypothesisCallback, METH_VARARGS },
 	{ "emptyList", gramobj_emptyList, METH_VARARGS },
 	{ "appendList", gramobj_appendList, METH_VARARGS },
@@ -1702,6 +2091,24 @@ resobj_getResults( PyObject *self, PyObject *args )
 	return pRetn;
 }
 
+//---------------------------------------------------------------------------
+// ResObj.alternates( limit )
+//
+// See natlink.txt for documentation.
+
+extern "C" static PyObject *
+resobj_alternates( PyObject *self, PyObject *args )
+{
+	int nLimit = 0;
+	if( !PyArg_ParseTuple( args, "|i:alternates", &nLimit ) )
+	{
+		return NULL;
+	}
+
+	CResultObject * pObj = (CResultObject *)self;
+	return pObj->getAlternates( nLimit );
+}
+
 //---------------------------------------------------------------------------
 // ResObj.getWords()
 //
@@ -1733,20 +2140,15 @@ resobj_getWords( PyObject *self, PyObject *args )
 extern "C" static PyObject *
 resobj_correction( PyObject *self, PyObject *args )
 {
-	PCCHAR * ppWords = parseStringArray( "correction", args );
+	CStringArgs cWords;
+	PCCHAR * ppWords = cWords.parse( "correction", args );
 	if( ppWords == NULL )
 	{
 		return NULL;
 	}
 
 	CResultObject * pObj = (CResultObject *)self;
-	PyObject * pRetn = pObj->correction( ppWords );
-	if( pRetn == NULL )
-	{
-		return NULL;
-	}
-	delete [] ppWords;
-	return pRetn;
+	return pObj->correction( ppWords );
 }
 
 //---------------------------------------------------------------------------
@@ -1824,6 +2226,7 @@ resobj_getSelectInfo( PyObject *self, PyObject *args )
 
 static struct PyMethodDef resobj_methods[] = {
 	{ "getResults", resobj_getResults, METH_VARARGS },
+	{ "alternates", resobj_alternates, METH_VARARGS },
 	{ "getWords", resobj_getWords, METH_VARARGS },
 	{ "correction", resobj_correction, METH_VARARGS },
 	{ "getWave", resobj_getWave, METH_VARARGS },
@@ -2327,13 +2730,20 @@ static struct PyMethodDef natlink_methods[] = {
 	{ "getMicState", natlink_getMicState, METH_VARARGS },
 	{ "setMicState", natlink_setMicState, METH_VARARGS },
 	{ "getCallbackDepth", natlink_getCallbackDepth, METH_VARARGS },
+	{ "getCallbackStats", natlink_getCallbackStats, METH_VARARGS },
+	{ "getCallbackInfo", natlink_getCallbackInfo, METH_VARARGS },
 	{ "execScript", natlink_execScript, METH_VARARGS },
+	{ "execScriptAsync", natlink_execScriptAsync, METH_VARARGS },
+	{ "setExecutionCallback", natlink_setExecutionCallback, METH_VARARGS },
 	{ "recognitionMimic", natlink_recognitionMimic, METH_VARARGS },
 	{ "playEvents", natlink_playEvents, METH_VARARGS },
 	{ "getCursorPos", natlink_getCursorPos, METH_VARARGS },
 	{ "getScreenSize", natlink_getScreenSize, METH_VARARGS },
 	{ "inputFromFile", natlink_inputFromFile, METH_VARARGS },
 	{ "setTimerCallback", natlink_setTimerCallback, METH_VARARGS },
+	{ "setWakeupCallback", natlink_setWakeupCallback, METH_VARARGS },
+	{ "setDebugLevel", natlink_setDebugLevel, METH_VARARGS },
+	{ "postWakeup", natlink_postWakeup, METH_VARARGS },
 	{ "getTrainingMode", natlink_getTrainingMode, METH_VARARGS },
 	{ "startTraining", natlink_startTraining, METH_VARARGS },
 	{ "finishTraining", natlink_finishTraining, METH_VARARGS },
@@ -17,6 +17,9 @@ import contextlib
 import win32api
 import win32gui
 from dtactions.vocola_sendkeys import ext_keys   ### , SendInput
+from natlink import keyprogram
+from natlink import scriptbatch
+from natlink.scripttemplate import ScriptTemplate
 W32OutputDebugString = ctypes.windll.kernel32.OutputDebugStringW
 
 #copied from pydebugstring.  
@@ -63,6 +66,7 @@ try:
     from _natlink_core import *
 
     from _natlink_core import execScript as _execScript
+    from _natlink_core import execScriptAsync as _execScriptAsync
     from _natlink_core import playString as _playString
     from _natlink_core import playEvents as _playEvents
     from _natlink_core import recognitionMimic as _recognitionMimic
@@ -79,9 +83,17 @@ def playString(a, hook=0):
     """
     # return _playString(toWindowsEncoding(a), hook)
     if hook:
-        return execScript(f'SendSystemKeys("{a}")')
-    # normal case:
-    return ext_keys.send_input(a)
+        return _sendSystemKeys.execute(keys=a)
+    # normal case: the compiled program from the cache, ext_keys for
+    # notation the compiler does not know
+    try:
+        return keyprogram.playKeys(a)
+    except keyprogram.KeyCompileError:
+        keyprogram.flushKeys()
+        return ext_keys.send_input(a)
+
+
+_sendSystemKeys = ScriptTemplate('SendSystemKeys("$keys")')
 
 
 def playEvents16(events):
@@ -89,25 +101,55 @@ def playEvents16(events):
     """
     print("Deprecated, playEvents on Dragon16 cannot be used any more")
 
+_canPlayEvents = None
+
 def playEvents(a):
     """causes a halt (ESP error) in Dragon 16.
+
+    a is a list of (message, paramL, paramH) tuples or a buffer of packed 32 bit
+    integers, three per event (array('I'), NumPy).  The Dragon version is looked
+    up once.
     """
-    if getDNSVersion() >= 16:
+    global _canPlayEvents     #pylint:disable=W0603
+    if _canPlayEvents is None:
+        _canPlayEvents = getDNSVersion() < 16
+    if not _canPlayEvents:
         playEvents16(a)
         return None
+    keyprogram.flushKeys()
     return _playEvents(a)
 
 def execScript(script,args=None):
     #only encode the script.  can't find a single case of anyone using the args
+    #bytes (from ScriptTemplate.render) are already encoded
     if args is None:
         args = []
     else:
         ## added QH:
         outputDebugString(f'execScript, args found: {args}!!!!')
-    script_w=toWindowsEncoding(script)
+    script_w=script if isinstance(script, bytes) else toWindowsEncoding(script)
+    keyprogram.flushKeys()
     return _execScript(script_w,args)    
 
 
+def execScriptBatch(statements):
+    """run script statements joined in as few execScript calls as possible
+
+    See natlink.scriptbatch; raises scriptbatch.ScriptBatchError with the index
+    of the failing statement.
+    """
+    return scriptbatch.execScriptBatch(statements)
+
+
+def execScriptAsync(script, timeout=None, token=None):
+    """start a script without waiting for it; returns a concurrent.futures.Future
+
+    See natlink.asyncscript; the future is completed on the natlink thread.
+    """
+    from natlink import asyncscript     #pylint:disable=C0415
+    return asyncscript.getScriptRunner().execScriptAsync(script, timeout, token)
+
+
 def toWindowsEncoding(str_to_encode):
     return str_to_encode.encode('Windows-1252')
 
@@ -157,6 +199,16 @@ def NatlinkConnector():
     natDisconnect()
 
 
+def runOnMain(function, *args, **keywords):
+    """call function(*args, **keywords) on the natlink thread, from any thread
+
+    returns a concurrent.futures.Future; natlink.mainthread.install() must have
+    been called on the natlink thread first.
+    """
+    from natlink import mainthread   #pylint:disable=C0415
+    return mainthread.runOnMain(function, *args, **keywords)
+
+
 # def _test_playEvents():
 #     """perform a few mouse moves
 #     """
@@ -1,4 +1,4 @@
-from typing import Optional, Callable, Any, Union, List, Tuple, Sequence
+from typing import Optional, Callable, Any, Union, List, Tuple, Sequence, Dict
 
 
 def playString(keys: str, flags: int = ...) -> None: ...
@@ -22,16 +22,28 @@ def getMicState() -> str: ...
 def setMicState(newState: str) -> None: ...
 
 
-def execScript(command: str, args: List[str] = ..., comment: str = ...) -> None: ...
+def execScript(command: Union[str, bytes], args: List[str] = ..., comment: str = ...) -> None: ...
+
+
+def execScriptAsync(script: Union[str, bytes], comment: str = ...) -> int: ...
+
+
+def setExecutionCallback(pCallback: Optional[Callable[[int, str, int, int], Any]]) -> None: ...
 
 
 def getCallbackDepth() -> int: ...
 
 
+def getCallbackInfo() -> Optional[Tuple[int, float, int, Callable[..., Any], int]]: ...
+
+
+def getCallbackStats(reset: int = 0) -> Dict[Union[str, 'GramObj'], Dict[str, Dict[str, int]]]: ...
+
+
 def recognitionMimic(words: List[str]) -> None: ...
 
 
-def playEvents(events: List[Tuple[int, int, int]]) -> None: ...
+def playEvents(events: Union[List[Tuple[int, int, int]], memoryview, bytes, bytearray, Any]) -> None: ...
 
 
 def getCursorPos() -> Tuple[int, int]: ...
@@ -47,6 +59,15 @@ def inputFromFile(fileName: str, realtime: int = ..., playlist: Sequence[Union[i
 def setTimerCallback(pCallback: Optional[Callable[[], Any]], nMilliseconds: int) -> None: ...
 
 
+def setWakeupCallback(pCallback: Optional[Callable[[], Any]]) -> None: ...
+
+
+def postWakeup() -> int: ...
+
+
+def setDebugLevel(level: int) -> int: ...
+
+
 def getTrainingMode() -> Optional[Tuple[str, int]]: ...
 
 
@@ -121,7 +142,11 @@ class GramObj:
 
     def setBeginCallBack(self, callback: Optional[Callable[[Tuple[str, str, int]], None]]) -> None: ...
 
-    def setResultsCallBack(self, callback: Optional[Callable[[List[Tuple[str, int]], 'ResObj'], None]]) -> None: ...
+    def setResultsCallBack(self, callback: Optional[Callable[[List[Tuple[str, int]], 'ResObj'], None]],
+                           asyncResults: int = 0) -> None: ...
+
+    def setResultsFilter(self, categories: Optional[str] = None, grammars: Optional[Sequence['GramObj']] = None,
+                         maxScore: int = 0) -> None: ...
 
     def setHypothesisCallBack(self, callback: Optional[Callable[[List[str]], None]]) -> None: ...
 
@@ -140,11 +165,13 @@ class ResObj:
 
     def getResults(self, choice: int = 0) -> Optional[List[Tuple[str, int]]]: ...
 
+    def alternates(self, limit: int = 0) -> List[List[Tuple[str, int]]]: ...
+
     def getWords(self, choice: int = 0) -> Optional[List[str]]: ...
 
     def correction(self, words: List[str]) -> None: ...
 
-    def getWave(self) -> str: ...
+    def getWave(self) -> bytes: ...
 
     def getWordInfo(self, choice: int = 0) -> Optional[List[Tuple[str, int, int, int, int, int, str]]]: ...
 
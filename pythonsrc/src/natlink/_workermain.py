@@ -0,0 +1,38 @@
+"""The loop of a natlink.processworkers worker process.
+
+The workers run this file with runpy.run_path, with workerArgs in its
+globals, so only the standard library is loaded next to the handlers.
+"""
+#pylint:disable=W0718
+
+import pickle
+import traceback
+from multiprocessing import shared_memory
+
+
+def workerMain(taskQueue, resultConn, shmName, slotSize):
+    """run the tasks of taskQueue until it gives None"""
+    shm = shared_memory.SharedMemory(name=shmName)
+    try:
+        while True:
+            task = taskQueue.get()
+            if task is None:
+                return
+            taskId, handler, slot, length, inline = task
+            try:
+                if slot >= 0:
+                    start = slot * slotSize
+                    data = bytes(shm.buf[start:start + length])
+                else:
+                    data = inline
+                words, wordInfo = pickle.loads(data)
+                resultConn.send((taskId, True, handler(words, wordInfo)))
+            except Exception:
+                resultConn.send((taskId, False, traceback.format_exc()))
+    finally:
+        shm.close()
+        resultConn.close()
+
+
+if __name__ == '__natlink_worker__':
+    workerMain(*workerArgs)     #pylint:disable=E0602
@@ -0,0 +1,178 @@
+"""An asyncio event loop driven by natlink.
+
+Natlink calls Python from its own thread, from the message loop of NatSpeak
+(or of natlink.waitForSpeech); there is no place where a normal asyncio
+loop could run_forever.  NatlinkEventLoop is an asyncio selector loop which
+is run a few steps at a time instead: from the natlink timer callback and
+from every results or begin callback made through coroutineCallback.  While
+NatSpeak is idle the loop does not block, it only runs what is ready.
+
+Typical use::
+
+    from natlink import asyncloop
+
+    loop = asyncloop.install()
+
+    async def gotResults(words, resObj):
+        text = resObj.getResults(0)     # the ResObj is valid until the first await
+        reply = await fetchSomething(text)
+        ...
+
+    gramObj.setResultsCallback(asyncloop.coroutineCallback(gotResults))
+
+coroutineCallback starts the coroutine at once, inside the callback, so the
+code before the first await can still use the ResObj.  Handlers which wait
+for io overlap instead of running one after the other on the callback
+thread.  Worker threads hand work to the loop with callSoonThreadsafe; it
+is picked up at the next timer tick.
+
+install() drives the loop with a periodic timer of the natlink timer
+service (natlink.timerservice); pass another setTimer function to drive the
+loop from something else.
+"""
+#pylint:disable=W0718
+
+import asyncio
+import traceback
+
+DEFAULT_INTERVAL = 50           # milliseconds between timer ticks
+MAX_STEPS = 100                 # loop iterations per runOnce, at most
+
+
+class NatlinkEventLoop(asyncio.SelectorEventLoop):
+    """a selector event loop which is stepped from natlink callbacks
+
+    runOnce runs the callbacks which are ready (and polls the selector
+    without waiting); startPump makes a timer call runOnce regularly.
+    """
+    def __init__(self, selector=None):
+        super().__init__(selector)
+        self._setTimer = None
+
+    def runOnce(self):
+        """run the ready callbacks of the loop without blocking
+
+        Runs loop iterations until nothing is ready or MAX_STEPS iterations
+        have been run; does nothing when called from inside the loop.
+        """
+        if self.is_running() or self.is_closed():
+            return
+        for _ in range(MAX_STEPS):
+            # stop is processed after the callbacks which are ready now, so
+            # this runs exactly one iteration
+            self.call_soon(self.stop)
+            self.run_forever()
+            if not self._ready:
+                return
+
+    def startPump(self, interval=DEFAULT_INTERVAL, setTimer=None):
+        """call runOnce every interval milliseconds
+
+        setTimer(callback, interval) installs the timer, with callback None
+        it removes it again; it defaults to the 'asyncloop' timer of the
+        natlink timer service.
+        """
+        if setTimer is None:
+            from natlink import timerservice        #pylint:disable=C0415
+            setTimer = timerservice.getTimerService().timerSlot('asyncloop')
+        self.stopPump()
+        self._setTimer = setTimer
+        setTimer(self.runOnce, interval)
+
+    def stopPump(self):
+        """remove the timer set by startPump"""
+        if self._setTimer is not None:
+            setTimer, self._setTimer = self._setTimer, None
+            setTimer(None, 0)
+
+    def close(self):
+        self.stopPump()
+        super().close()
+
+
+class NatlinkEventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    """an event loop policy which creates NatlinkEventLoop instances"""
+    def new_event_loop(self):
+        return NatlinkEventLoop()
+
+
+_loop = None
+
+
+def install(interval=DEFAULT_INTERVAL, setTimer=None):
+    """create the natlink event loop, make it current and start pumping it
+
+    Returns the loop; calling install again returns the same loop.
+    """
+    global _loop        #pylint:disable=W0603
+    if _loop is None or _loop.is_closed():
+        asyncio.set_event_loop_policy(NatlinkEventLoopPolicy())
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+        _loop.startPump(interval, setTimer)
+    return _loop
+
+
+def uninstall():
+    """stop pumping and close the natlink event loop, for instance at natDisconnect"""
+    global _loop        #pylint:disable=W0603
+    loop, _loop = _loop, None
+    if loop is not None and not loop.is_closed():
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+        loop.runOnce()
+        loop.close()
+    asyncio.set_event_loop_policy(None)
+
+
+def getLoop():
+    """return the natlink event loop (None before install)"""
+    return _loop
+
+
+def callSoonThreadsafe(callback, *args):
+    """schedule callback(*args) on the natlink event loop from any thread
+
+    The callback runs on the natlink thread, at the next timer tick.
+    """
+    if _loop is None:
+        raise RuntimeError('the natlink event loop is not installed')
+    return _loop.call_soon_threadsafe(callback, *args)
+
+
+def _reportTaskError(task):
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        print(f'error in coroutine callback {task.get_name()}:')
+        traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
+def startCoroutine(coroutine, loop=None):
+    """run a coroutine on the natlink event loop, returns its Task
+
+    The coroutine is started at once, up to its first await.  Exceptions
+    are printed with a traceback.
+    """
+    loop = loop or _loop
+    if loop is None:
+        raise RuntimeError('the natlink event loop is not installed')
+    task = loop.create_task(coroutine)
+    task.add_done_callback(_reportTaskError)
+    loop.runOnce()
+    return task
+
+
+def coroutineCallback(coroutineFunction, loop=None):
+    """wrap an async function so it can be used as a natlink callback
+
+    The returned function can be passed to setResultsCallback,
+    setBeginCallback and the like; every call starts a task on the natlink
+    event loop.
+    """
+    def callback(*args):
+        startCoroutine(coroutineFunction(*args), loop)
+    callback.__name__ = getattr(coroutineFunction, '__name__', 'callback')
+    callback.__doc__ = getattr(coroutineFunction, '__doc__', None)
+    return callback
@@ -0,0 +1,150 @@
+"""Asynchronous results callbacks.
+
+A normal results callback holds up the recognizer: NatSpeak does not start
+the next recognition until the callback has returned.  For a grammar whose
+results are handled by slow code (a database lookup, a network request, a
+large log) this makes the next utterance wait.
+
+setResultsCallback(callback, 1) on a GramObj (see natlink.txt) makes the
+results callback of that grammar asynchronous: natlink still calls the
+callback on its own thread, but releases the recognizer at once and lets
+Python threads run while NatSpeak is idle.
+
+setAsyncResultsCallback builds on that.  The callback registered on the
+grammar only takes a snapshot of the results (the words, and optionally the
+word information) and queues the handler; the handler runs on a worker
+thread.  Handlers of the same grammar run one at a time and in the order of
+the recognitions, handlers of different grammars can run at the same time::
+
+    def gotResults(words, wordInfo):
+        ...                 # runs on a worker thread
+
+    setAsyncResultsCallback(gramObj, gotResults, wordInfo=True)
+
+The ResObj is not passed to the handler: it is a COM object which can only be
+used on the natlink thread, during the callback.
+"""
+#pylint:disable=W0718
+
+import collections
+import concurrent.futures
+import threading
+import traceback
+
+DEFAULT_WORKERS = 4
+
+
+class KeyedExecutor:
+    """runs functions on a thread pool, serially per key
+
+    Functions submitted with the same key run one after the other, in the
+    order they were submitted; functions with different keys run in
+    parallel on up to maxWorkers threads.
+    """
+    def __init__(self, maxWorkers=DEFAULT_WORKERS):
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=maxWorkers, thread_name_prefix='natlink results')
+        self._lock = threading.Lock()
+        self._pending = {}          # key -> deque of (future, fn, args)
+
+    def submit(self, key, fn, *args):
+        """queue fn(*args) behind the earlier functions of key, returns a Future"""
+        future = concurrent.futures.Future()
+        with self._lock:
+            queue = self._pending.get(key)
+            if queue is not None:
+                queue.append((future, fn, args))
+                return future
+            self._pending[key] = collections.deque([(future, fn, args)])
+        try:
+            self._pool.submit(self._drain, key)
+        except RuntimeError as exc:
+            # the pool is shut down: nothing will drain the queue of key
+            with self._lock:
+                queue = self._pending.pop(key)
+            for queued, _, _ in queue:
+                queued.set_exception(exc)
+        return future
+
+    def _drain(self, key):
+        while True:
+            with self._lock:
+                queue = self._pending[key]
+                if not queue:
+                    del self._pending[key]
+                    return
+                future, fn, args = queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+
+    def pendingCount(self, key=None):
+        """the number of queued (not yet started) functions, of key or of all keys"""
+        with self._lock:
+            if key is not None:
+                return len(self._pending.get(key, ()))
+            return sum(len(queue) for queue in self._pending.values())
+
+    def shutdown(self, wait=True):
+        """stop accepting work; with wait, run the queued functions first"""
+        self._pool.shutdown(wait=wait)
+
+
+_executor = None
+_executorLock = threading.Lock()
+
+
+def getExecutor():
+    """return the executor used by setAsyncResultsCallback, started on first use"""
+    global _executor        #pylint:disable=W0603
+    with _executorLock:
+        if _executor is None:
+            _executor = KeyedExecutor()
+        return _executor
+
+
+def shutdown(wait=True):
+    """stop the workers of setAsyncResultsCallback, for instance at natDisconnect"""
+    global _executor        #pylint:disable=W0603
+    with _executorLock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait)
+
+
+def _runHandler(handler, words, wordInfo):
+    try:
+        handler(words, wordInfo)
+    except Exception:
+        print(f'error in asynchronous results handler {handler!r}:')
+        traceback.print_exc()
+
+
+def setAsyncResultsCallback(gramObj, handler, wordInfo=False, executor=None):
+    """handle the results of gramObj on a worker thread
+
+    handler(words, wordInfo) is called with the words of the recognition (a
+    list of (word, ruleNumber) tuples, or 'other' or 'reject' for a grammar
+    loaded with allResults) and, when wordInfo is true, the list returned by
+    ResObj.getWordInfo(0) (None if it is not available).  Pass None as
+    handler to remove the callback.  Returns the callback which was set on
+    the grammar.
+    """
+    if handler is None:
+        gramObj.setResultsCallback(None)
+        return None
+
+    def gotResults(words, resObj):
+        info = None
+        if wordInfo and resObj is not None:
+            try:
+                info = resObj.getWordInfo(0)
+            except Exception:
+                info = None
+        (executor or getExecutor()).submit(id(gramObj), _runHandler, handler, words, info)
+
+    gramObj.setResultsCallback(gotResults, 1)
+    return gotResults
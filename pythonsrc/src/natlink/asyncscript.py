@@ -0,0 +1,158 @@
+"""Run Dragon scripts without waiting for them.
+
+execScriptAsync starts a script and returns a ScriptFuture at once; the
+future is done when NatSpeak reports the script done (result None) or
+aborted (ScriptAborted).  A ScriptRunner owns natlink.setExecutionCallback::
+
+    future = natlink.execScriptAsync('SendSystemKeys "{Alt+Tab}"\nWait 500', timeout=5)
+    future.add_done_callback(lambda f: print('done', f.exception()))
+
+getScriptRunner returns the runner natlink.execScriptAsync uses, uninstall
+gives the callback back.
+"""
+#pylint:disable=W0718
+
+from concurrent.futures import Future
+
+ENCODING = 'windows-1252'
+
+# the status bits of ExecutionStatus
+STATUS_ALLOWHEARDWORD = 0x1
+STATUS_ALLOWUSERINPUT = 0x2
+
+
+class ScriptAborted(Exception):
+    """NatSpeak aborted a script of execScriptAsync"""
+    def __init__(self, clientCode, errorCode, lineNumber):
+        super().__init__(f'Error {errorCode} executing script {clientCode} (line {lineNumber})')
+        self.clientCode = clientCode
+        self.errorCode = errorCode
+        self.lineNumber = lineNumber
+
+
+class ScriptFuture(Future):
+    """the Future of a script; clientCode and status are set by the ScriptRunner"""
+    def __init__(self, script):
+        super().__init__()
+        self.script = script
+        self.clientCode = None
+        self.status = 0
+
+
+class ScriptRunner:
+    """starts scripts with execScriptAsync and completes their futures
+
+    execScriptAsync(script) starts an encoded script and returns its client
+    code, setExecutionCallback(callback) installs the callback; they default
+    to the natlink functions (then keys buffered by playString are sent
+    before a script starts).  timerService (for timeouts) defaults to the
+    one of natlink.timerservice.
+    """
+    def __init__(self, execScriptAsync=None, setExecutionCallback=None, timerService=None,
+                 flushKeys=None):
+        if execScriptAsync is None or setExecutionCallback is None:
+            import natlink      #pylint:disable=C0415
+            from natlink import keyprogram      #pylint:disable=C0415
+            if execScriptAsync is None:
+                execScriptAsync = natlink._execScriptAsync      #pylint:disable=W0212
+                flushKeys = flushKeys or keyprogram.flushKeys
+            setExecutionCallback = setExecutionCallback or natlink.setExecutionCallback
+        self._execScriptAsync = execScriptAsync
+        self._setExecutionCallback = setExecutionCallback
+        self._timerService = timerService
+        self._flushKeys = flushKeys or (lambda: 0)
+        self._futures = {}          # clientCode -> ScriptFuture
+        self._timers = {}           # clientCode -> Timer
+        self._closed = False
+        setExecutionCallback(self._onExecution)
+
+    def execScriptAsync(self, script, timeout=None, token=None, comment=None):
+        """start script (str, or bytes in Windows-1252); returns a ScriptFuture"""
+        if self._closed:
+            raise RuntimeError('the script runner is closed')
+        if token is not None:
+            token.check()
+        encoded = script if isinstance(script, bytes) else script.encode(ENCODING)
+        self._flushKeys()
+        if comment is None:
+            clientCode = self._execScriptAsync(encoded)
+        else:
+            clientCode = self._execScriptAsync(encoded, comment)
+        future = ScriptFuture(script)
+        future.clientCode = clientCode
+        self._futures[clientCode] = future
+        if timeout is not None:
+            if self._timerService is None:
+                from natlink import timerservice        #pylint:disable=C0415
+                self._timerService = timerservice.getTimerService()
+            self._timers[clientCode] = self._timerService.callLater(
+                timeout, lambda: self._onTimeout(clientCode, timeout),
+                name=f'asyncscript.timeout.{clientCode}')
+        future.add_done_callback(self._forget)
+        if token is not None:
+            token.onCancel(lambda _token: future.cancel())
+        return future
+
+    def pending(self):
+        """return the number of scripts whose future is not done"""
+        return len(self._futures)
+
+    def _forget(self, future):
+        # a late ExecutionDone of a timed out or cancelled script finds nothing
+        clientCode = future.clientCode
+        if self._futures.get(clientCode) is future:
+            del self._futures[clientCode]
+        timer = self._timers.pop(clientCode, None)
+        if timer is not None and self._timerService is not None:
+            self._timerService.cancel(timer)
+
+    def _onTimeout(self, clientCode, timeout):
+        self._timers.pop(clientCode, None)
+        future = self._futures.get(clientCode)
+        if future is not None and future.set_running_or_notify_cancel():
+            future.set_exception(TimeoutError(
+                f'script {clientCode} did not finish within {timeout} seconds'))
+
+    def _onExecution(self, clientCode, event, code, lineNumber):
+        """the execution callback: event is 'done', 'aborted' or 'status'"""
+        future = self._futures.get(clientCode)
+        if future is None:
+            return
+        if event == 'status':
+            future.status = code
+            return
+        if not future.set_running_or_notify_cancel():
+            return      # cancelled; _forget has run
+        if event == 'aborted':
+            future.set_exception(ScriptAborted(clientCode, code, lineNumber))
+        else:
+            future.set_result(None)
+
+    def close(self):
+        """give back the execution callback and cancel the futures which are not done"""
+        if self._closed:
+            return
+        self._closed = True
+        self._setExecutionCallback(None)
+        for future in list(self._futures.values()):
+            future.cancel()
+        self._futures.clear()
+
+
+_runner = None
+
+
+def getScriptRunner():
+    """return the ScriptRunner used by natlink.execScriptAsync, made on first use"""
+    global _runner      #pylint:disable=W0603
+    if _runner is None:
+        _runner = ScriptRunner()
+    return _runner
+
+
+def uninstall():
+    """close the ScriptRunner, for instance at natDisconnect"""
+    global _runner      #pylint:disable=W0603
+    runner, _runner = _runner, None
+    if runner is not None:
+        runner.close()
@@ -0,0 +1,153 @@
+"""Watchdog for slow natlink callbacks.
+
+CallbackWatchdog polls natlink.getCallbackInfo from a thread; when a callback
+runs longer than budget seconds it samples the stack of the natlink thread
+and writes a report in the folded stack format flame graph tools read::
+
+    from natlink.callbackwatchdog import CallbackWatchdog
+
+    watchdog = CallbackWatchdog(budget=0.25, reportPath='slowcallbacks.folded')
+    watchdog.start()
+"""
+#pylint:disable=W0718
+
+import collections
+import os
+import sys
+import threading
+import time
+
+DEFAULT_BUDGET = 0.25           # seconds a callback may take before sampling
+DEFAULT_INTERVAL = 0.01         # seconds between samples (and between polls)
+MAX_DEPTH = 64                  # frames per stack, innermost are kept
+
+SlowCallback = collections.namedtuple(
+    'SlowCallback', 'serial name utteranceId duration samples')
+SlowCallback.__doc__ = """The report of one slow callback.
+
+serial is the callback serial number of natlink.getCallbackInfo, name
+describes the callback, utteranceId is the number of the recognition (0 if
+the callback is not a results callback), duration is in seconds and
+samples is a Counter of folded stacks.
+"""
+
+
+def describeCallback(callback):
+    """return a readable name of a callback, with the grammar for a bound method"""
+    owner = getattr(callback, '__self__', None)
+    function = getattr(callback, '__func__', callback)
+    name = getattr(function, '__qualname__', None) or repr(callback)
+    if owner is not None:
+        gramName = getattr(owner, 'name', None) or getattr(owner, 'gramName', None)
+        if isinstance(gramName, str) and gramName:
+            return f'{gramName}:{name}'
+    return name
+
+
+def foldStack(frame, root=None, maxDepth=MAX_DEPTH):
+    """return the folded form (outermost frame first) of the stack of frame"""
+    frames = []
+    while frame is not None and len(frames) < maxDepth:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    if root:
+        frames.append(root)
+    frames.reverse()
+    return ';'.join(frame.replace(';', ',') for frame in frames)
+
+
+class CallbackWatchdog:
+    """samples the Python stack of natlink callbacks which take too long
+
+    Reports are appended to reportPath (if given) and passed to onReport
+    (if given); the last reports are also kept in the reports attribute.
+    getCallbackInfo defaults to natlink.getCallbackInfo.
+    """
+    def __init__(self, budget=DEFAULT_BUDGET, interval=DEFAULT_INTERVAL,
+                 reportPath=None, onReport=None, getCallbackInfo=None, keepReports=20):
+        if getCallbackInfo is None:
+            import natlink      #pylint:disable=C0415
+            getCallbackInfo = natlink.getCallbackInfo
+        self.budget = budget
+        self.interval = interval
+        self.reportPath = reportPath
+        self.onReport = onReport
+        self.reports = collections.deque(maxlen=keepReports)
+        self._getCallbackInfo = getCallbackInfo
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """start the watchdog thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch,
+                                            name='natlink callback watchdog', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """stop the watchdog thread"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _watch(self):
+        current = None          # (serial, name, utteranceId, Counter) of a slow callback
+        lastElapsed = 0.0
+        while not self._stop.wait(self.interval):
+            try:
+                info = self._getCallbackInfo()
+            except Exception:
+                info = None
+            if current is not None and (info is None or info[0] != current[0]):
+                self._report(current, lastElapsed)
+                current = None
+            if info is None:
+                continue
+            serial, elapsed, threadId, callback, utteranceId = info
+            lastElapsed = elapsed
+            if elapsed < self.budget:
+                continue
+            if current is None:
+                current = (serial, describeCallback(callback), utteranceId, collections.Counter())
+            frame = sys._current_frames().get(threadId)      #pylint:disable=W0212
+            if frame is not None:
+                current[3][foldStack(frame, current[1])] += 1
+        if current is not None:
+            self._report(current, lastElapsed)
+
+    def _report(self, current, elapsed):
+        serial, name, utteranceId, samples = current
+        # the callback ended between this poll and the last one
+        report = SlowCallback(serial, name, utteranceId, elapsed + self.interval, samples)
+        self.reports.append(report)
+        if self.reportPath:
+            try:
+                with open(self.reportPath, 'a', encoding='utf-8') as f:
+                    f.write(formatReport(report))
+            except OSError as exc:
+                print(f'CallbackWatchdog: cannot write {self.reportPath}: {exc}')
+        if self.onReport:
+            try:
+                self.onReport(report)
+            except Exception as exc:
+                print(f'CallbackWatchdog: error in onReport: {exc}')
+
+
+def formatReport(report):
+    """return the folded stack text of a SlowCallback"""
+    lines = [f'# {time.strftime("%Y-%m-%d %H:%M:%S")} callback {report.serial} '
+             f'{report.name} utterance {report.utteranceId} '
+             f'took {report.duration * 1000:.0f} ms, {sum(report.samples.values())} samples\n']
+    for stack, count in report.samples.most_common():
+        lines.append(f'{stack} {count}\n')
+    return ''.join(lines)
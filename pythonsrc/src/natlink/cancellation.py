@@ -0,0 +1,263 @@
+"""Cooperative cancellation of long running command actions.
+
+A CancellationManager runs wrapped results handlers on a worker thread with
+a CancelToken, and cancels the running tokens when the next utterance
+begins or a cancel grammar is recognized.  playString, execScript and sleep
+work in small steps, on the natlink thread through natlink.runOnMain, and
+check the token between them::
+
+    from natlink import cancellation
+
+    cancel = cancellation.getCancellationManager()
+
+    def gotResults(words, wordInfo, token):
+        cancellation.playString(longText, token)    # raises Cancelled when cancelled
+
+    cancel.cancellableCallback(gotResults, gramObj)
+    cancel.setCancelGrammar(stopGramObj)
+"""
+#pylint:disable=W0718
+
+import re
+import threading
+import traceback
+
+CHUNK_SIZE = 16                 # characters or keys per playString call
+
+# an escaped brace ({{} or {}}), a key name in braces ({ctrl+c}, {Enter 3}) or one character
+_KEY_RE = re.compile(r'\{\{\}|\{\}\}|\{[^{}]+\}|.', re.S)
+
+
+class Cancelled(Exception):
+    """raised by CancelToken.check and the helpers when the token is cancelled"""
+
+
+class CancelToken:
+    """tells a running action that it should stop
+
+    cancel may be called from any thread; the action looks at cancelled or
+    calls check between its steps.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason='cancelled'):
+        """cancel the token; returns False if it was cancelled already"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                print(f'error in cancel callback of {self!r}:')
+                traceback.print_exc()
+        return True
+
+    def check(self):
+        """raise Cancelled if the token is cancelled"""
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def onCancel(self, callback):
+        """call callback(token) when the token is cancelled (at once if it is)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def wait(self, timeout=None):
+        """wait until the token is cancelled or timeout seconds passed; returns cancelled"""
+        return self._event.wait(timeout)
+
+    def __repr__(self):
+        state = f'cancelled ({self.reason})' if self.cancelled else 'active'
+        return f'<CancelToken {self.name!r} {state}>'
+
+
+class CancellationManager:
+    """hands out CancelTokens and cancels them on new speech
+
+    eventBus provides the begin events (default: the natlink event bus).
+    With cancelOnSpeech false only cancelAll and the cancel grammar cancel
+    the tokens.
+    """
+    def __init__(self, eventBus=None, cancelOnSpeech=True):
+        if eventBus is None:
+            from natlink import eventbus        #pylint:disable=C0415
+            eventBus = eventbus.getEventBus()
+        self.cancelOnSpeech = cancelOnSpeech
+        self._active = set()
+        self._lock = threading.Lock()
+        self._subscription = eventBus.subscribe('begin', self._onBegin, name='cancellation')
+        self._cancelGramObj = None
+
+    # the tokens
+
+    def newToken(self, name=None):
+        """return a new active token; call finish with it when the action is done"""
+        token = CancelToken(name)
+        with self._lock:
+            self._active.add(token)
+        return token
+
+    def finish(self, token):
+        """forget a token whose action is done"""
+        with self._lock:
+            self._active.discard(token)
+
+    def activeTokens(self):
+        """return the tokens of the actions which are running"""
+        with self._lock:
+            return list(self._active)
+
+    def cancelAll(self, reason='cancelled'):
+        """cancel the tokens of all running actions; returns how many were cancelled"""
+        with self._lock:
+            tokens, self._active = self._active, set()
+        return sum(1 for token in tokens if token.cancel(reason))
+
+    def _onBegin(self, moduleInfo):
+        if self.cancelOnSpeech:
+            self.cancelAll('speech')
+
+    def setCancelGrammar(self, gramObj):
+        """make the recognitions of gramObj cancel all running actions
+
+        Pass None to stop using the grammar set before.
+        """
+        if self._cancelGramObj is not None:
+            self._cancelGramObj.setResultsCallback(None)
+        self._cancelGramObj = gramObj
+        if gramObj is not None:
+            gramObj.setResultsCallback(self._onCancelResults)
+
+    def _onCancelResults(self, words, resObj):
+        if isinstance(words, list):
+            self.cancelAll('cancel grammar')
+
+    # wrapping handlers
+
+    def cancellableCallback(self, handler, gramObj=None, wordInfo=False, executor=None):
+        """wrap handler(words, wordInfo, token) as a results callback
+
+        The callback makes the token and takes the words (and, with
+        wordInfo, ResObj.getWordInfo(0)) on the natlink thread, and runs
+        the handler on executor (default: the natlink.asyncresults
+        executor, one recognition at a time per grammar).  The natlink
+        thread stays free, so the begin callback of the next utterance can
+        cancel the token; the handler must call natlink functions through
+        natlink.runOnMain, as the helpers of this module do.  Cancelled
+        raised by the handler is not an error.  With gramObj the callback
+        is set as its results callback, with asyncResults; without it the
+        wrapped callback is only returned.  Call this on the natlink
+        thread.
+        """
+        if executor is None:
+            from natlink import asyncresults, mainthread     #pylint:disable=C0415
+            mainthread.install()
+            executor = asyncresults.getExecutor()
+        name = getattr(handler, '__qualname__', None)
+
+        def run(words, info, token):
+            try:
+                handler(words, info, token)
+            except Cancelled:
+                pass
+            except Exception:
+                print(f'error in cancellable handler {name}:')
+                traceback.print_exc()
+            finally:
+                self.finish(token)
+
+        def callback(words, resObj):
+            info = None
+            if wordInfo and resObj is not None:
+                try:
+                    info = resObj.getWordInfo(0)
+                except Exception:
+                    info = None
+            token = self.newToken(name)
+            executor.submit(key, run, words, info, token)
+
+        key = id(gramObj) if gramObj is not None else id(callback)
+        callback.__name__ = getattr(handler, '__name__', 'callback')
+        callback.__doc__ = getattr(handler, '__doc__', None)
+        if gramObj is not None:
+            gramObj.setResultsCallback(callback, 1)
+        return callback
+
+    def close(self):
+        """stop listening for begin events and give back the cancel grammar callback"""
+        self._subscription.unsubscribe()
+        self.setCancelGrammar(None)
+
+
+# actions in steps
+
+def splitKeys(text, chunkSize=CHUNK_SIZE):
+    """split a playString string into chunks of at most chunkSize keys
+
+    A key name in braces ({ctrl+c}) and an escaped brace ({{}, {}}) count
+    as one key and are never split.
+    """
+    keys = _KEY_RE.findall(text)
+    return [''.join(keys[i:i + chunkSize]) for i in range(0, len(keys), chunkSize)]
+
+
+def playString(text, token, chunkSize=CHUNK_SIZE, natlinkModule=None):
+    """natlink.playString in chunks, checking token before every chunk
+
+    The chunks are played on the natlink thread (natlink.runOnMain); this
+    waits for each of them.
+    """
+    if natlinkModule is None:
+        import natlink      #pylint:disable=C0415
+        natlinkModule = natlink
+    for chunk in splitKeys(text, chunkSize):
+        token.check()
+        natlinkModule.runOnMain(natlinkModule.playString, chunk).result()
+
+
+def execScript(scripts, token, natlinkModule=None):
+    """natlink.execScript for a script or a list of scripts, checking token before each
+
+    The scripts run on the natlink thread (natlink.runOnMain).
+    """
+    if natlinkModule is None:
+        import natlink      #pylint:disable=C0415
+        natlinkModule = natlink
+    if isinstance(scripts, str):
+        scripts = [scripts]
+    for script in scripts:
+        token.check()
+        natlinkModule.runOnMain(natlinkModule.execScript, script).result()
+
+
+def sleep(seconds, token):
+    """wait seconds, or until token is cancelled (then raise Cancelled)"""
+    if token.wait(seconds):
+        token.check()
+
+
+_manager = None
+
+
+def getCancellationManager():
+    """return the CancellationManager on the natlink event bus, made on first use"""
+    global _manager     #pylint:disable=W0603
+    if _manager is None:
+        _manager = CancellationManager()
+    return _manager
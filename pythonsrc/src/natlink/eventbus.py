@@ -0,0 +1,238 @@
+"""One owner for natlink's single-slot callbacks, many subscribers.
+
+The EventBus takes the setBeginCallback, setChangeCallback and setTrayIcon
+slots (and a timer of natlink.timerservice) while it has subscribers, and
+passes the events on to them::
+
+    from natlink.eventbus import getEventBus
+
+    bus = getEventBus()
+    bus.subscribe('begin', onBegin)
+    bus.subscribe('mic', onMicOff, predicate=lambda what, state: state == 'off')
+
+The event types are 'begin', 'change', 'mic', 'user', 'timer' and 'tray';
+see EventBus for their arguments.
+"""
+#pylint:disable=W0718
+
+import time
+import traceback
+
+EVENT_TYPES = ('begin', 'change', 'mic', 'user', 'timer', 'tray')
+DEFAULT_TIMER_INTERVAL = 50     # milliseconds
+
+# the natlink slot which produces each event type
+_SLOTS = {'begin': 'begin', 'change': 'change', 'mic': 'change', 'user': 'change',
+          'timer': 'timer', 'tray': 'tray'}
+
+
+class Subscription:
+    """one subscriber of an EventBus; returned by EventBus.subscribe"""
+    __slots__ = ('bus', 'eventType', 'handler', 'predicate', 'name', 'priority',
+                 'calls', 'totalTime', 'maxTime', 'errors')
+
+    def __init__(self, bus, eventType, handler, predicate, name, priority):
+        self.bus = bus
+        self.eventType = eventType
+        self.handler = handler
+        self.predicate = predicate
+        self.name = name
+        self.priority = priority
+        self.calls = 0
+        self.totalTime = 0.0
+        self.maxTime = 0.0
+        self.errors = 0
+
+    def unsubscribe(self):
+        """stop getting events; returns False if already unsubscribed"""
+        return self.bus.unsubscribe(self)
+
+    def __repr__(self):
+        return f'<Subscription {self.name!r} to {self.eventType!r}>'
+
+
+class EventBus:
+    """fans natlink's begin, change, tray icon and timer events out to subscribers
+
+    natlinkModule provides setBeginCallback, setChangeCallback and
+    setTrayIcon (default: natlink); setTimer(callback, milliseconds) drives
+    the 'timer' events (default: the 'eventbus' timer of the natlink timer
+    service).
+    """
+    def __init__(self, natlinkModule=None, setTimer=None, timerInterval=DEFAULT_TIMER_INTERVAL):
+        if natlinkModule is None:
+            import natlink      #pylint:disable=C0415
+            natlinkModule = natlink
+        self._natlink = natlinkModule
+        self._setTimer = setTimer
+        self.timerInterval = timerInterval
+        self._subscriptions = []
+        self._table = {eventType: () for eventType in EVENT_TYPES}
+        self._slotsTaken = set()
+        self._trayIcon = None           # (iconName, toolTip) while a tray icon is set
+
+    # subscribing
+
+    def subscribe(self, eventType, handler, predicate=None, name=None, priority=0):
+        """call handler for events of eventType (for which predicate is true)
+
+        Subscribers with a lower priority number are called first, in the
+        order they subscribed otherwise.  Returns a Subscription.
+        """
+        if eventType not in EVENT_TYPES:
+            raise ValueError(f'unknown event type {eventType!r}, expected one of {EVENT_TYPES}')
+        if name is None:
+            name = getattr(handler, '__qualname__', None) or repr(handler)
+        subscription = Subscription(self, eventType, handler, predicate, name, priority)
+        self._subscriptions.append(subscription)
+        self._rebuild()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """remove a subscription; returns False if it was not subscribed"""
+        if subscription not in self._subscriptions:
+            return False
+        self._subscriptions.remove(subscription)
+        self._rebuild()
+        return True
+
+    def subscribers(self, eventType):
+        """return the subscriptions for an event type, in calling order"""
+        return list(self._table[eventType])
+
+    def _rebuild(self):
+        table = {eventType: [] for eventType in EVENT_TYPES}
+        for subscription in sorted(self._subscriptions, key=lambda s: s.priority):
+            table[subscription.eventType].append(subscription)
+        self._table = {eventType: tuple(subs) for eventType, subs in table.items()}
+        self._updateSlots()
+
+    def _updateSlots(self):
+        """take the natlink slots which have subscribers, give back the others"""
+        wanted = {_SLOTS[eventType] for eventType, subs in self._table.items() if subs}
+        if 'tray' in wanted and self._trayIcon is None:
+            wanted.discard('tray')      # there is no icon to listen to yet
+        for slot in wanted - self._slotsTaken:
+            self._setSlot(slot, True)
+        for slot in self._slotsTaken - wanted:
+            self._setSlot(slot, False)
+        self._slotsTaken = wanted
+
+    def _setSlot(self, slot, take):
+        if slot == 'begin':
+            self._natlink.setBeginCallback(self._onBegin if take else None)
+        elif slot == 'change':
+            self._natlink.setChangeCallback(self._onChange if take else None)
+        elif slot == 'timer':
+            setTimer = self._getSetTimer()
+            if take:
+                setTimer(self._onTimer, self.timerInterval)
+            else:
+                setTimer(None, 0)
+        elif slot == 'tray':
+            iconName, toolTip = self._trayIcon
+            self._natlink.setTrayIcon(iconName, toolTip, self._onTray if take else None)
+
+    def _getSetTimer(self):
+        if self._setTimer is None:
+            from natlink import timerservice        #pylint:disable=C0415
+            self._setTimer = timerservice.getTimerService().timerSlot('eventbus')
+        return self._setTimer
+
+    def setTrayIcon(self, iconName, toolTip=''):
+        """show a tray icon whose events go to the 'tray' subscribers
+
+        Pass an empty iconName to remove the icon.
+        """
+        if not iconName:
+            if self._trayIcon is not None:
+                self._natlink.setTrayIcon('', '', None)
+            self._trayIcon = None
+            self._slotsTaken.discard('tray')
+            return
+        self._trayIcon = (iconName, toolTip)
+        self._slotsTaken.discard('tray')
+        self._updateSlots()
+        if 'tray' not in self._slotsTaken:
+            # no subscribers yet, show the icon anyway
+            self._natlink.setTrayIcon(iconName, toolTip, None)
+
+    def close(self):
+        """remove all subscriptions and give back the natlink slots"""
+        self._subscriptions = []
+        self._rebuild()
+        self.setTrayIcon('')
+
+    # dispatching
+
+    def _dispatch(self, subscriptions, args):
+        for subscription in subscriptions:
+            predicate = subscription.predicate
+            try:
+                if predicate is not None and not predicate(*args):
+                    continue
+                start = time.perf_counter()
+                try:
+                    subscription.handler(*args)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    subscription.calls += 1
+                    subscription.totalTime += elapsed
+                    if elapsed > subscription.maxTime:
+                        subscription.maxTime = elapsed
+            except Exception:
+                subscription.errors += 1
+                print(f'error in {subscription.eventType!r} subscriber {subscription.name!r}:')
+                traceback.print_exc()
+
+    def _onBegin(self, moduleInfo):
+        self._dispatch(self._table['begin'], (moduleInfo,))
+
+    def _onChange(self, what, value):
+        table = self._table
+        args = (what, value)
+        if table['change']:
+            self._dispatch(table['change'], args)
+        specific = table.get(what) if what in ('mic', 'user') else None
+        if specific:
+            self._dispatch(specific, args)
+
+    def _onTimer(self):
+        self._dispatch(self._table['timer'], ())
+
+    def _onTray(self, message):
+        self._dispatch(self._table['tray'], (message,))
+
+    # statistics
+
+    def getStats(self, reset=False):
+        """return a list of dictionaries, one per subscription
+
+        Each has 'name', 'eventType', 'calls', 'errors', 'totalTime' and
+        'maxTime' (times in milliseconds).
+        """
+        stats = []
+        for subscription in self._subscriptions:
+            stats.append({
+                'name': subscription.name,
+                'eventType': subscription.eventType,
+                'calls': subscription.calls,
+                'errors': subscription.errors,
+                'totalTime': subscription.totalTime * 1000.0,
+                'maxTime': subscription.maxTime * 1000.0,
+            })
+            if reset:
+                subscription.calls = subscription.errors = 0
+                subscription.totalTime = subscription.maxTime = 0.0
+        return stats
+
+
+_bus = None
+
+
+def getEventBus():
+    """return the EventBus on the natlink callback slots, made on first use"""
+    global _bus     #pylint:disable=W0603
+    if _bus is None:
+        _bus = EventBus()
+    return _bus
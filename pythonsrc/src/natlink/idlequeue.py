@@ -0,0 +1,192 @@
+"""Deferred work which runs while the user is not speaking.
+
+An IdleQueue runs callables and generators in short timer slices, only when
+no utterance is in progress and the microphone is off or sleeping (or when
+the deadline of a task has passed)::
+
+    from natlink.idlequeue import IdleQueue
+
+    idle = IdleQueue()
+    idle.add(refreshLists, priority=1)
+    idle.add(syncVocabulary(), deadline=60)     # a generator runs step by step
+
+Feed it noteUtteranceStart, noteUtteranceEnd and noteChange from the
+natlink callbacks (or the natlink event bus).
+"""
+#pylint:disable=W0718
+
+import heapq
+import itertools
+import time
+import traceback
+
+DEFAULT_SLICE = 0.02            # seconds of work per timer tick
+DEFAULT_INTERVAL = 50           # milliseconds between timer ticks
+UTTERANCE_TIMEOUT = 30.0        # seconds after which a missing end is assumed
+
+IDLE_MIC_STATES = ('off', 'sleeping')
+
+
+class IdleTask:
+    """a task in an IdleQueue; returned by IdleQueue.add"""
+    __slots__ = ('name', 'work', 'priority', 'deadline', 'cancelled', 'done')
+
+    def __init__(self, name, work, priority, deadline):
+        self.name = name
+        self.work = work
+        self.priority = priority
+        self.deadline = deadline
+        self.cancelled = False
+        self.done = False
+
+    def __repr__(self):
+        return f'<IdleTask {self.name!r} priority {self.priority}>'
+
+
+class IdleQueue:
+    """runs queued tasks in time slices while the user is not speaking
+
+    setTimer(callback, milliseconds) arms the periodic timer which runs the
+    slices (callback None stops it); it defaults to the 'idlequeue' timer
+    of the natlink timer service.  With quietTime, the queue also counts as
+    idle when the microphone is on but nothing was said for that many
+    seconds.  micState defaults to natlink.getMicState().
+    """
+    def __init__(self, setTimer=None, clock=time.monotonic, sliceTime=DEFAULT_SLICE,
+                 interval=DEFAULT_INTERVAL, quietTime=None, micState=None):
+        if setTimer is None:
+            from natlink import timerservice        #pylint:disable=C0415
+            setTimer = timerservice.getTimerService().timerSlot('idlequeue')
+        self._setTimer = setTimer
+        self._clock = clock
+        self.sliceTime = sliceTime
+        self.interval = interval
+        self.quietTime = quietTime
+        if micState is None:
+            import natlink      #pylint:disable=C0415
+            micState = natlink.getMicState()
+        self.micState = micState
+        self._utteranceStart = None
+        self._lastUtterance = clock()
+        self._heap = []                 # (priority, sequence, IdleTask)
+        self._sequence = itertools.count()
+        self._timerOn = False
+
+    # the state of the recognizer
+
+    def noteUtteranceStart(self, *args):
+        """an utterance starts (call from the begin callback, any arguments are ignored)"""
+        self._utteranceStart = self._clock()
+
+    def noteUtteranceEnd(self, *args):
+        """an utterance is done (call from a results callback, any arguments are ignored)"""
+        self._utteranceStart = None
+        self._lastUtterance = self._clock()
+
+    def noteChange(self, what, value):
+        """call from the natlink change callback; only 'mic' changes matter"""
+        if what == 'mic':
+            self.micState = value
+            if value in IDLE_MIC_STATES:
+                # whatever was being said has been cut off
+                self._utteranceStart = None
+
+    def inUtterance(self):
+        """return True while an utterance is in progress"""
+        if self._utteranceStart is None:
+            return False
+        if self._clock() - self._utteranceStart > UTTERANCE_TIMEOUT:
+            self._utteranceStart = None
+            return False
+        return True
+
+    def isIdle(self):
+        """return True when all queued tasks may run"""
+        if self.inUtterance():
+            return False
+        if self.micState in IDLE_MIC_STATES:
+            return True
+        return (self.quietTime is not None and
+                self._clock() - self._lastUtterance >= self.quietTime)
+
+    # the tasks
+
+    def add(self, work, priority=0, deadline=None, name=None):
+        """queue a callable or an iterator; returns the IdleTask
+
+        deadline is in seconds from now.
+        """
+        if not callable(work) and not hasattr(work, '__next__'):
+            raise TypeError(f'an idle task must be callable or an iterator, not {work!r}')
+        if name is None:
+            name = getattr(work, '__qualname__', None) or repr(work)
+        task = IdleTask(name, work, priority,
+                        None if deadline is None else self._clock() + deadline)
+        heapq.heappush(self._heap, (priority, next(self._sequence), task))
+        self._startTimer()
+        return task
+
+    def cancel(self, task):
+        """remove a task which has not finished yet; returns False if it had"""
+        if task.done or task.cancelled:
+            return False
+        task.cancelled = True
+        return True
+
+    def __len__(self):
+        return sum(1 for _, _, task in self._heap if not task.cancelled)
+
+    def _startTimer(self):
+        if not self._timerOn:
+            self._timerOn = True
+            self._setTimer(self.runSlice, self.interval)
+
+    def _stopTimer(self):
+        if self._timerOn:
+            self._timerOn = False
+            self._setTimer(None, 0)
+
+    # running
+
+    def runSlice(self):
+        """run tasks for at most sliceTime seconds; this is the timer callback
+
+        When the user is not idle only tasks past their deadline run.
+        """
+        start = self._clock()
+        if self.inUtterance():
+            return
+        idle = self.isIdle()
+        heap = self._heap
+        deferred = []
+        while heap and self._clock() - start < self.sliceTime:
+            entry = heapq.heappop(heap)
+            task = entry[2]
+            if task.cancelled:
+                continue
+            if not idle and (task.deadline is None or task.deadline > start):
+                deferred.append(entry)
+                continue
+            if self._step(task):
+                # not finished, it goes after the tasks of the same priority
+                heapq.heappush(heap, (task.priority, next(self._sequence), task))
+        for entry in deferred:
+            heapq.heappush(heap, entry)
+        if not any(not task.cancelled for _, _, task in heap):
+            heap.clear()
+            self._stopTimer()
+
+    def _step(self, task):
+        """run one step of a task; returns True if the task has more to do"""
+        try:
+            if hasattr(task.work, '__next__'):
+                next(task.work)
+                return True
+            task.work()
+        except StopIteration:
+            pass
+        except Exception:
+            print(f'error in idle task {task.name!r}:')
+            traceback.print_exc()
+        task.done = True
+        return False
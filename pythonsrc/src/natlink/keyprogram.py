@@ -0,0 +1,584 @@
+"""Compiled keystroke programs for playString.
+
+natlink.playString used to hand every key string to
+dtactions.vocola_sendkeys.ext_keys.send_input, which parses the {Ctrl+c}
+notation again on every call.  Commands play the same few hundred strings
+all day, so this module compiles a key string once into a KeyProgram, an
+immutable sequence of keyboard events which is already encoded as the
+INPUT array of the Windows SendInput function, and keeps the programs in a
+bounded LRU cache keyed by the string and the flags::
+
+    from natlink import keyprogram
+
+    keyprogram.playKeys('{Ctrl+Home}hello{Enter 2}')
+    keyprogram.getProgramCache().getStats()
+
+The notation:
+
+    plain characters    typed as the virtual keys of the keyboard layout, like
+                        ext_keys does ('\\n' is Enter, '\\t' Tab); with the
+                        KEYS_UNICODE flag as unicode characters (VK_PACKET)
+    {Name}              a named key: Enter, Tab, Esc, Backspace, Del, Home,
+                        Left, PgDn, F5, Space, Apps ... (case does not matter)
+    {Name 3} {Name_3}   the key pressed three times
+    {Ctrl+Shift+Left}   with modifiers Ctrl, Shift, Alt and Win held down
+    {Ctrl+c} {Alt+F4}   a single character or a named key after the modifiers
+    {{} {}}             the braces themselves
+
+Strings which cannot be compiled (other notation which ext_keys knows, or
+characters without a key on the keyboard layout) raise KeyCompileError;
+natlink.playString then falls back to ext_keys.  Unicode characters reach
+neither applications which read WM_KEYDOWN, nor remote desktop sessions,
+nor most games, so natlink.playString never uses KEYS_UNICODE.
+
+getStats reports hits, misses and evictions of the cache and the parse
+time the hits saved, so the effect can be measured on recorded command
+strings.
+
+Key strings can also be buffered and sent as one SendInput batch, which
+removes the stutter of a command that calls playString many times:
+
+    with keyprogram.bufferedKeys():         # or wrap a handler with bufferedCallback
+        natlink.playString('{Home}')
+        natlink.playString('hello')         # both go out together at the end
+
+    keyprogram.setBufferedMode(True)        # buffer everything played in callbacks
+
+In buffered mode the keys played during a natlink callback are sent when
+the callback returns (through the natlink.mainthread wakeup, when it is
+installed), at the latest after the flush timeout; flushKeys sends them at
+once.  The order of the keys is always kept: keys played outside the
+buffer, and natlink.execScript and playEvents, flush the buffer first.
+"""
+#pylint:disable=W0718, R0903
+
+import collections
+import contextlib
+import ctypes
+import re
+import threading
+import time
+
+DEFAULT_CACHE_SIZE = 512
+DEFAULT_FLUSH_TIMEOUT = 0.05    # seconds keys wait in the buffered mode, at most
+
+# flags of compileKeys, part of the cache key
+KEYS_UNICODE = 0x0002           # type plain characters as unicode, not virtual keys
+
+# SendInput constants
+INPUT_KEYBOARD = 1
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+
+VK_SHIFT, VK_CONTROL, VK_MENU, VK_LWIN = 0x10, 0x11, 0x12, 0x5B
+
+MODIFIERS = {
+    'ctrl': VK_CONTROL, 'control': VK_CONTROL,
+    'shift': VK_SHIFT,
+    'alt': VK_MENU, 'menu': VK_MENU,
+    'win': VK_LWIN, 'windows': VK_LWIN,
+}
+
+KEY_NAMES = {
+    'backspace': 0x08, 'bs': 0x08, 'tab': 0x09, 'enter': 0x0D, 'return': 0x0D,
+    'pause': 0x13, 'capslock': 0x14, 'esc': 0x1B, 'escape': 0x1B, 'space': 0x20,
+    'pgup': 0x21, 'pageup': 0x21, 'prior': 0x21, 'pgdn': 0x22, 'pagedown': 0x22,
+    'next': 0x22, 'end': 0x23, 'home': 0x24, 'left': 0x25, 'up': 0x26,
+    'right': 0x27, 'down': 0x28, 'printscreen': 0x2C, 'ins': 0x2D, 'insert': 0x2D,
+    'del': 0x2E, 'delete': 0x2E, 'apps': 0x5D, 'numlock': 0x90, 'scrolllock': 0x91,
+    'ctrl': VK_CONTROL, 'control': VK_CONTROL, 'shift': VK_SHIFT, 'alt': VK_MENU,
+    'win': VK_LWIN, 'lwin': VK_LWIN, 'rwin': 0x5C,
+}
+KEY_NAMES.update((f'f{n}', 0x6F + n) for n in range(1, 25))
+KEY_NAMES.update((f'num{n}', 0x60 + n) for n in range(10))
+
+# keys which need KEYEVENTF_EXTENDEDKEY
+EXTENDED_KEYS = frozenset((0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x28, 0x2C, 0x2D,
+                           0x2E, 0x5B, 0x5C, 0x5D, 0x90))
+
+_TOKEN_RE = re.compile(r'\{\{\}|\{\}\}|\{[^{}]+\}|.', re.S)
+_COUNT_RE = re.compile(r'(.+?)(?:[ _](\d+))?', re.S)
+
+
+class KeyCompileError(ValueError):
+    """the key string uses notation the compiler does not know"""
+
+
+# the Windows INPUT structure, with fixed size fields so it can be built anywhere
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [('wVk', ctypes.c_uint16), ('wScan', ctypes.c_uint16),
+                ('dwFlags', ctypes.c_uint32), ('time', ctypes.c_uint32),
+                ('dwExtraInfo', ctypes.c_size_t)]
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [('dx', ctypes.c_int32), ('dy', ctypes.c_int32),
+                ('mouseData', ctypes.c_uint32), ('dwFlags', ctypes.c_uint32),
+                ('time', ctypes.c_uint32), ('dwExtraInfo', ctypes.c_size_t)]
+
+
+class _INPUTUNION(ctypes.Union):
+    _fields_ = [('mi', MOUSEINPUT), ('ki', KEYBDINPUT)]
+
+
+class INPUT(ctypes.Structure):
+    _fields_ = [('type', ctypes.c_uint32), ('u', _INPUTUNION)]
+
+
+def _user32():
+    try:
+        return ctypes.windll.user32
+    except AttributeError:
+        return None         # not on Windows
+
+
+def _keyboardLayout():
+    user32 = _user32()
+    return user32.GetKeyboardLayout(0) if user32 else 0
+
+
+def _scanCode(vk):
+    user32 = _user32()
+    return user32.MapVirtualKeyW(vk, 0) & 0xFFFF if user32 else 0
+
+
+def _charToVk(char):
+    """return (vk, modifiers) for a character typed as a virtual key"""
+    user32 = _user32()
+    if user32 is not None:
+        code = user32.VkKeyScanW(ord(char))
+        if code == -1 or code & 0xFFFF == 0xFFFF:
+            raise KeyCompileError(f'no key types {char!r}')
+        mods = []
+        shiftState = (code >> 8) & 0xFF
+        for bit, vk in ((1, VK_SHIFT), (2, VK_CONTROL), (4, VK_MENU)):
+            if shiftState & bit:
+                mods.append(vk)
+        return code & 0xFF, tuple(mods)
+    # without Windows we only know the letters, digits and space of a US keyboard
+    if char == ' ':
+        return KEY_NAMES['space'], ()
+    if char.isascii() and char.isalnum():
+        return ord(char.upper()), ((VK_SHIFT,) if char.isupper() else ())
+    raise KeyCompileError(f'cannot find the key for {char!r}')
+
+
+def _vkEvents(vk, mods=(), count=1):
+    """the events for pressing vk count times with mods held down"""
+    events = []
+    for mod in mods:
+        events.append((mod, _scanCode(mod), _extended(mod)))
+    for _ in range(count):
+        flags = _extended(vk)
+        scan = _scanCode(vk)
+        events.append((vk, scan, flags))
+        events.append((vk, scan, flags | KEYEVENTF_KEYUP))
+    for mod in reversed(mods):
+        events.append((mod, _scanCode(mod), _extended(mod) | KEYEVENTF_KEYUP))
+    return events
+
+
+def _extended(vk):
+    return KEYEVENTF_EXTENDEDKEY if vk in EXTENDED_KEYS else 0
+
+
+def _charEvents(char, flags):
+    if char == '\n':
+        return _vkEvents(KEY_NAMES['enter'])
+    if char == '\t':
+        return _vkEvents(KEY_NAMES['tab'])
+    if not flags & KEYS_UNICODE:
+        vk, mods = _charToVk(char)
+        return _vkEvents(vk, mods)
+    events = []
+    data = char.encode('utf-16-le')
+    for i in range(0, len(data), 2):
+        unit = data[i] | (data[i + 1] << 8)
+        events.append((0, unit, KEYEVENTF_UNICODE))
+        events.append((0, unit, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP))
+    return events
+
+
+def _braceEvents(body):
+    match = _COUNT_RE.fullmatch(body)
+    name, count = match.group(1), int(match.group(2) or 1)
+    if name.endswith('++'):
+        modNames, key = name[:-2].split('+'), '+'
+    elif len(name) == 1:
+        modNames, key = [], name
+    else:
+        parts = name.split('+')
+        modNames, key = parts[:-1], parts[-1]
+    mods = []
+    for modName in modNames:
+        if modName.strip().lower() not in MODIFIERS:
+            raise KeyCompileError(f'unknown modifier {modName!r} in {{{body}}}')
+        mods.append(MODIFIERS[modName.strip().lower()])
+    vk = KEY_NAMES.get(key.strip().lower())
+    if vk is None:
+        if len(key) != 1:
+            raise KeyCompileError(f'unknown key {key!r} in {{{body}}}')
+        vk, charMods = _charToVk(key)
+        mods.extend(mod for mod in charMods if mod not in mods)
+    return _vkEvents(vk, tuple(mods), count)
+
+
+def parseKeys(text, flags=0):
+    """parse a key string into a tuple of (vk, scan, eventFlags) events"""
+    events = []
+    for token in _TOKEN_RE.findall(text.replace('\r\n', '\n')):
+        if token in ('{{}', '{}}'):
+            events.extend(_charEvents(token[1], flags))
+        elif len(token) > 1:
+            events.extend(_braceEvents(token[1:-1]))
+        else:
+            events.extend(_charEvents(token, flags))
+    return tuple(events)
+
+
+class KeyProgram:
+    """the compiled events of a key string, encoded for SendInput"""
+    __slots__ = ('text', 'flags', 'events', 'compileTime', '_inputs', '_chunks')
+
+    def __init__(self, text, flags, events, compileTime=0.0):
+        self.text = text
+        self.flags = flags
+        self.events = events
+        self.compileTime = compileTime
+        inputs = (INPUT * len(events))()
+        for item, (vk, scan, eventFlags) in zip(inputs, events):
+            item.type = INPUT_KEYBOARD
+            item.u.ki.wVk = vk
+            item.u.ki.wScan = scan
+            item.u.ki.dwFlags = eventFlags
+        self._inputs = inputs
+        self._chunks = {}
+
+    def __len__(self):
+        return len(self.events)
+
+    def keyCount(self):
+        """return the number of keys pressed (key up events)"""
+        return sum(1 for event in self.events if event[2] & KEYEVENTF_KEYUP)
+
+    def chunks(self, keysPerChunk):
+        """split the program into programs of keysPerChunk keys each
+
+        A chunk ends after a key up event when no key is held down, so a
+        modifier is released in the chunk which pressed it (and a chunk can
+        have more keys).  The chunks are remembered, so asking again for the
+        same size costs nothing.
+        """
+        chunks = self._chunks.get(keysPerChunk)
+        if chunks is None:
+            chunks, start, keys, down = [], 0, 0, set()
+            for i, (vk, scan, eventFlags) in enumerate(self.events):
+                if not eventFlags & KEYEVENTF_KEYUP:
+                    down.add((vk, scan))
+                else:
+                    down.discard((vk, scan))
+                    keys += 1
+                    if keys >= keysPerChunk and not down:
+                        chunks.append(KeyProgram(self.text, self.flags, self.events[start:i + 1]))
+                        start, keys = i + 1, 0
+            if start < len(self.events):
+                chunks.append(KeyProgram(self.text, self.flags, self.events[start:]))
+            chunks = self._chunks[keysPerChunk] = tuple(chunks)
+        return chunks
+
+    def play(self, sendInput=None):
+        """send the events; returns the number of events sent
+
+        sendInput(count, inputs, size) defaults to user32.SendInput.
+        """
+        if not self.events:
+            return 0
+        if sendInput is None:
+            sendInput = _user32().SendInput
+        return sendInput(len(self.events), self._inputs, ctypes.sizeof(INPUT))
+
+    def __repr__(self):
+        return f'<KeyProgram {self.text!r} {len(self.events)} events>'
+
+
+def compileKeys(text, flags=0):
+    """compile a key string into a KeyProgram (not cached)"""
+    start = time.perf_counter()
+    events = parseKeys(text, flags)
+    return KeyProgram(text, flags, events, time.perf_counter() - start)
+
+
+class ProgramCache:
+    """a bounded LRU cache of KeyPrograms keyed by (text, flags)
+
+    Strings which do not compile are cached too, get raises a new
+    KeyCompileError with the same message without parsing.  Programs with
+    virtual keys are cached per keyboard layout.
+    """
+    def __init__(self, maxSize=DEFAULT_CACHE_SIZE):
+        self.maxSize = maxSize
+        self._programs = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.savedTime = 0.0
+
+    def get(self, text, flags=0):
+        """return the KeyProgram for text, compiling it on a miss"""
+        key = (text, flags, 0 if flags & KEYS_UNICODE else _keyboardLayout())
+        with self._lock:
+            program = self._programs.get(key)
+            if program is not None:
+                self._programs.move_to_end(key)
+                self.hits += 1
+                if isinstance(program, str):
+                    raise KeyCompileError(program)
+                self.savedTime += program.compileTime
+                return program
+        try:
+            program = compileKeys(text, flags)
+        except KeyCompileError as exc:
+            # the message only, an exception would keep its traceback alive
+            program = str(exc)
+        with self._lock:
+            self.misses += 1
+            self._programs[key] = program
+            while len(self._programs) > self.maxSize:
+                self._programs.popitem(last=False)
+                self.evictions += 1
+        if isinstance(program, str):
+            raise KeyCompileError(program)
+        return program
+
+    def clear(self):
+        with self._lock:
+            self._programs.clear()
+
+    def __len__(self):
+        return len(self._programs)
+
+    def getStats(self, reset=False):
+        """return a dictionary with 'size', 'hits', 'misses', 'evictions',
+        'hitRate' and 'savedTime' (parse time saved by hits, milliseconds)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'size': len(self._programs),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+                'savedTime': self.savedTime * 1000.0,
+            }
+            if reset:
+                self.hits = self.misses = self.evictions = 0
+                self.savedTime = 0.0
+        return stats
+
+
+_cache = None
+
+
+def getProgramCache():
+    """return the ProgramCache used by playKeys, made on first use"""
+    global _cache       #pylint:disable=W0603
+    if _cache is None:
+        _cache = ProgramCache()
+    return _cache
+
+
+class KeyBuffer:
+    """collects KeyPrograms and sends them as one SendInput batch"""
+    def __init__(self, sendInput=None):
+        self._sendInput = sendInput
+        self._programs = []
+        self.flushes = 0
+        self.programsSent = 0
+
+    def add(self, program):
+        self._programs.append(program)
+
+    def __len__(self):
+        return len(self._programs)
+
+    def flush(self):
+        """send the collected programs in one call; returns the number of events sent"""
+        programs, self._programs = self._programs, []
+        total = sum(len(program) for program in programs)
+        if not total:
+            return 0
+        size = ctypes.sizeof(INPUT)
+        inputs = (INPUT * total)()
+        offset = 0
+        for program in programs:
+            count = len(program)
+            ctypes.memmove(ctypes.byref(inputs, offset * size), program._inputs, count * size) #pylint:disable=W0212
+            offset += count
+        self.flushes += 1
+        self.programsSent += len(programs)
+        sendInput = self._sendInput or _user32().SendInput
+        return sendInput(total, inputs, size)
+
+
+_local = threading.local()      # .stack: the KeyBuffers of the bufferedKeys blocks
+_mode = None                    # the _BufferedMode while setBufferedMode is on
+_player = None                  # plays the programs which are not buffered, see setPlayer
+
+
+class _BufferedMode:
+    """the state of setBufferedMode: one buffer on the thread which turned it on"""
+    def __init__(self, timeout, inCallback, schedule, sendInput):
+        self.timeout = timeout
+        self.inCallback = inCallback
+        self.schedule = schedule
+        self.thread = threading.get_ident()
+        self.buffer = KeyBuffer(sendInput)
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _inNatlinkCallback():
+    import natlink      #pylint:disable=C0415
+    return natlink.getCallbackDepth() > 0
+
+
+def _scheduleFlush(flush, timeout):
+    """flush after the current callback and, at the latest, after timeout seconds"""
+    from natlink import mainthread, timerservice    #pylint:disable=C0415
+    queue = mainthread.getQueue()
+    if queue is not None:
+        queue.postCall(flush)
+    timerservice.getTimerService().callLater(timeout, flush, name='keyprogram.flush')
+
+
+def setBufferedMode(on=True, timeout=DEFAULT_FLUSH_TIMEOUT, inCallback=None, schedule=None,
+                    sendInput=None):
+    """buffer the keys played during natlink callbacks (on the calling thread)
+
+    inCallback() tells whether a callback is running (default: from
+    natlink.getCallbackDepth); schedule(flush, timeout) arranges for flush to
+    be called after the callback (default: the mainthread wakeup and a timer
+    of the natlink timer service).  Turning the mode off flushes the buffer.
+    """
+    global _mode        #pylint:disable=W0603
+    if _mode is not None:
+        _mode.buffer.flush()
+        _mode = None
+    if on:
+        _mode = _BufferedMode(timeout, inCallback or _inNatlinkCallback,
+                              schedule or _scheduleFlush, sendInput)
+
+
+def _modeBuffer():
+    """the buffer of the buffered mode, if this thread may use it"""
+    mode = _mode
+    if mode is None or mode.thread != threading.get_ident():
+        return None
+    return mode
+
+
+def flushKeys():
+    """send the buffered keys of this thread now; returns the number of events sent"""
+    sent = 0
+    mode = _modeBuffer()
+    if mode is not None:
+        sent += mode.buffer.flush()
+    for buffer in _stack():
+        sent += buffer.flush()
+    return sent
+
+
+@contextlib.contextmanager
+def bufferedKeys(sendInput=None):
+    """buffer the keys played in the with block and send them at its end
+
+    Nested blocks share the outermost buffer.
+    """
+    stack = _stack()
+    if stack:
+        yield stack[-1]
+        return
+    mode = _modeBuffer()
+    if mode is not None:
+        mode.buffer.flush()
+    buffer = KeyBuffer(sendInput)
+    stack.append(buffer)
+    try:
+        yield buffer
+    finally:
+        stack.pop()
+        buffer.flush()
+
+
+def bufferedCallback(handler):
+    """wrap a callback so the keys it plays are sent as one batch when it returns"""
+    def callback(*args):
+        with bufferedKeys():
+            return handler(*args)
+    callback.__name__ = getattr(handler, '__name__', 'callback')
+    callback.__doc__ = getattr(handler, '__doc__', None)
+    return callback
+
+
+def playKeys(text, flags=0):
+    """play a key string through the program cache; raises KeyCompileError
+    for notation the compiler does not know
+
+    In a bufferedKeys block, or in a callback in the buffered mode, the
+    program is added to the buffer instead; then the number of its events
+    is returned.
+    """
+    program = getProgramCache().get(text, flags)
+    stack = _stack()
+    if stack:
+        stack[-1].add(program)
+        return len(program)
+    mode = _modeBuffer()
+    if mode is not None:
+        if mode.inCallback():
+            if not len(mode.buffer):
+                mode.schedule(flushKeys, mode.timeout)
+            mode.buffer.add(program)
+            return len(program)
+        mode.buffer.flush()
+    if _player is not None:
+        return _player.playProgram(program)
+    return program.play()
+
+
+def setPlayer(player):
+    """let player.playProgram(program) play the programs which are not buffered
+
+    For instance a natlink.pacedplayback.PacedPlayer; None plays them
+    directly again.
+    """
+    global _player      #pylint:disable=W0603
+    _player = player
+
+
+def benchmark(strings, repeat=100):
+    """compare compiling strings every time with getting them from a fresh cache
+
+    Returns a dictionary with 'parseTime' and 'cachedTime' (milliseconds for
+    repeat rounds over strings) and the statistics of the cache.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in strings:
+            compileKeys(text)
+    parseTime = time.perf_counter() - start
+    cache = ProgramCache(max(len(strings), 1))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in strings:
+            cache.get(text)
+    cachedTime = time.perf_counter() - start
+    result = {'parseTime': parseTime * 1000.0, 'cachedTime': cachedTime * 1000.0}
+    result.update(cache.getStats())
+    return result
@@ -0,0 +1,149 @@
+"""Run calls on the natlink thread from other threads.
+
+MainThreadQueue queues the calls and wakes the natlink thread with
+natlink.postWakeup, so they run as soon as NatSpeak processes the message::
+
+    from natlink import mainthread
+
+    mainthread.install()        # on the natlink thread
+
+    # in a worker thread
+    future = mainthread.runOnMain(gramObj.appendList, 'files', names)
+"""
+#pylint:disable=W0718
+
+import collections
+import threading
+import time
+from concurrent.futures import Future
+
+MAX_BATCH = 100                 # calls per wakeup callback, at most
+BATCH_TIME = 0.02               # seconds of calls per wakeup callback, at most
+
+
+class MainThreadQueue:
+    """runs calls from other threads on the natlink thread
+
+    Create it on the natlink thread.  postWakeup() requests a call of the
+    wakeup callback, which setWakeupCallback(callback) installs; they
+    default to the natlink functions.
+    """
+    def __init__(self, postWakeup=None, setWakeupCallback=None, maxBatch=MAX_BATCH,
+                 batchTime=BATCH_TIME, clock=time.perf_counter):
+        if postWakeup is None or setWakeupCallback is None:
+            import natlink      #pylint:disable=C0415
+            postWakeup = postWakeup or natlink.postWakeup
+            setWakeupCallback = setWakeupCallback or natlink.setWakeupCallback
+        self._postWakeup = postWakeup
+        self._setWakeupCallback = setWakeupCallback
+        self.maxBatch = maxBatch
+        self.batchTime = batchTime
+        self._clock = clock
+        self._calls = collections.deque()       # (Future, function, args, kwargs)
+        self.mainThread = threading.get_ident()
+        self._closed = False
+        self.wakeups = 0
+        self.callsRun = 0
+        setWakeupCallback(self.runPending)
+
+    def runOnMain(self, function, *args, **kwargs):
+        """call function(*args, **kwargs) on the natlink thread; returns a Future"""
+        if self._closed:
+            raise RuntimeError('the main thread queue is closed')
+        future = Future()
+        if threading.get_ident() == self.mainThread:
+            self._run(future, function, args, kwargs)
+            return future
+        self._calls.append((future, function, args, kwargs))
+        self._postWakeup()
+        return future
+
+    def postCall(self, function, *args, **kwargs):
+        """queue function(*args, **kwargs) for the next wakeup; returns a Future
+
+        Unlike runOnMain this never runs the call at once, also not on the
+        natlink thread; there it runs after the current callback returns.
+        """
+        if self._closed:
+            raise RuntimeError('the main thread queue is closed')
+        future = Future()
+        self._calls.append((future, function, args, kwargs))
+        self._postWakeup()
+        return future
+
+    def __len__(self):
+        return len(self._calls)
+
+    def runPending(self):
+        """run the queued calls; this is the wakeup callback"""
+        self.wakeups += 1
+        calls = self._calls
+        start = self._clock()
+        for _ in range(self.maxBatch):
+            if not calls:
+                return
+            future, function, args, kwargs = calls.popleft()
+            self._run(future, function, args, kwargs)
+            if self._clock() - start > self.batchTime:
+                break
+        if calls:
+            # the rest comes with the next wakeup, after NatSpeak's messages
+            self._postWakeup()
+
+    def _run(self, future, function, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        self.callsRun += 1
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    def close(self):
+        """give back the wakeup callback and cancel the calls which did not run"""
+        if self._closed:
+            return
+        self._closed = True
+        self._setWakeupCallback(None)
+        while self._calls:
+            self._calls.popleft()[0].cancel()
+
+
+_queue = None
+
+
+def install():
+    """create the MainThreadQueue; call this on the natlink thread
+
+    Returns the queue; calling install again returns the same queue.
+    """
+    global _queue       #pylint:disable=W0603
+    if _queue is None:
+        _queue = MainThreadQueue()
+    return _queue
+
+
+def getQueue():
+    """return the MainThreadQueue (None before install)"""
+    return _queue
+
+
+def uninstall():
+    """close the MainThreadQueue, for instance at natDisconnect"""
+    global _queue       #pylint:disable=W0603
+    queue, _queue = _queue, None
+    if queue is not None:
+        queue.close()
+
+
+def runOnMain(function, *args, **kwargs):
+    """call function(*args, **kwargs) on the natlink thread; returns a Future
+
+    install must have been called first.
+    """
+    if _queue is None:
+        raise RuntimeError('the main thread queue is not installed, call mainthread.install() '
+                           'on the natlink thread first')
+    return _queue.runOnMain(function, *args, **kwargs)
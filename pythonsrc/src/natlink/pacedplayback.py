@@ -0,0 +1,226 @@
+"""Paced playback of key strings, per application.
+
+A PacedPlayer sends the key programs of natlink.keyprogram in chunks, at a
+rate set per application, and slows down while the application does not
+keep up::
+
+    from natlink import pacedplayback
+
+    player = pacedplayback.install()            # natlink.playString goes through it
+    player.setRate('citrix', 40)                # at most 40 keys a second
+
+Applications without a rate get their keys at once.
+"""
+#pylint:disable=W0718, R0902
+
+import ctypes
+import ntpath
+import time
+
+DEFAULT_CHUNK_KEYS = 8          # keys per SendInput call
+MIN_RATE_FACTOR = 0.25          # the rate never goes below this part of the target
+SLOWDOWN = 0.7                  # the rate is multiplied by this when the application is busy
+SPEEDUP = 1.1                   # and by this when it kept up
+IDLE_CHECK = 0.005              # seconds the application gets to answer after a chunk
+BUSY_WAIT = 0.05                # seconds to wait for a busy application, at most
+
+# SendMessageTimeout
+WM_NULL = 0x0000
+SMTO_ABORTIFHUNG = 0x0002
+
+
+def _user32():
+    try:
+        return ctypes.windll.user32
+    except AttributeError:
+        return None         # not on Windows
+
+
+def waitForForegroundIdle(timeout):
+    """wait until the foreground window handles messages again
+
+    Sends the window WM_NULL with SendMessageTimeout; its thread only
+    answers when it gets back to its message loop, so an application which
+    is still working through the keys sent before does not answer in time.
+    Returns True when it answered, False when it still was busy after
+    timeout seconds (or is hung).  Without a foreground window it counts
+    as idle.
+    """
+    user32 = _user32()
+    if user32 is None:
+        return True
+    user32.GetForegroundWindow.restype = ctypes.c_void_p
+    hwnd = user32.GetForegroundWindow()
+    if not hwnd:
+        return True
+    result = ctypes.c_size_t()
+    return bool(user32.SendMessageTimeoutW(ctypes.c_void_p(hwnd), WM_NULL, 0, 0,
+                                           SMTO_ABORTIFHUNG, max(1, int(timeout * 1000)),
+                                           ctypes.byref(result)))
+
+
+class AppPacing:
+    """the target, the current rate and the statistics of one application"""
+    __slots__ = ('name', 'targetRate', 'rate', 'keys', 'seconds', 'chunks', 'slowdowns',
+                 'nextTime')
+
+    def __init__(self, name, targetRate):
+        self.name = name
+        self.targetRate = targetRate
+        self.rate = targetRate
+        self.keys = 0
+        self.seconds = 0.0
+        self.chunks = 0
+        self.slowdowns = 0
+        self.nextTime = 0.0         # when the next chunk may go, over playString calls
+
+    def slowDown(self):
+        self.slowdowns += 1
+        self.rate = max(self.rate * SLOWDOWN, self.targetRate * MIN_RATE_FACTOR)
+
+    def speedUp(self):
+        self.rate = min(self.rate * SPEEDUP, self.targetRate)
+
+    def __repr__(self):
+        return f'<AppPacing {self.name!r} {self.rate:.0f}/{self.targetRate} keys/s>'
+
+
+class PacedPlayer:
+    """plays key programs in chunks at a rate per application
+
+    getCurrentModule() defaults to natlink.getCurrentModule, waitForIdle
+    to waitForForegroundIdle; programCache (for play) defaults to the cache
+    of natlink.keyprogram.  sendInput is passed on to KeyProgram.play.
+    """
+    def __init__(self, chunkKeys=DEFAULT_CHUNK_KEYS, getCurrentModule=None,
+                 waitForIdle=waitForForegroundIdle, programCache=None, sendInput=None,
+                 clock=time.perf_counter, sleep=time.sleep):
+        if getCurrentModule is None:
+            import natlink      #pylint:disable=C0415
+            getCurrentModule = natlink.getCurrentModule
+        self.chunkKeys = chunkKeys
+        self._getCurrentModule = getCurrentModule
+        self._waitForIdle = waitForIdle
+        self._programCache = programCache
+        self._sendInput = sendInput
+        self._clock = clock
+        self._sleep = sleep
+        self._apps = {}
+
+    # the rates
+
+    def setRate(self, appName, keysPerSecond):
+        """set the target rate of an application; None plays its keys at once again"""
+        appName = appName.lower()
+        if keysPerSecond is None:
+            self._apps.pop(appName, None)
+        elif keysPerSecond <= 0:
+            raise ValueError(f'the rate must be positive, not {keysPerSecond}')
+        elif appName in self._apps:
+            pacing = self._apps[appName]
+            pacing.targetRate = pacing.rate = keysPerSecond
+        else:
+            self._apps[appName] = AppPacing(appName, keysPerSecond)
+
+    def getRate(self, appName):
+        """return the target rate of an application (None when it is not paced)"""
+        pacing = self._apps.get(appName.lower())
+        return pacing.targetRate if pacing else None
+
+    def currentApp(self):
+        """return the name of the application in the foreground"""
+        moduleName = self._getCurrentModule()[0]
+        return ntpath.splitext(ntpath.basename(moduleName))[0].lower()
+
+    # playing
+
+    def play(self, text, appName=None, token=None, flags=0):
+        """compile (or get from the cache) and play a key string"""
+        if self._programCache is None:
+            from natlink import keyprogram      #pylint:disable=C0415
+            self._programCache = keyprogram.getProgramCache()
+        return self.playProgram(self._programCache.get(text, flags), appName, token)
+
+    def playProgram(self, program, appName=None, token=None):
+        """play a KeyProgram at the rate of appName (default: the foreground application)
+
+        Returns the number of events sent.
+        """
+        pacing = self._apps.get(appName.lower() if appName else self.currentApp())
+        if pacing is None:
+            if token is not None:
+                token.check()
+            return program.play(self._sendInput)
+        clock, sleep = self._clock, self._sleep
+        start = clock()
+        nextTime = max(start, pacing.nextTime)
+        sent = 0
+        for chunk in program.chunks(self.chunkKeys):
+            if token is not None:
+                token.check()
+            now = clock()
+            if nextTime > now:
+                sleep(nextTime - now)
+                now = nextTime
+            sent += chunk.play(self._sendInput)
+            pacing.chunks += 1
+            if self._waitForIdle(IDLE_CHECK):
+                pacing.speedUp()
+            else:
+                # the application did not keep up: slower, and give it a moment
+                pacing.slowDown()
+                self._waitForIdle(BUSY_WAIT)
+            nextTime = max(now, nextTime) + chunk.keyCount() / pacing.rate
+        pacing.nextTime = nextTime
+        pacing.keys += program.keyCount()
+        pacing.seconds += clock() - start
+        return sent
+
+    # statistics
+
+    def getStats(self, reset=False):
+        """return {appName: stats} for the paced applications
+
+        stats is a dictionary with 'targetRate', 'rate' (the current rate),
+        'achievedRate' (keys per second over all playback), 'keys', 'chunks'
+        and 'slowdowns'.
+        """
+        stats = {}
+        for name, pacing in self._apps.items():
+            stats[name] = {
+                'targetRate': pacing.targetRate,
+                'rate': pacing.rate,
+                'achievedRate': pacing.keys / pacing.seconds if pacing.seconds else 0.0,
+                'keys': pacing.keys,
+                'chunks': pacing.chunks,
+                'slowdowns': pacing.slowdowns,
+            }
+            if reset:
+                pacing.keys = pacing.chunks = pacing.slowdowns = 0
+                pacing.seconds = 0.0
+        return stats
+
+
+_player = None
+
+
+def getPacedPlayer():
+    """return the PacedPlayer used by install, made on first use"""
+    global _player      #pylint:disable=W0603
+    if _player is None:
+        _player = PacedPlayer()
+    return _player
+
+
+def install():
+    """let natlink.playString play through the PacedPlayer; returns it"""
+    from natlink import keyprogram      #pylint:disable=C0415
+    player = getPacedPlayer()
+    keyprogram.setPlayer(player)
+    return player
+
+
+def uninstall():
+    """let natlink.playString play directly again"""
+    from natlink import keyprogram      #pylint:disable=C0415
+    keyprogram.setPlayer(None)
@@ -0,0 +1,310 @@
+"""Grammar results handlers in worker processes.
+
+A ProcessHandlerPool runs results handlers in worker processes, so heavy
+handlers do not hold the GIL of NatSpeak's interpreter.  The results go to
+the workers through shared memory; what a handler returns is passed to
+onDone on the natlink thread (by default performActions)::
+
+    from natlink.processworkers import ProcessHandlerPool, setProcessResultsCallback
+
+    pool = ProcessHandlerPool(workers=2)
+    setProcessResultsCallback(gramObj, mypackage.matching.handleWords, pool=pool)
+
+A handler which raises, crashes or runs past taskTimeout gets its worker
+replaced and onError called.
+"""
+#pylint:disable=W0718, R0902
+
+import collections
+import itertools
+import multiprocessing
+import os
+import pickle
+import runpy
+import sys
+import time
+import traceback
+from multiprocessing import shared_memory
+
+DEFAULT_SLOT_COUNT = 32
+DEFAULT_SLOT_SIZE = 16 * 1024
+DEFAULT_TIMEOUT = 10.0          # seconds a handler may run
+POLL_INTERVAL = 10              # milliseconds between polls of the result pipes
+
+# the workers run this file instead of importing natlink.processworkers,
+# which would load the natlink package (and _natlink_core) in every worker
+_WORKER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_workermain.py')
+
+# the natlink functions performActions may call
+ACTIONS = ('playString', 'displayText', 'recognitionMimic', 'execScript', 'setMicState')
+
+
+def performActions(actions):
+    """call natlink functions for a list of (functionName, arguments) tuples"""
+    import natlink      #pylint:disable=C0415
+    for name, args in actions or ():
+        if name not in ACTIONS:
+            raise ValueError(f'{name!r} is not an action a worker may ask for')
+        getattr(natlink, name)(*args)
+
+
+def _workerExecutable():
+    """return the Python executable for the workers"""
+    name = os.path.basename(sys.executable).lower()
+    if name.startswith('python'):
+        return sys.executable
+    for candidate in ('pythonw.exe', 'python.exe'):
+        path = os.path.join(sys.exec_prefix, candidate)
+        if os.path.isfile(path):
+            return path
+    return sys.executable
+
+
+_Task = collections.namedtuple('_Task', 'taskId key sequence handler slot length inline onDone onError')
+
+
+class _Worker:
+    """a worker process, its own task queue and result pipe, and the task it is running
+
+    A worker which is terminated can only damage its own queue and pipe,
+    which are thrown away with it.
+    """
+    def __init__(self, context, shmName, slotSize):
+        self.taskQueue = context.Queue()
+        self.results, resultConn = context.Pipe(duplex=False)
+        workerArgs = (self.taskQueue, resultConn, shmName, slotSize)
+        self.process = context.Process(
+            target=runpy.run_path, args=(_WORKER_FILE,),
+            kwargs={'init_globals': {'workerArgs': workerArgs}, 'run_name': '__natlink_worker__'},
+            name='natlink handler worker', daemon=True)
+        self.process.start()
+        resultConn.close()
+        self.task = None
+        self.started = 0.0
+
+    def collect(self):
+        """return the (taskId, ok, value) results which have come in"""
+        results = []
+        try:
+            while self.results.poll():
+                results.append(self.results.recv())
+        except (EOFError, OSError):
+            pass            # the process stopped, poll notices it
+        return results
+
+    def discard(self):
+        """close the queue and the pipe of a worker which has stopped"""
+        self.results.close()
+        self.taskQueue.cancel_join_thread()
+        self.taskQueue.close()
+
+
+class ProcessHandlerPool:
+    """runs results handlers in worker processes
+
+    workers is the number of processes; slotCount and slotSize set up the
+    shared memory for the results snapshots.  setTimer(callback,
+    milliseconds) drives poll while tasks are outstanding; it defaults to
+    the 'processworkers' timer of the natlink timer service.
+    """
+    def __init__(self, workers=2, slotCount=DEFAULT_SLOT_COUNT, slotSize=DEFAULT_SLOT_SIZE,
+                 taskTimeout=DEFAULT_TIMEOUT, setTimer=None, executable=None):
+        self._context = multiprocessing.get_context('spawn')
+        self._context.set_executable(executable or _workerExecutable())
+        self.slotSize = slotSize
+        self.taskTimeout = taskTimeout
+        self._shm = shared_memory.SharedMemory(create=True, size=slotCount * slotSize)
+        self._freeSlots = list(range(slotCount))
+        self._workers = [self._newWorker() for _ in range(workers)]
+        self._pending = collections.deque()         # tasks waiting for a worker
+        self._running = {}                          # taskId -> (_Task, _Worker)
+        self._taskIds = itertools.count(1)
+        self._nextSequence = collections.defaultdict(int)    # key -> next sequence to submit
+        self._deliverSequence = collections.defaultdict(int) # key -> next sequence to deliver
+        self._finished = {}                         # (key, sequence) -> callable delivering it
+        self._setTimer = setTimer
+        self._timerOn = False
+        self._closed = False
+
+    def _newWorker(self):
+        return _Worker(self._context, self._shm.name, self.slotSize)
+
+    # submitting
+
+    def submit(self, handler, words, wordInfo=None, key=None, onDone=None, onError=None):
+        """run handler(words, wordInfo) in a worker process
+
+        onDone(value) and onError(message) are called on the thread which
+        calls poll (the natlink thread); the calls for one key are made in
+        the order of submit.
+        """
+        if self._closed:
+            raise RuntimeError('the process handler pool is closed')
+        data = pickle.dumps((words, wordInfo), pickle.HIGHEST_PROTOCOL)
+        slot, inline = -1, data
+        if len(data) <= self.slotSize and self._freeSlots:
+            slot, inline = self._freeSlots.pop(), None
+            start = slot * self.slotSize
+            self._shm.buf[start:start + len(data)] = data
+        sequence = self._nextSequence[key]
+        self._nextSequence[key] += 1
+        task = _Task(next(self._taskIds), key, sequence, handler, slot, len(data), inline,
+                     onDone, onError)
+        self._pending.append(task)
+        self._dispatch()
+        self._startTimer()
+        return task.taskId
+
+    def _dispatch(self):
+        for worker in self._workers:
+            if not self._pending:
+                return
+            if worker.task is None:
+                task = self._pending.popleft()
+                worker.task = task
+                worker.started = time.monotonic()
+                self._running[task.taskId] = (task, worker)
+                worker.taskQueue.put((task.taskId, task.handler, task.slot, task.length,
+                                      task.inline))
+
+    # collecting
+
+    def poll(self):
+        """collect finished tasks, deliver their results and start waiting tasks
+
+        Also replaces workers which died or ran past taskTimeout.  Returns
+        the number of tasks still outstanding.
+        """
+        for worker in self._workers:
+            for taskId, ok, value in worker.collect():
+                entry = self._running.pop(taskId, None)
+                if entry is None:
+                    continue
+                task = entry[0]
+                worker.task = None
+                self._finish(task, ok, value)
+        now = time.monotonic()
+        for index, worker in enumerate(self._workers):
+            task = worker.task
+            if task is None:
+                continue
+            if not worker.process.is_alive():
+                problem = f'the worker process stopped (exit code {worker.process.exitcode})'
+            elif now - worker.started > self.taskTimeout:
+                problem = f'the handler ran longer than {self.taskTimeout} seconds'
+                worker.process.terminate()
+            else:
+                continue
+            worker.process.join(1)
+            worker.discard()
+            self._running.pop(task.taskId, None)
+            self._workers[index] = self._newWorker()
+            self._finish(task, False, problem)
+        self._dispatch()
+        outstanding = len(self._pending) + len(self._running)
+        if not outstanding:
+            self._stopTimer()
+        return outstanding
+
+    def wait(self, timeout=None):
+        """poll until all tasks are done; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(POLL_INTERVAL / 1000.0)
+        return True
+
+    def _finish(self, task, ok, value):
+        if task.slot >= 0:
+            self._freeSlots.append(task.slot)
+        if ok:
+            deliver = lambda: self._call(task.onDone, value)
+        else:
+            deliver = lambda: self._call(task.onError, value, task)
+        self._finished[(task.key, task.sequence)] = deliver
+        # deliver in order for the key
+        while (task.key, self._deliverSequence[task.key]) in self._finished:
+            self._finished.pop((task.key, self._deliverSequence[task.key]))()
+            self._deliverSequence[task.key] += 1
+
+    @staticmethod
+    def _call(function, value, task=None):
+        if task is not None and function is None:
+            print(f'error in process handler {getattr(task.handler, "__qualname__", task.handler)}:')
+            print(value)
+            return
+        if function is None:
+            return
+        try:
+            function(value)
+        except Exception:
+            traceback.print_exc()
+
+    # the timer
+
+    def _startTimer(self):
+        if self._timerOn:
+            return
+        if self._setTimer is None:
+            from natlink import timerservice        #pylint:disable=C0415
+            self._setTimer = timerservice.getTimerService().timerSlot('processworkers')
+        self._timerOn = True
+        self._setTimer(self.poll, POLL_INTERVAL)
+
+    def _stopTimer(self):
+        if self._timerOn:
+            self._timerOn = False
+            self._setTimer(None, 0)
+
+    # closing
+
+    def close(self, timeout=5.0):
+        """wait for the outstanding tasks (at most timeout seconds) and stop the workers"""
+        if self._closed:
+            return
+        self.wait(timeout)
+        self._closed = True
+        for worker in self._workers:
+            worker.taskQueue.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join(1)
+            worker.discard()
+        self._stopTimer()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def setProcessResultsCallback(gramObj, handler, pool, onDone=performActions, onError=None,
+                              wordInfo=False):
+    """handle the results of gramObj with handler in a worker process of pool
+
+    The results callback of the grammar is made asynchronous (see
+    GramObj.setResultsCallback); it only snapshots the words (and the word
+    information when wordInfo is true) and submits them.  Pass None as
+    handler to remove the callback.  Returns the callback which was set.
+    """
+    if handler is None:
+        gramObj.setResultsCallback(None)
+        return None
+
+    def gotResults(words, resObj):
+        info = None
+        if wordInfo and resObj is not None:
+            try:
+                info = resObj.getWordInfo(0)
+            except Exception:
+                info = None
+        pool.submit(handler, words, info, key=id(gramObj), onDone=onDone, onError=onError)
+
+    gramObj.setResultsCallback(gotResults, 1)
+    return gotResults
@@ -0,0 +1,315 @@
+"""Compact binary log of recognition results.
+
+ResultLogWriter appends one record per recognition (time stamp, module
+information, getResults and getWordInfo lists) to a file, ResultLogReader
+memory maps a file and gives random access to its records.  Strings are
+stored once per file and records are packed with struct, and written a
+few at a time, so appending is cheap in a results callback.
+"""
+import collections
+import mmap
+import os
+import struct
+import time
+
+FORMAT_MAGIC = b'NLRR'
+FORMAT_VERSION = 2
+_HEADER = FORMAT_MAGIC + bytes([FORMAT_VERSION, 0, 0, 0])
+
+HAS_MODULE = 0x01
+HAS_RESULTS = 0x02
+HAS_WORDINFO = 0x04
+
+DEFAULT_BATCH_SIZE = 8          # records queued before they are written
+FLUSH_DELAY = 1.0               # seconds before queued records are written, with a timer service
+
+ResultRecord = collections.namedtuple('ResultRecord', 'timeStamp module results wordInfo')
+ResultRecord.__doc__ = """One record of a result log.
+
+timeStamp is in seconds, module is a (moduleName, windowTitle, hwnd) tuple
+or None, results is a getResults list or None, wordInfo is a getWordInfo
+list or None.
+"""
+
+# file layout (little endian):
+#   header:  b'NLRR', format version (1 byte), 3 reserved bytes
+#   records: uint32 body length, body
+#   body:    uint32 number of new strings, for each: uint32 length, utf-8;
+#            _RECORD_HEAD (time stamp, flags, number of results, number of
+#            word info entries), then _MODULE, _RESULT and _WORDINFO entries,
+#            with the strings as indices in the string table of the file
+_UINT32 = struct.Struct('<I')
+_RECORD_HEAD = '<dBHH'
+_MODULE = 'IIq'
+_RESULT = 'Ii'
+_WORDINFO = 'IiiiiiI'
+
+# the Struct for each (flags, number of results, number of word info entries)
+_layouts = {}
+
+
+def _layout(flags, resultCount, wordInfoCount):
+    key = (flags, resultCount, wordInfoCount)
+    layout = _layouts.get(key)
+    if layout is None:
+        layout = _layouts[key] = struct.Struct(
+            _RECORD_HEAD + (_MODULE if flags & HAS_MODULE else '') +
+            _RESULT * resultCount + _WORDINFO * wordInfoCount)
+    return layout
+
+
+class ResultLogError(Exception):
+    """The result log is not valid or has an unsupported format version"""
+
+
+def _readStrings(buf, pos, strings):
+    count = _UINT32.unpack_from(buf, pos)[0]
+    pos += 4
+    for _ in range(count):
+        length = _UINT32.unpack_from(buf, pos)[0]
+        pos += 4
+        strings.append(bytes(buf[pos:pos + length]).decode('utf-8'))
+        pos += length
+    return pos
+
+
+def _scanRecords(buf, start, end, strings, offsets):
+    """collect record offsets and the string table from buf[start:end]
+
+    Stops at a truncated record (a writer which was interrupted); returns the
+    position after the last complete record.
+    """
+    pos = start
+    while pos + 4 <= end:
+        length = _UINT32.unpack_from(buf, pos)[0]
+        bodyStart = pos + 4
+        if bodyStart + length > end:
+            break
+        _readStrings(buf, bodyStart, strings)
+        offsets.append(bodyStart)
+        pos = bodyStart + length
+    return pos
+
+
+def _decodeRecord(buf, pos, strings):
+    count = _UINT32.unpack_from(buf, pos)[0]
+    pos += 4
+    for _ in range(count):
+        pos += 4 + _UINT32.unpack_from(buf, pos)[0]
+    timeStamp, flags, resultCount, wordInfoCount = struct.unpack_from(_RECORD_HEAD, buf, pos)
+    values = _layout(flags, resultCount, wordInfoCount).unpack_from(buf, pos)
+    i = 4
+    module = results = wordInfo = None
+    if flags & HAS_MODULE:
+        module = (strings[values[4]], strings[values[5]], values[6])
+        i = 7
+    if flags & HAS_RESULTS:
+        results = []
+        for _ in range(resultCount):
+            results.append((strings[values[i]], values[i + 1]))
+            i += 2
+    if flags & HAS_WORDINFO:
+        wordInfo = []
+        for _ in range(wordInfoCount):
+            word, cfgParse, score, startTime, endTime, engineInfo, pron = values[i:i + 7]
+            wordInfo.append((strings[word], cfgParse, score, startTime, endTime,
+                             engineInfo, strings[pron]))
+            i += 7
+    return ResultRecord(timeStamp, module, results, wordInfo)
+
+
+def _checkHeader(header, path):
+    if len(header) < len(_HEADER) or header[:4] != FORMAT_MAGIC:
+        raise ResultLogError(f'{path} is not a result log')
+    if header[4] != FORMAT_VERSION:
+        raise ResultLogError(f'{path} has result log format version {header[4]}, '
+                             f'expected {FORMAT_VERSION}')
+
+
+class ResultLogWriter:
+    """appends result records to a file
+
+    Opening an existing result log reads its string table and continues it.
+    Records are encoded when they are appended and written batchSize at a
+    time; call flush (or close) to write them earlier.  With a timerService
+    (natlink.timerservice) queued records are also written flushDelay
+    seconds after the first of them.
+    """
+    def __init__(self, path, batchSize=DEFAULT_BATCH_SIZE, timerService=None,
+                 flushDelay=FLUSH_DELAY):
+        self.path = path
+        self.batchSize = batchSize
+        self.flushDelay = flushDelay
+        self._timerService = timerService
+        self._flushTimer = None
+        self._strings = {}
+        self._pending = []
+        self.recordCount = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                data = f.read()
+            _checkHeader(data[:len(_HEADER)], path)
+            strings, offsets = [], []
+            end = _scanRecords(data, len(_HEADER), len(data), strings, offsets)
+            self._strings = {s: i for i, s in enumerate(strings)}
+            self.recordCount = len(offsets)
+            self._file = open(path, 'r+b')      #pylint:disable=R1732
+            # drop a truncated last record
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(path, 'wb')       #pylint:disable=R1732
+            self._file.write(_HEADER)
+            self._file.flush()
+
+    def append(self, results=None, wordInfo=None, module=None, timeStamp=None):
+        """queue one record, returns the record number
+
+        results and wordInfo are the lists returned by ResObj.getResults and
+        ResObj.getWordInfo, module is the tuple from getCurrentModule; each
+        of them can be None.
+        """
+        body = self._encode(time.time() if timeStamp is None else timeStamp,
+                            results, wordInfo, module)
+        pending = self._pending
+        pending.append(_UINT32.pack(len(body)) + body)
+        if len(pending) >= self.batchSize:
+            self._writePending()
+        elif self._timerService is not None and self._flushTimer is None:
+            self._flushTimer = self._timerService.callLater(self.flushDelay, self._writePending)
+        self.recordCount += 1
+        return self.recordCount - 1
+
+    def appendResObj(self, resObj, module=None, timeStamp=None):
+        """append the results and word information of a ResObj (choice 0)"""
+        return self.append(resObj.getResults(0), resObj.getWordInfo(0), module, timeStamp)
+
+    def _encode(self, timeStamp, results, wordInfo, module):
+        """return the body of one record"""
+        get = self._strings.get
+        flags = 0
+        values = [timeStamp, 0, 0, 0]
+        add = values.extend
+        if module is not None:
+            flags |= HAS_MODULE
+            add((get(module[0]), get(module[1]), module[2]))
+        if results is not None:
+            flags |= HAS_RESULTS
+            for word, rule in results:
+                add((get(word), rule))
+        if wordInfo is not None:
+            flags |= HAS_WORDINFO
+            for word, cfgParse, score, startTime, endTime, engineInfo, pron in wordInfo:
+                add((get(word), cfgParse, score, startTime, endTime, engineInfo, get(pron)))
+        resultCount = len(results) if results is not None else 0
+        wordInfoCount = len(wordInfo) if wordInfo is not None else 0
+        values[1:4] = flags, resultCount, wordInfoCount
+        if None not in values:
+            return b'\0\0\0\0' + _layout(flags, resultCount, wordInfoCount).pack(*values)
+        # a string which is not in the table yet
+        newStrings = self._internRecord(results, wordInfo, module)
+        head = [_UINT32.pack(len(newStrings))]
+        for string in newStrings:
+            encoded = string.encode('utf-8')
+            head.append(_UINT32.pack(len(encoded)))
+            head.append(encoded)
+        return b''.join(head) + self._encode(timeStamp, results, wordInfo, module)[4:]
+
+    def _internRecord(self, results, wordInfo, module):
+        """add the new strings of a record to the table, returns them"""
+        strings = self._strings
+        newStrings = []
+        candidates = []
+        if module is not None:
+            candidates.extend(module[:2])
+        if results is not None:
+            candidates.extend(entry[0] for entry in results)
+        if wordInfo is not None:
+            for entry in wordInfo:
+                candidates.append(entry[0])
+                candidates.append(entry[6])
+        for string in candidates:
+            if string not in strings:
+                strings[string] = len(strings)
+                newStrings.append(string)
+        return newStrings
+
+    def _writePending(self):
+        if self._flushTimer is not None:
+            self._timerService.cancel(self._flushTimer)
+            self._flushTimer = None
+        pending, self._pending = self._pending, []
+        if pending:
+            self._file.write(b''.join(pending))
+            self._file.flush()
+
+    def flush(self):
+        """write the queued records now"""
+        self._writePending()
+
+    def close(self):
+        if not self._file.closed:
+            self._writePending()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ResultLogReader:
+    """random access to the records of a result log through a memory map
+
+    The record offsets and the string table are collected when the log is
+    opened; call refresh to pick up records appended since.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')       #pylint:disable=R1732
+        self._map = None
+        self._strings = []
+        self._offsets = []
+        self._scanned = len(_HEADER)
+        try:
+            _checkHeader(self._file.read(len(_HEADER)), path)
+        except ResultLogError:
+            self._file.close()
+            raise
+        self.refresh()
+
+    def refresh(self):
+        """map the current file and index the records appended since the last refresh"""
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            return
+        if self._map is not None:
+            if len(self._map) == size:
+                return
+            self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._scanned = _scanRecords(self._map, self._scanned, size,
+                                     self._strings, self._offsets)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        return _decodeRecord(self._map, self._offsets[index], self._strings)
+
+    def __iter__(self):
+        for offset in self._offsets:
+            yield _decodeRecord(self._map, offset, self._strings)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
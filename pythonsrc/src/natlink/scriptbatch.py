@@ -0,0 +1,124 @@
+"""Run many Dragon script statements with few execScript calls.
+
+execScriptBatch joins the statements into as few scripts as maxStatements
+and maxBytes allow; when one fails, ScriptBatchError tells which statement
+it was::
+
+    natlink.execScriptBatch([
+        'SendSystemKeys "{Ctrl+c}"',
+        'Wait 100',
+        sendKeys.render(keys='{Alt+Tab}'),     # a natlink.ScriptTemplate
+    ])
+"""
+#pylint:disable=W0718
+
+import re
+
+ENCODING = 'windows-1252'
+MAX_STATEMENTS = 50             # statements in one script, at most
+MAX_BYTES = 8000                # bytes in one script, at most
+SEPARATOR = b'\n'
+
+# the line NatSpeak reports ends the message, which also holds the script
+_LINE_RE = re.compile(r'\(line (\d+)\)\s*$')
+
+
+class ScriptBatchError(Exception):
+    """a statement of execScriptBatch failed
+
+    index is the position of the failing statement in the list (None when
+    NatSpeak did not say which line failed), statement its text and
+    executed the number of statements in the list before the ones which
+    did not run (or did not finish).
+    """
+    def __init__(self, message, index, statement, executed):
+        super().__init__(message)
+        self.index = index
+        self.statement = statement
+        self.executed = executed
+
+
+def _encodeStatement(statement):
+    if isinstance(statement, bytes):
+        encoded = statement
+    else:
+        try:
+            encoded = statement.encode(ENCODING)
+        except UnicodeEncodeError as exc:
+            raise ValueError(f'statement cannot be encoded in {ENCODING}: {statement!r}') from exc
+    return encoded.replace(b'\r\n', b'\n').strip(b'\n')
+
+
+def makeBatches(statements, maxStatements=MAX_STATEMENTS, maxBytes=MAX_BYTES):
+    """return a list of batches, each a tuple (script, indices, lineCounts)
+
+    script is the encoded script, indices the positions of its statements in
+    statements and lineCounts the number of lines of each.  A statement longer
+    than maxBytes gets a batch of its own.
+    """
+    batches = []
+    pieces, indices, lineCounts = [], [], []
+    size = 0
+    for index, statement in enumerate(statements):
+        encoded = _encodeStatement(statement)
+        if not encoded:
+            continue
+        length = len(encoded) + len(SEPARATOR)
+        if pieces and (len(pieces) >= maxStatements or size + length > maxBytes):
+            batches.append((SEPARATOR.join(pieces), tuple(indices), tuple(lineCounts)))
+            pieces, indices, lineCounts = [], [], []
+            size = 0
+        pieces.append(encoded)
+        indices.append(index)
+        lineCounts.append(encoded.count(b'\n') + 1)
+        size += length
+    if pieces:
+        batches.append((SEPARATOR.join(pieces), tuple(indices), tuple(lineCounts)))
+    return batches
+
+
+def _failedStatement(message, indices, lineCounts):
+    """return the position in indices of the statement with the line in message, or None"""
+    match = _LINE_RE.search(message)
+    if not match:
+        return None
+    line = int(match.group(1))
+    first = 1
+    for position, count in enumerate(lineCounts):
+        if line < first + count:
+            return position
+        first += count
+    return None
+
+
+def execScriptBatch(statements, maxStatements=MAX_STATEMENTS, maxBytes=MAX_BYTES,
+                    execScript=None):
+    """run the statements in as few execScript calls as the limits allow
+
+    Returns the number of execScript calls made.  execScript defaults to
+    natlink.execScript.
+    """
+    if execScript is None:
+        import natlink      #pylint:disable=C0415
+        execScript = natlink.execScript
+    statements = list(statements)
+    batches = makeBatches(statements, maxStatements, maxBytes)
+    for script, indices, lineCounts in batches:
+        try:
+            execScript(script)
+        except Exception as exc:
+            message = str(exc)
+            position = _failedStatement(message, indices, lineCounts)
+            # natlink.SyntaxError: CheckScript failed, nothing of this batch ran
+            syntaxError = type(exc).__name__ == 'SyntaxError'
+            if position is None:
+                index = statement = None
+                executed = indices[0]
+            else:
+                index = indices[position]
+                statement = statements[index]
+                executed = indices[0] if syntaxError else index
+            where = f'statement {index}' if index is not None else 'a statement'
+            raise ScriptBatchError(f'execScriptBatch: {where} failed: {message}',
+                                   index, statement, executed) from exc
+    return len(batches)
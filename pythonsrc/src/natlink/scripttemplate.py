@@ -0,0 +1,113 @@
+"""Dragon scripts with parameters, encoded once.
+
+A ScriptTemplate is checked and encoded to Windows-1252 once; a call only
+encodes and escapes its parameter values::
+
+    from natlink import ScriptTemplate
+
+    sendKeys = ScriptTemplate('SendSystemKeys("$keys")')
+    sendKeys.execute(keys='{Ctrl+s}')
+
+Parameters are written $name or ${name}; $$ is a dollar sign.
+"""
+import re
+
+ENCODING = 'windows-1252'
+
+_PARAMETER_RE = re.compile(r'\$(?:(\$)|([A-Za-z_]\w*)|\{([A-Za-z_]\w*)\})')
+_BARE_VALUE_RE = re.compile(r'-?[\w.]+')
+
+
+def _encode(text, what):
+    try:
+        return text.encode(ENCODING)
+    except UnicodeEncodeError as exc:
+        raise ValueError(f'{what} cannot be encoded in {ENCODING}: {text!r}') from exc
+
+
+def escapeString(value):
+    """return value as the contents of a script string literal (quotes doubled)"""
+    value = str(value)
+    if '\n' in value or '\r' in value:
+        raise ValueError(f'a line break cannot be put in a script string: {value!r}')
+    return value.replace('"', '""')
+
+
+def _bareValue(name, value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise TypeError(f'parameter {name!r} outside a string needs a number or a name, '
+                        f'not {type(value).__name__}')
+    text = str(value)
+    if not _BARE_VALUE_RE.fullmatch(text):
+        raise ValueError(f'parameter {name!r} outside a string cannot be {text!r}')
+    return text
+
+
+class ScriptTemplate:
+    """a Dragon script with $name parameters, checked and encoded once"""
+    __slots__ = ('script', 'parameters', '_parts', '_slots')
+
+    def __init__(self, script):
+        self.script = script
+        parts = []          # encoded literal parts, one more than there are slots
+        slots = []          # (name, inString)
+        literal = []
+        inString = False
+        position = 0
+        for match in _PARAMETER_RE.finditer(script):
+            text = script[position:match.start()]
+            inString = _quoteState(text, inString)
+            literal.append(text)
+            position = match.end()
+            if match.group(1):
+                literal.append('$')
+                continue
+            parts.append(_encode(''.join(literal), 'the script'))
+            literal = []
+            slots.append((match.group(2) or match.group(3), inString))
+        text = script[position:]
+        if _quoteState(text, inString):
+            raise ValueError(f'the script has a string which is not closed: {script!r}')
+        literal.append(text)
+        parts.append(_encode(''.join(literal), 'the script'))
+        self._parts = tuple(parts)
+        self._slots = tuple(slots)
+        self.parameters = frozenset(name for name, _ in slots)
+
+    def render(self, **values):
+        """return the encoded script with the values filled in"""
+        missing = self.parameters.difference(values)
+        if missing:
+            raise KeyError(f'no value for the parameters {sorted(missing)} of the script')
+        parts = self._parts
+        pieces = [parts[0]]
+        for i, (name, inString) in enumerate(self._slots):
+            value = values[name]
+            text = escapeString(value) if inString else _bareValue(name, value)
+            pieces.append(_encode(text, f'parameter {name!r}'))
+            pieces.append(parts[i + 1])
+        return b''.join(pieces)
+
+    def execute(self, **values):
+        """run the script with the values filled in (through natlink.execScript)"""
+        import natlink      #pylint:disable=C0415
+        return natlink.execScript(self.render(**values))
+
+    __call__ = execute
+
+    def __repr__(self):
+        return f'<ScriptTemplate {self.script!r}>'
+
+
+def _quoteState(text, inString):
+    """return whether a string literal is open after text
+
+    A doubled quote inside a string is an escaped quote, which does not
+    change the state; counting the quotes gives the same answer.
+    """
+    for line in text.split('\n')[:-1]:
+        if (line.count('"') % 2 == 1) != inString:
+            raise ValueError(f'a script string cannot span lines: {line!r}')
+        inString = False
+    last = text.split('\n')[-1]
+    return inString != (last.count('"') % 2 == 1)
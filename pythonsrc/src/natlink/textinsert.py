@@ -0,0 +1,227 @@
+"""Insert text by typing it or by pasting it through the clipboard.
+
+insertText types short text and pastes long text, by a length threshold or
+a policy per application::
+
+    from natlink import textinsert
+
+    inserter = textinsert.getTextInserter()
+    inserter.setPolicy('putty', 'type')         # never paste in a terminal
+    inserter.setPolicy('notepad', 200)          # paste from 200 characters
+    textinsert.insertText(snippet)
+"""
+#pylint:disable=W0718
+
+import ntpath
+import time
+import traceback
+
+DEFAULT_THRESHOLD = 100         # characters from which text is pasted
+DEFAULT_PASTE_DELAY = 0.1       # seconds before the clipboard is restored
+PASTE_KEYS = '{Ctrl+v}'
+_ESCAPE_BRACES = str.maketrans({'{': '{{}', '}': '{}}'})
+OPEN_RETRIES = 5                # attempts to open the clipboard
+OPEN_RETRY_DELAY = 0.01         # seconds between the attempts
+
+TYPE = 'type'
+PASTE = 'paste'
+
+# the clipboard formats of text: CF_TEXT, CF_OEMTEXT, CF_UNICODETEXT and
+# CF_LOCALE; Windows makes the others from CF_UNICODETEXT
+TEXT_FORMATS = (1, 7, 13, 16)
+CF_UNICODETEXT = 13
+
+
+class ClipboardError(Exception):
+    """the clipboard could not be used"""
+
+
+class Win32Clipboard:
+    """the text of the Windows clipboard, through win32clipboard
+
+    getText gives the CF_UNICODETEXT text, or None when the clipboard has
+    no text; setText(None) empties the clipboard.
+    """
+    def __init__(self, sleep=time.sleep):
+        self._sleep = sleep
+
+    def _open(self):
+        import win32clipboard       #pylint:disable=C0415, E0401
+        for _ in range(OPEN_RETRIES):
+            try:
+                win32clipboard.OpenClipboard()
+                return win32clipboard
+            except Exception:
+                self._sleep(OPEN_RETRY_DELAY)    # another program has it open
+        raise ClipboardError('cannot open the clipboard')
+
+    def getText(self):
+        win32clipboard = self._open()
+        try:
+            if not win32clipboard.IsClipboardFormatAvailable(CF_UNICODETEXT):
+                return None
+            return win32clipboard.GetClipboardData(CF_UNICODETEXT)
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def canRestore(self):
+        """return True when the clipboard holds nothing but text"""
+        win32clipboard = self._open()
+        try:
+            clipFormat = win32clipboard.EnumClipboardFormats(0)
+            while clipFormat:
+                if clipFormat not in TEXT_FORMATS:
+                    return False
+                clipFormat = win32clipboard.EnumClipboardFormats(clipFormat)
+            return True
+        finally:
+            win32clipboard.CloseClipboard()
+
+    def setText(self, text):
+        win32clipboard = self._open()
+        try:
+            win32clipboard.EmptyClipboard()
+            if text is not None:
+                win32clipboard.SetClipboardText(text, CF_UNICODETEXT)
+        finally:
+            win32clipboard.CloseClipboard()
+
+    @staticmethod
+    def sequenceNumber():
+        import win32clipboard       #pylint:disable=C0415, E0401
+        return win32clipboard.GetClipboardSequenceNumber()
+
+
+def escapeBraces(text):
+    """return text with { and } written as {{} and {}}, for playString"""
+    return text.translate(_ESCAPE_BRACES)
+
+
+def _sameText(a, b):
+    # the clipboard may give back other line ends
+    return a.replace('\r\n', '\n') == b.replace('\r\n', '\n')
+
+
+class TextInserter:
+    """types or pastes text, depending on its length and the application
+
+    playString(keys) and getCurrentModule() default to the natlink
+    functions, clipboard to a Win32Clipboard.  flushKeys() sends keys
+    which playString buffered (default: keyprogram.flushKeys with the
+    natlink playString, nothing otherwise).  The clipboard is restored
+    pasteDelay seconds after Ctrl+V, whether or not the paste is done.
+    When the clipboard holds more than text (an image, files, formatted
+    text), which could not be restored, the text is typed instead.
+    """
+    def __init__(self, threshold=DEFAULT_THRESHOLD, pasteDelay=DEFAULT_PASTE_DELAY,
+                 playString=None, getCurrentModule=None, clipboard=None, sleep=time.sleep,
+                 flushKeys=None):
+        if playString is None or getCurrentModule is None:
+            import natlink      #pylint:disable=C0415
+            from natlink import keyprogram      #pylint:disable=C0415
+            if playString is None:
+                playString = natlink.playString
+                flushKeys = flushKeys or keyprogram.flushKeys
+            getCurrentModule = getCurrentModule or natlink.getCurrentModule
+        self._flushKeys = flushKeys or (lambda: 0)
+        self.threshold = threshold
+        self.pasteDelay = pasteDelay
+        self._playString = playString
+        self._getCurrentModule = getCurrentModule
+        self._clipboard = clipboard or Win32Clipboard(sleep)
+        self._sleep = sleep
+        self._policies = {}
+        self.typed = self.pasted = self.pasteFailures = 0
+
+    # the policies
+
+    def setPolicy(self, appName, policy):
+        """set how text is inserted in an application
+
+        policy is 'type', 'paste', a threshold (paste from that many
+        characters) or None to go back to the default threshold.
+        """
+        if policy not in (TYPE, PASTE, None) and not isinstance(policy, int):
+            raise ValueError(f"policy must be 'type', 'paste', a number or None, not {policy!r}")
+        appName = appName.lower()
+        if policy is None:
+            self._policies.pop(appName, None)
+        else:
+            self._policies[appName] = policy
+
+    def currentApp(self):
+        """return the name of the application in the foreground"""
+        moduleName = self._getCurrentModule()[0]
+        return ntpath.splitext(ntpath.basename(moduleName))[0].lower()
+
+    def chooseMethod(self, text, appName=None):
+        """return 'type' or 'paste' for inserting text into appName (default: the current one)"""
+        if appName is None:
+            appName = self.currentApp()
+        policy = self._policies.get(appName.lower(), self.threshold)
+        if policy in (TYPE, PASTE):
+            return policy
+        return PASTE if len(text) >= policy else TYPE
+
+    # inserting
+
+    def insertText(self, text, appName=None):
+        """insert text into the foreground window; returns 'type' or 'paste'"""
+        if not text:
+            return TYPE
+        if self.chooseMethod(text, appName) == PASTE and self._paste(text):
+            self.pasted += 1
+            return PASTE
+        self._playString(escapeBraces(text))
+        self.typed += 1
+        return TYPE
+
+    def _paste(self, text):
+        """paste text through the clipboard; returns False if it could not be used"""
+        clipboard = self._clipboard
+        try:
+            if not clipboard.canRestore():
+                return False
+            saved = clipboard.getText()
+            clipboard.setText(text)
+            # checks that our text arrived (and that nobody else wrote in between)
+            copied = clipboard.getText()
+            if copied is None or not _sameText(copied, text):
+                raise ClipboardError('the text did not arrive on the clipboard')
+            sequence = clipboard.sequenceNumber()
+        except Exception:
+            self.pasteFailures += 1
+            print('error in textinsert, typing the text instead:')
+            traceback.print_exc()
+            return False
+        self._playString(PASTE_KEYS)
+        self._flushKeys()
+        # the application reads the clipboard when it handles Ctrl+V
+        self._sleep(self.pasteDelay)
+        try:
+            if clipboard.sequenceNumber() == sequence:
+                clipboard.setText(saved)
+        except Exception:
+            print('error in textinsert, could not restore the clipboard:')
+            traceback.print_exc()
+        return True
+
+    def getStats(self):
+        """return a dictionary with the number of 'typed' and 'pasted' texts and 'pasteFailures'"""
+        return {'typed': self.typed, 'pasted': self.pasted, 'pasteFailures': self.pasteFailures}
+
+
+_inserter = None
+
+
+def getTextInserter():
+    """return the TextInserter used by insertText, made on first use"""
+    global _inserter        #pylint:disable=W0603
+    if _inserter is None:
+        _inserter = TextInserter()
+    return _inserter
+
+
+def insertText(text, appName=None):
+    """type or paste text into the foreground window; returns 'type' or 'paste'"""
+    return getTextInserter().insertText(text, appName)
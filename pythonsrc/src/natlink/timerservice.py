@@ -0,0 +1,282 @@
+"""Many timers on the single natlink timer callback.
+
+natlink.setTimerCallback holds one callback with one interval.  TimerService
+keeps any number of named one-shot and periodic timers in a heap and arms
+the natlink timer for the next deadline only, so nothing polls::
+
+    from natlink.timerservice import getTimerService
+
+    timers = getTimerService()
+    timers.callEvery(1.0, checkWindow, name='checkWindow')
+    timers.callLater(0.3, closePopup)
+    ...
+    timers.cancel('checkWindow')
+
+Options per timer:
+
+    coalesce    a timer may run up to this many seconds early, when the
+                natlink timer fires for another timer anyway; this lets
+                timers which are not exact share wake-ups
+    catchUp     what a periodic timer does after its deadlines were missed
+                (NatSpeak was busy, or a long callback ran):
+                'skip'  run once, keep the phase (the default)
+                'burst' run once for every missed deadline (MAX_BURST at most)
+                'delay' run once, count the next interval from now
+
+getStats gives the jitter (how late each timer ran) and the number of
+missed deadlines per timer.
+
+A timer tick which arrives while another natlink callback runs is delivered
+when that callback is done.
+"""
+#pylint:disable=W0718
+
+import heapq
+import itertools
+import math
+import time
+import traceback
+
+CATCHUP_SKIP = 'skip'
+CATCHUP_BURST = 'burst'
+CATCHUP_DELAY = 'delay'
+_CATCHUP_POLICIES = (CATCHUP_SKIP, CATCHUP_BURST, CATCHUP_DELAY)
+
+MAX_BURST = 10                  # runs of a 'burst' timer per tick, at most
+MIN_INTERVAL = 1                # milliseconds, the shortest natlink timer
+
+
+class Timer:
+    """one timer of a TimerService; returned by callLater and callEvery"""
+    __slots__ = ('name', 'callback', 'interval', 'deadline', 'coalesce', 'catchUp',
+                 'cancelled', 'runs', 'missed', 'lateTotal', 'lateMax')
+
+    def __init__(self, name, callback, interval, deadline, coalesce, catchUp):
+        self.name = name
+        self.callback = callback
+        self.interval = interval        # None for a one-shot timer
+        self.deadline = deadline
+        self.coalesce = coalesce
+        self.catchUp = catchUp
+        self.cancelled = False
+        self.runs = 0
+        self.missed = 0
+        self.lateTotal = 0.0
+        self.lateMax = 0.0
+
+    def __repr__(self):
+        kind = f'every {self.interval}s' if self.interval else 'once'
+        return f'<Timer {self.name!r} {kind}>'
+
+
+class TimerService:
+    """named one-shot and periodic timers driven by one underlying timer
+
+    setTimer(callback, milliseconds) arms the underlying timer, with
+    callback None it stops it; it defaults to natlink.setTimerCallback.
+    clock returns the time in seconds.
+    """
+    def __init__(self, setTimer=None, clock=time.monotonic):
+        if setTimer is None:
+            import natlink      #pylint:disable=C0415
+            setTimer = natlink.setTimerCallback
+        self._setTimer = setTimer
+        self._clock = clock
+        self._heap = []                 # (deadline, sequence, Timer)
+        self._sequence = itertools.count()
+        self._timers = {}               # name -> Timer
+        self._armedFor = None           # deadline the underlying timer is set for
+        self._inTick = False
+
+    # adding and removing timers
+
+    def callLater(self, delay, callback, name=None, coalesce=0.0):
+        """run callback() once, delay seconds from now; returns the Timer"""
+        return self._add(name, callback, None, delay, coalesce, CATCHUP_SKIP)
+
+    def callEvery(self, interval, callback, name=None, delay=None, coalesce=0.0,
+                  catchUp=CATCHUP_SKIP):
+        """run callback() every interval seconds; returns the Timer
+
+        The first run is after delay seconds (default: after interval).
+        """
+        if interval <= 0:
+            raise ValueError(f'the interval of a periodic timer must be positive, not {interval}')
+        return self._add(name, callback, interval, interval if delay is None else delay,
+                         coalesce, catchUp)
+
+    def _add(self, name, callback, interval, delay, coalesce, catchUp):
+        if catchUp not in _CATCHUP_POLICIES:
+            raise ValueError(f'unknown catchUp policy {catchUp!r}, expected one of {_CATCHUP_POLICIES}')
+        if name is None:
+            name = getattr(callback, '__qualname__', None) or repr(callback)
+            name = f'{name}#{next(self._sequence)}'
+        self.cancel(name)
+        timer = Timer(name, callback, interval, self._clock() + max(delay, 0.0),
+                      coalesce, catchUp)
+        self._timers[name] = timer
+        self._push(timer)
+        self._arm()
+        return timer
+
+    def cancel(self, timer):
+        """stop a timer, given by name or Timer; returns False if it was not active"""
+        if isinstance(timer, Timer):
+            if self._timers.get(timer.name) is not timer:
+                return False
+            name = timer.name
+        else:
+            name = timer
+        timer = self._timers.pop(name, None)
+        if timer is None:
+            return False
+        timer.cancelled = True
+        self._arm()
+        return True
+
+    def cancelAll(self):
+        """stop all timers and the underlying timer"""
+        for timer in self._timers.values():
+            timer.cancelled = True
+        self._timers.clear()
+        self._heap.clear()
+        self._arm()
+
+    def getTimer(self, name):
+        """return the active Timer with this name, or None"""
+        return self._timers.get(name)
+
+    def timerNames(self):
+        """return the names of the active timers"""
+        return list(self._timers)
+
+    def timerSlot(self, name):
+        """return a function with the signature of natlink.setTimerCallback
+
+        The function sets (or, with a callback of None, cancels) the
+        periodic timer name, so code written for setTimerCallback can share
+        the service.
+        """
+        def setTimer(callback, milliseconds=0):
+            if callback is None:
+                self.cancel(name)
+            else:
+                self.callEvery(max(milliseconds, MIN_INTERVAL) / 1000.0, callback, name=name)
+        return setTimer
+
+    # statistics
+
+    def getStats(self, reset=False):
+        """return {name: stats} for the active timers
+
+        stats is a dictionary with 'runs', 'missed' (deadlines which were
+        skipped or run late by more than an interval), 'meanLate' and
+        'maxLate' (how late the timer ran, in milliseconds).
+        """
+        stats = {}
+        for name, timer in self._timers.items():
+            stats[name] = {
+                'runs': timer.runs,
+                'missed': timer.missed,
+                'meanLate': timer.lateTotal * 1000.0 / timer.runs if timer.runs else 0.0,
+                'maxLate': timer.lateMax * 1000.0,
+            }
+            if reset:
+                timer.runs = timer.missed = 0
+                timer.lateTotal = timer.lateMax = 0.0
+        return stats
+
+    # running
+
+    def _push(self, timer):
+        heapq.heappush(self._heap, (timer.deadline, next(self._sequence), timer))
+
+    def _nextDeadline(self):
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def _arm(self):
+        """set the underlying timer for the first deadline"""
+        if self._inTick:
+            return      # _tick arms when it is done
+        deadline = self._nextDeadline()
+        if deadline == self._armedFor:
+            return
+        self._armedFor = deadline
+        if deadline is None:
+            self._setTimer(None, 0)
+        else:
+            # rounded first so that float noise does not add a millisecond
+            milliseconds = math.ceil(round((deadline - self._clock()) * 1000.0, 3))
+            self._setTimer(self._tick, max(milliseconds, MIN_INTERVAL))
+
+    def _tick(self):
+        """the callback of the underlying timer: run the timers which are due"""
+        self._inTick = True
+        self._armedFor = None
+        try:
+            now = self._clock()
+            heap = self._heap
+            due = []
+            while heap and heap[0][0] <= now:
+                timer = heapq.heappop(heap)[2]
+                if not timer.cancelled:
+                    due.append(timer)
+            # timers which may run early join this wake-up
+            if any(entry[2].coalesce for entry in heap):
+                keep = []
+                for entry in heap:
+                    timer = entry[2]
+                    if timer.cancelled:
+                        continue
+                    if entry[0] <= now + timer.coalesce:
+                        due.append(timer)
+                    else:
+                        keep.append(entry)
+                heapq.heapify(keep)
+                heap[:] = keep
+            for timer in due:
+                if not timer.cancelled:
+                    self._run(timer, now)
+        finally:
+            self._inTick = False
+            self._arm()
+
+    def _run(self, timer, now):
+        late = max(now - timer.deadline, 0.0)
+        runs = 1
+        if timer.interval:
+            missed = int(late // timer.interval)
+            timer.missed += missed
+            if timer.catchUp == CATCHUP_BURST:
+                runs = min(missed + 1, MAX_BURST)
+            if timer.catchUp == CATCHUP_DELAY:
+                timer.deadline = now + timer.interval
+            else:
+                timer.deadline += (missed + 1) * timer.interval
+            self._push(timer)
+        else:
+            del self._timers[timer.name]
+            timer.cancelled = True
+        timer.runs += 1
+        timer.lateTotal += late
+        timer.lateMax = max(timer.lateMax, late)
+        for _ in range(runs):
+            try:
+                timer.callback()
+            except Exception:
+                print(f'error in timer {timer.name!r}:')
+                traceback.print_exc()
+
+
+_service = None
+
+
+def getTimerService():
+    """return the TimerService on natlink.setTimerCallback, made on first use"""
+    global _service     #pylint:disable=W0603
+    if _service is None:
+        _service = TimerService()
+    return _service
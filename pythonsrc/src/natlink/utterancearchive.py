@@ -0,0 +1,348 @@
+"""Disk backed ring archive of recent utterances.
+
+The archive keeps the last N utterances (audio, words, rule numbers and word
+timings) in a fixed size file which is memory mapped.  Every utterance
+occupies one slot of the file; when all slots are used the oldest utterance
+is overwritten.  Because the file size never changes the archive costs the
+same whether it has been running for a minute or for a month.
+
+Typical use from a results callback::
+
+    archive = UtteranceArchive(path)
+
+    def gotResults(words, resObj):
+        archive.record(resObj)
+
+record() only pulls the data out of the ResObj (this has to happen on the
+natlink thread, while the results object is valid); packing the record and
+writing it into the mapped file is done by a background writer thread, so
+the results callback is not held up by disk io.
+
+Utterances can be looked up by utterance id (returned from record) or by
+time stamp, also after the archive has been closed and opened again.
+"""
+#pylint:disable=W0718
+
+import bisect
+import collections
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+
+# file header: magic, version, slot count, slot size
+_FILE_MAGIC = b'NLUA'
+_FILE_VERSION = 1
+_FILE_HEADER = struct.Struct('<4sHxxII')
+_FILE_HEADER_SIZE = 64
+
+# slot header: utterance id (0 is an empty slot), time stamp, flags,
+# length of the metadata, length of the stored audio and original length of
+# the audio
+_SLOT_HEADER = struct.Struct('<QdIIII')
+
+# slot flags
+FLAG_TRUNCATED = 0x0001     # the audio did not fit in the slot
+FLAG_NOAUDIO = 0x0002       # the results object had no audio
+
+DEFAULT_SLOT_COUNT = 256
+DEFAULT_SLOT_SIZE = 256 * 1024      # about 11 seconds of 11 kHz 16 bit audio
+
+ArchivedUtterance = collections.namedtuple(
+    'ArchivedUtterance',
+    'utteranceId timeStamp words rules timings wave truncated')
+ArchivedUtterance.__doc__ = """One utterance read back from the archive.
+
+words and rules are lists of equal length, timings is a list of
+(startTime, endTime) pairs in milliseconds from the start of the utterance
+(same as ResObj.getWordInfo), wave is the (possibly truncated) audio.
+"""
+
+
+class ArchiveError(Exception):
+    """The archive file is not valid or does not match the requested layout"""
+
+
+def extractUtterance(resObj):
+    """pull words, rule numbers, timings and audio out of a ResObj
+
+    Returns a tuple (words, rules, timings, wave).  Must be called from the
+    natlink thread while the results object is valid.  Missing audio
+    (DataMissing from ResObj.getWave) or word information is not an error,
+    the corresponding fields are left empty.
+    """
+    words, rules, timings = [], [], []
+    try:
+        for info in resObj.getWordInfo(0) or []:
+            words.append(info[0])
+            rules.append(info[1])
+            timings.append((info[3], info[4]))
+    except Exception:
+        words, rules, timings = [], [], []
+        for word, rule in resObj.getResults(0) or []:
+            words.append(word)
+            rules.append(rule)
+    try:
+        wave = resObj.getWave()
+    except Exception as exc:
+        # natlink.DataMissing, checked by name so natlink is not imported
+        if type(exc).__name__ != 'DataMissing':
+            raise
+        wave = b''
+    return words, rules, timings, wave
+
+
+class UtteranceArchive:
+    """ring archive of the last slotCount utterances in a memory mapped file
+
+    If the file exists it is opened and its index is rebuilt from the slot
+    headers; slotCount and slotSize must then match the file (or be None).
+    Audio which does not fit in a slot is truncated and the utterance is
+    flagged as truncated.
+    """
+    def __init__(self, path, slotCount=None, slotSize=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._byId = {}             # utterance id -> slot number
+        self._byTime = []           # sorted (timeStamp, utteranceId)
+        self._nextId = 1
+        self._nextSlot = 0
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writeError = None     # (utterance id, exception) of the first failed write
+        self._closed = False
+        self._openFile(slotCount, slotSize)
+        self._rebuildIndex()
+
+    # file handling
+
+    def _openFile(self, slotCount, slotSize):
+        exists = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        if exists:
+            self._file = open(self.path, 'r+b')     #pylint:disable=R1732
+            header = self._file.read(_FILE_HEADER.size)
+            if len(header) < _FILE_HEADER.size:
+                self._file.close()
+                raise ArchiveError(f'{self.path} is not an utterance archive')
+            magic, version, fileSlotCount, fileSlotSize = _FILE_HEADER.unpack(header)
+            if magic != _FILE_MAGIC or version != _FILE_VERSION:
+                self._file.close()
+                raise ArchiveError(f'{self.path} is not an utterance archive (version {version})')
+            if (slotCount not in (None, fileSlotCount)) or (slotSize not in (None, fileSlotSize)):
+                self._file.close()
+                raise ArchiveError(
+                    f'{self.path} has {fileSlotCount} slots of {fileSlotSize} bytes, '
+                    f'not {slotCount} slots of {slotSize} bytes')
+            slotCount, slotSize = fileSlotCount, fileSlotSize
+        else:
+            slotCount = slotCount or DEFAULT_SLOT_COUNT
+            slotSize = slotSize or DEFAULT_SLOT_SIZE
+            if slotCount < 1 or slotSize <= _SLOT_HEADER.size:
+                raise ValueError(f'invalid archive layout: {slotCount} slots of {slotSize} bytes')
+            self._file = open(self.path, 'w+b')     #pylint:disable=R1732
+            self._file.truncate(_FILE_HEADER_SIZE + slotCount * slotSize)
+            self._file.write(_FILE_HEADER.pack(_FILE_MAGIC, _FILE_VERSION, slotCount, slotSize))
+            self._file.flush()
+        self.slotCount = slotCount
+        self.slotSize = slotSize
+        self._map = mmap.mmap(self._file.fileno(), _FILE_HEADER_SIZE + slotCount * slotSize)
+
+    def _slotOffset(self, slot):
+        return _FILE_HEADER_SIZE + slot * self.slotSize
+
+    def _readSlotHeader(self, slot):
+        return _SLOT_HEADER.unpack_from(self._map, self._slotOffset(slot))
+
+    def _rebuildIndex(self):
+        newest = (0, -1)
+        for slot in range(self.slotCount):
+            utteranceId, timeStamp = self._readSlotHeader(slot)[:2]
+            if not utteranceId:
+                continue
+            self._byId[utteranceId] = slot
+            self._byTime.append((timeStamp, utteranceId))
+            newest = max(newest, (utteranceId, slot))
+        self._byTime.sort()
+        if newest[0]:
+            self._nextId = newest[0] + 1
+            self._nextSlot = (newest[1] + 1) % self.slotCount
+
+    # writing
+
+    def record(self, resObj, timeStamp=None):
+        """archive the utterance of a results object, returns the utterance id
+
+        The ResObj is read immediately, the archive file is written by the
+        background writer thread.
+        """
+        words, rules, timings, wave = extractUtterance(resObj)
+        return self.recordData(words, rules, timings, wave, timeStamp)
+
+    def recordData(self, words, rules, timings, wave, timeStamp=None):
+        """archive an utterance given as plain data, returns the utterance id"""
+        if self._closed:
+            raise ArchiveError('the utterance archive is closed')
+        if timeStamp is None:
+            timeStamp = time.time()
+        with self._lock:
+            utteranceId = self._nextId
+            self._nextId += 1
+            slot = self._nextSlot
+            self._nextSlot = (slot + 1) % self.slotCount
+        self._startWriter()
+        self._queue.put((slot, utteranceId, timeStamp, words, rules, timings, wave))
+        return utteranceId
+
+    def _startWriter(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writeLoop,
+                                            name='natlink utterance archive', daemon=True)
+            self._writer.start()
+
+    def _writeLoop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._writeSlot(*item)
+            except Exception as exc:
+                # reported by flush or close, on the thread calling them
+                if self._writeError is None:
+                    self._writeError = (item[1], exc)
+            finally:
+                self._queue.task_done()
+
+    def _writeSlot(self, slot, utteranceId, timeStamp, words, rules, timings, wave):
+        meta = json.dumps([list(words), list(rules), [list(t) for t in timings]],
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        room = self.slotSize - _SLOT_HEADER.size
+        if len(meta) > room:
+            # keep the words, drop the timings
+            meta = json.dumps([list(words), list(rules), []],
+                              ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            if len(meta) > room:
+                meta = b'[[],[],[]]'
+        audio = wave[:room - len(meta)]
+        flags = 0
+        if not wave:
+            flags |= FLAG_NOAUDIO
+        elif len(audio) < len(wave):
+            flags |= FLAG_TRUNCATED
+        offset = self._slotOffset(slot)
+        with self._lock:
+            oldId, oldTime = self._readSlotHeader(slot)[:2]
+            if oldId in self._byId:
+                del self._byId[oldId]
+                index = bisect.bisect_left(self._byTime, (oldTime, oldId))
+                if index < len(self._byTime) and self._byTime[index][1] == oldId:
+                    del self._byTime[index]
+            # invalidate the slot first, then write the body, the header last,
+            # so that a crash never leaves a valid header with a half written body
+            _SLOT_HEADER.pack_into(self._map, offset, 0, 0.0, 0, 0, 0, 0)
+            bodyStart = offset + _SLOT_HEADER.size
+            self._map[bodyStart:bodyStart + len(meta)] = meta
+            self._map[bodyStart + len(meta):bodyStart + len(meta) + len(audio)] = audio
+            _SLOT_HEADER.pack_into(self._map, offset, utteranceId, timeStamp, flags,
+                                   len(meta), len(audio), len(wave))
+            self._byId[utteranceId] = slot
+            bisect.insort(self._byTime, (timeStamp, utteranceId))
+
+    def flush(self):
+        """wait until all recorded utterances are written and flush the file
+
+        Raises ArchiveError if an utterance could not be written since the
+        previous flush.
+        """
+        if self._writer is not None:
+            self._queue.join()
+        if not self._closed:
+            self._map.flush()
+        self._raiseWriteError()
+
+    def _raiseWriteError(self):
+        if self._writeError is not None:
+            utteranceId, exc = self._writeError
+            self._writeError = None
+            raise ArchiveError(f'error writing utterance {utteranceId}: {exc}') from exc
+
+    def close(self):
+        """write the pending utterances and close the archive file
+
+        Raises ArchiveError, after closing, if an utterance could not be
+        written.
+        """
+        if self._closed:
+            return
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        self._closed = True
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+        self._raiseWriteError()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # reading
+
+    def _readSlot(self, slot):
+        utteranceId, timeStamp, flags, metaLen, audioLen, _ = self._readSlotHeader(slot)
+        if not utteranceId:
+            return None
+        bodyStart = self._slotOffset(slot) + _SLOT_HEADER.size
+        words, rules, timings = json.loads(self._map[bodyStart:bodyStart + metaLen].decode('utf-8'))
+        wave = self._map[bodyStart + metaLen:bodyStart + metaLen + audioLen]
+        return ArchivedUtterance(utteranceId, timeStamp, words, rules,
+                                 [tuple(t) for t in timings], wave,
+                                 bool(flags & FLAG_TRUNCATED))
+
+    def getUtterance(self, utteranceId):
+        """return the ArchivedUtterance for an utterance id or None
+
+        None is returned if the utterance was never archived, is not written
+        yet or has been overwritten by newer utterances.
+        """
+        with self._lock:
+            slot = self._byId.get(utteranceId)
+            if slot is None:
+                return None
+            return self._readSlot(slot)
+
+    def findByTime(self, startTime, endTime=None):
+        """return the archived utterances with startTime <= timeStamp < endTime
+
+        Without endTime all utterances from startTime on are returned, oldest
+        first.
+        """
+        with self._lock:
+            first = bisect.bisect_left(self._byTime, (startTime, 0))
+            if endTime is None:
+                last = len(self._byTime)
+            else:
+                last = bisect.bisect_left(self._byTime, (endTime, 0))
+            return [self._readSlot(self._byId[uttId]) for _, uttId in self._byTime[first:last]]
+
+    def recent(self, count=1):
+        """return the last count archived utterances, newest first"""
+        with self._lock:
+            ids = sorted(self._byId, reverse=True)[:count]
+            return [self._readSlot(self._byId[uttId]) for uttId in ids]
+
+    def utteranceIds(self):
+        """return the ids of the archived utterances, oldest first"""
+        with self._lock:
+            return sorted(self._byId)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._byId)
@@ -0,0 +1,149 @@
+"""fakes for the natlink functions, shared by the tests which do not need Dragon
+"""
+#pylint:disable=C0116, W0621
+from concurrent.futures import Future
+import pytest
+
+
+class FakeClock:
+    """a clock which only moves when it is told to, or step seconds every read"""
+    def __init__(self, now=100.0, step=0.0):
+        self.now = now
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeTimer:
+    """stands in for natlink.setTimerCallback or a timer slot"""
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.callback = None
+        self.milliseconds = 0
+
+    def __call__(self, callback, milliseconds=0):
+        self.callback = callback
+        self.milliseconds = milliseconds
+
+    def tick(self, count=1):
+        for _ in range(count):
+            self.callback()
+
+    def advance(self, seconds):
+        """let time pass on the clock, firing the timer at each deadline it is armed for"""
+        end = self.clock.now + seconds
+        while self.callback and self.clock.now + self.milliseconds / 1000.0 <= end + 1e-9:
+            self.clock.now += self.milliseconds / 1000.0
+            self.callback()
+        self.clock.now = end
+
+
+class FakeNatlink:
+    """stands in for the natlink callback slots, playString, execScript and runOnMain"""
+    def __init__(self):
+        self.begin = None
+        self.change = None
+        self.tray = None
+        self.trayIcon = None
+        self.played = []
+        self.scripts = []
+
+    def setBeginCallback(self, callback):
+        self.begin = callback
+
+    def setChangeCallback(self, callback):
+        self.change = callback
+
+    def setTrayIcon(self, iconName='', toolTip='', callback=None):
+        self.trayIcon = iconName or None
+        self.tray = callback
+
+    def playString(self, text):
+        self.played.append(text)
+
+    def execScript(self, script):
+        self.scripts.append(script)
+
+    def runOnMain(self, function, *args, **kwargs):
+        """run the call at once, as on the natlink thread"""
+        future = Future()
+        future.set_result(function(*args, **kwargs))
+        return future
+
+
+class FakeGramObj:
+    """stands in for a natlink GramObj"""
+    def __init__(self):
+        self.callback = None
+        self.asyncResults = 0
+
+    def setResultsCallback(self, callback, asyncResults=0):
+        self.callback = callback
+        self.asyncResults = asyncResults
+
+
+class DataMissing(Exception):
+    """stands in for natlink.DataMissing"""
+
+
+class FakeResObj:
+    """stands in for a natlink ResObj
+
+    Without results and wordInfo they are made from words, 100 ms a word;
+    getWave raises DataMissing when there is no wave.
+    """
+    def __init__(self, words=(), wave=b'', results=None, wordInfo=None):
+        self.words = list(words)
+        self.wave = wave
+        self.results = results
+        self.wordInfo = wordInfo
+
+    def getResults(self, choice):
+        if self.results is not None:
+            return list(self.results)
+        return [(w, 1) for w in self.words]
+
+    def getWordInfo(self, choice):
+        if self.wordInfo is not None:
+            return list(self.wordInfo)
+        return [(w, 1, 0, 100*i, 100*i + 90, 0, '') for i, w in enumerate(self.words)]
+
+    def getWave(self):
+        if not self.wave:
+            raise DataMissing('no wave data')
+        return self.wave
+
+
+class FakeSendInput:
+    """stands in for user32.SendInput, records the batches and the clock time of each"""
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.batches = []
+        self.times = []
+
+    def __call__(self, count, inputs, size):
+        self.batches.append([(inputs[i].u.ki.wVk, inputs[i].u.ki.wScan, inputs[i].u.ki.dwFlags)
+                             for i in range(count)])
+        if self.clock is not None:
+            self.times.append(self.clock.now)
+        return count
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def timer(clock):
+    return FakeTimer(clock)
+
+
+@pytest.fixture
+def natlink():
+    return FakeNatlink()
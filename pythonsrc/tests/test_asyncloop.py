@@ -0,0 +1,78 @@
+"""tests for the natlink event loop
+"""
+#pylint:disable=C0116, W0621
+import asyncio
+import threading
+import pytest
+import asyncloop
+
+
+@pytest.fixture
+def timer(timer):
+    asyncloop.install(interval=25, setTimer=timer)
+    yield timer
+    asyncloop.uninstall()
+    assert timer.callback is None
+
+
+def test_install_starts_pump(timer):
+    loop = asyncloop.getLoop()
+    assert isinstance(loop, asyncloop.NatlinkEventLoop)
+    assert timer.milliseconds == 25
+    assert asyncloop.install() is loop
+
+
+def test_coroutine_callback_runs_until_first_await(timer):
+    steps = []
+    future = asyncloop.getLoop().create_future()
+
+    async def gotResults(words, resObj):
+        steps.append(('start', words, resObj))
+        value = await future
+        steps.append(('done', value))
+
+    callback = asyncloop.coroutineCallback(gotResults)
+    assert callback.__name__ == 'gotResults'
+    callback(['hello'], 'resObj')
+    assert steps == [('start', ['hello'], 'resObj')]
+    future.set_result(42)
+    timer.tick()
+    assert steps[-1] == ('done', 42)
+
+
+def test_sleep_overlaps(timer):
+    finished = []
+
+    async def handler(name):
+        await asyncio.sleep(0.01)
+        finished.append(name)
+
+    for name in 'abc':
+        asyncloop.startCoroutine(handler(name))
+    while len(finished) < 3:
+        timer.tick()
+    assert sorted(finished) == ['a', 'b', 'c']
+
+
+def test_call_soon_threadsafe(timer):
+    got = []
+    thread = threading.Thread(target=asyncloop.callSoonThreadsafe, args=(got.append, 'from thread'))
+    thread.start()
+    thread.join()
+    assert not got
+    timer.tick()
+    assert got == ['from thread']
+
+
+def test_errors_are_printed(timer, capsys):
+    async def fail():
+        raise ValueError('coroutine failed')
+
+    asyncloop.startCoroutine(fail())
+    timer.tick()
+    assert 'coroutine failed' in capsys.readouterr().err
+
+
+def test_not_installed():
+    with pytest.raises(RuntimeError):
+        asyncloop.callSoonThreadsafe(print)
@@ -0,0 +1,87 @@
+"""tests for the asynchronous results helpers
+"""
+#pylint:disable=C0116, W0621
+import threading
+import time
+import pytest
+from asyncresults import KeyedExecutor, setAsyncResultsCallback
+from conftest import FakeGramObj, FakeResObj
+
+
+@pytest.fixture
+def executor():
+    executor = KeyedExecutor(maxWorkers=4)
+    yield executor
+    executor.shutdown()
+
+
+def test_order_kept_per_key(executor):
+    done = {'a': [], 'b': []}
+
+    def work(key, i):
+        time.sleep(0.001 * (i % 3))
+        done[key].append(i)
+
+    futures = [executor.submit(key, work, key, i) for i in range(20) for key in 'ab']
+    for future in futures:
+        future.result(timeout=5)
+    assert done == {'a': list(range(20)), 'b': list(range(20))}
+    assert executor.pendingCount() == 0
+
+
+def test_keys_run_in_parallel(executor):
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    executor.submit('slow', blocker)
+    assert started.wait(5)
+    assert executor.submit('fast', lambda: 42).result(timeout=5) == 42
+    assert executor.submit('slow', lambda: 1) and executor.pendingCount('slow') == 1
+    release.set()
+
+
+def test_exception_in_future(executor):
+    def fail():
+        raise ValueError('boom')
+    with pytest.raises(ValueError):
+        executor.submit('k', fail).result(timeout=5)
+    assert executor.submit('k', lambda: 'next').result(timeout=5) == 'next'
+
+
+def test_submit_after_shutdown(executor):
+    executor.shutdown()
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            executor.submit('k', lambda: 1).result(timeout=5)
+        assert executor.pendingCount('k') == 0
+
+
+def test_set_async_results_callback(executor, capsys):
+    gramObj = FakeGramObj()
+    got = []
+    gotAll = threading.Event()
+
+    def handler(words, wordInfo):
+        if words == 'reject':
+            raise RuntimeError('handler failed')
+        got.append((words, wordInfo))
+        if len(got) == 2:
+            gotAll.set()
+
+    callback = setAsyncResultsCallback(gramObj, handler, wordInfo=True, executor=executor)
+    assert gramObj.callback is callback and gramObj.asyncResults == 1
+    resObj = FakeResObj(['hello'])
+    gramObj.callback([('hello', 1)], resObj)
+    gramObj.callback('reject', None)
+    gramObj.callback('other', FakeResObj(['other', 'words']))
+    assert gotAll.wait(5)
+    assert got[0] == ([('hello', 1)], resObj.getWordInfo(0))
+    assert got[1][0] == 'other' and len(got[1][1]) == 2
+    assert 'handler failed' in capsys.readouterr().err
+
+    setAsyncResultsCallback(gramObj, None)
+    assert gramObj.callback is None
@@ -0,0 +1,83 @@
+"""tests for asynchronous scripts
+"""
+#pylint:disable=C0116, W0621
+import pytest
+from asyncscript import ScriptRunner, ScriptAborted
+from cancellation import CancelToken
+from timerservice import TimerService
+
+
+class FakeEngine:
+    """execScriptAsync and setExecutionCallback of natlink"""
+    def __init__(self):
+        self.callback = None
+        self.scripts = []
+
+    def execScriptAsync(self, script, comment=None):
+        if b'Bad' in script:
+            raise SyntaxError('Error 1 compiling script execScriptAsync (line 1)')
+        self.scripts.append(script)
+        return 100 + len(self.scripts)
+
+    def setExecutionCallback(self, callback):
+        self.callback = callback
+
+
+@pytest.fixture
+def engine():
+    return FakeEngine()
+
+
+def makeRunner(engine, timer=None):
+    timerService = TimerService(timer, timer.clock) if timer else None
+    return ScriptRunner(engine.execScriptAsync, engine.setExecutionCallback, timerService)
+
+
+def test_futures_complete_by_client_code(engine):
+    runner = makeRunner(engine)
+    first = runner.execScriptAsync('SendSystemKeys "a"')
+    second = runner.execScriptAsync(b'Wait 100')
+    assert engine.scripts == [b'SendSystemKeys "a"', b'Wait 100']
+    assert runner.pending() == 2 and not first.done()
+    engine.callback(second.clientCode, 'status', 2, 0)
+    assert second.status == 2
+    engine.callback(second.clientCode, 'aborted', 7, 3)
+    engine.callback(first.clientCode, 'done', 0, 0)
+    assert first.result() is None
+    with pytest.raises(ScriptAborted) as info:
+        second.result()
+    assert (info.value.errorCode, info.value.lineNumber) == (7, 3)
+    assert runner.pending() == 0
+    # syntax errors come at once
+    with pytest.raises(SyntaxError):
+        runner.execScriptAsync('Bad')
+
+
+def test_timeout_and_cancel(engine, timer):
+    runner = makeRunner(engine, timer)
+    slow = runner.execScriptAsync('Wait 5000', timeout=1)
+    token = CancelToken()
+    other = runner.execScriptAsync('Wait 5000', token=token)
+    quick = runner.execScriptAsync('Wait 1', timeout=1)
+    engine.callback(quick.clientCode, 'done', 0, 0)
+    timer.clock.now += 1.5
+    timer.tick()
+    with pytest.raises(TimeoutError):
+        slow.result(0)
+    assert quick.result(0) is None
+    token.cancel()
+    assert other.cancelled()
+    # the late messages of NatSpeak find nothing
+    engine.callback(slow.clientCode, 'done', 0, 0)
+    engine.callback(other.clientCode, 'done', 0, 0)
+    assert runner.pending() == 0
+
+
+def test_close_gives_back_the_callback(engine):
+    runner = makeRunner(engine)
+    future = runner.execScriptAsync('Wait 100')
+    runner.close()
+    assert engine.callback is None
+    assert future.cancelled()
+    with pytest.raises(RuntimeError):
+        runner.execScriptAsync('Wait 100')
@@ -0,0 +1,87 @@
+"""tests for the slow callback watchdog
+"""
+#pylint:disable=C0116, W0621
+import threading
+import time
+from callbackwatchdog import CallbackWatchdog, describeCallback, formatReport
+
+
+class FakeNatlink:
+    """stands in for natlink.getCallbackInfo, the test thread is the natlink thread"""
+    def __init__(self):
+        self.info = None
+        self.serial = 0
+        self.start = 0.0
+        self.threadId = 0
+
+    def getCallbackInfo(self):
+        if self.info is None:
+            return None
+        serial, callback, utteranceId = self.info
+        return serial, time.monotonic() - self.start, self.threadId, callback, utteranceId
+
+    def runCallback(self, callback, *args, utteranceId=0):
+        self.serial += 1
+        self.start = time.monotonic()
+        self.threadId = threading.get_ident()
+        self.info = (self.serial, callback, utteranceId)
+        try:
+            callback(*args)
+        finally:
+            self.info = None
+
+
+class Grammar:
+    """has a name like the natlinkcore grammar classes"""
+    name = 'slowgrammar'
+
+    def gotResults(self, words, resObj):
+        deadline = time.monotonic() + 0.15
+        while time.monotonic() < deadline:
+            busyLoop()
+
+
+def busyLoop():
+    total = 0
+    for i in range(1000):
+        total += i
+    return total
+
+
+def test_describe_callback():
+    assert describeCallback(Grammar().gotResults) == 'slowgrammar:Grammar.gotResults'
+    assert describeCallback(busyLoop) == 'busyLoop'
+
+
+def test_slow_callback_is_sampled(tmp_path):
+    fake = FakeNatlink()
+    reportPath = tmp_path / 'slow.folded'
+    got = []
+    watchdog = CallbackWatchdog(budget=0.03, interval=0.005, reportPath=str(reportPath),
+                                onReport=got.append, getCallbackInfo=fake.getCallbackInfo)
+    with watchdog:
+        fake.runCallback(lambda: None)
+        fake.runCallback(Grammar().gotResults, [('hi', 1)], None, utteranceId=7)
+        time.sleep(0.05)
+    assert len(got) == 1
+    report = got[0]
+    assert report.serial == 2 and report.utteranceId == 7
+    assert report.name == 'slowgrammar:Grammar.gotResults'
+    assert report.duration >= 0.1
+    stacks = list(report.samples)
+    assert stacks and all(s.startswith('slowgrammar:Grammar.gotResults;') for s in stacks)
+    assert any('gotResults (test_callbackwatchdog.py' in s for s in stacks)
+    lines = reportPath.read_text(encoding='utf-8').splitlines()
+    assert lines[0].startswith('#') and 'utterance 7' in lines[0]
+    assert len(lines) == len(formatReport(report).splitlines())
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines[1:])
+
+
+def test_fast_callbacks_are_not_reported():
+    fake = FakeNatlink()
+    watchdog = CallbackWatchdog(budget=1.0, interval=0.005, getCallbackInfo=fake.getCallbackInfo)
+    with watchdog:
+        for _ in range(5):
+            fake.runCallback(busyLoop)
+        time.sleep(0.02)
+    assert not watchdog.reports
@@ -0,0 +1,98 @@
+"""tests for cancellation tokens
+"""
+#pylint:disable=C0116, W0621
+import threading
+import time
+import pytest
+from cancellation import (CancellationManager, CancelToken, Cancelled, splitKeys,
+                          playString, execScript, sleep)
+from eventbus import EventBus
+from mainthread import MainThreadQueue
+from asyncresults import KeyedExecutor
+from conftest import FakeGramObj
+
+
+@pytest.fixture
+def manager(natlink):
+    return CancellationManager(EventBus(natlink, setTimer=lambda callback, milliseconds: None))
+
+
+def test_split_keys():
+    assert splitKeys('abc{ctrl+c}de', 2) == ['ab', 'c{ctrl+c}', 'de']
+    assert splitKeys('') == []
+    assert splitKeys('ab{{}cd{}}ef', 3) == ['ab{{}', 'cd{}}', 'ef']
+
+
+def test_token():
+    token = CancelToken('test')
+    seen = []
+    token.onCancel(seen.append)
+    token.check()
+    assert token.cancel('stop')
+    assert not token.cancel('again')
+    assert seen == [token] and token.reason == 'stop'
+    with pytest.raises(Cancelled):
+        token.check()
+
+
+def test_begin_cancels_running_actions(natlink, manager):
+    # the test thread stands in for the natlink thread: it runs the calls
+    # the handler sends with runOnMain, and the begin callback
+    wakeup = threading.Event()
+    queue = MainThreadQueue(postWakeup=wakeup.set, setWakeupCallback=lambda callback: None)
+    natlink.runOnMain = queue.runOnMain
+    played = natlink.played
+
+    def playAndSpeak(text):
+        played.append(text)
+        if len(played) == 1:
+            natlink.begin(('app', 'title', 0))      # the user speaks again
+
+    natlink.playString = playAndSpeak
+    done = threading.Event()
+
+    def handler(words, wordInfo, token):
+        try:
+            playString('abcdef', token, chunkSize=2, natlinkModule=natlink)
+        finally:
+            done.set()
+
+    executor = KeyedExecutor(maxWorkers=1)
+    gramObj = FakeGramObj()
+    callback = manager.cancellableCallback(handler, gramObj, executor=executor)
+    assert gramObj.callback is callback and gramObj.asyncResults == 1
+    callback(['go'], None)
+    assert manager.activeTokens()           # the callback returned, the handler runs
+    deadline = time.monotonic() + 5
+    while not done.is_set() and time.monotonic() < deadline:
+        if wakeup.wait(0.01):
+            wakeup.clear()
+            queue.runPending()
+    executor.shutdown()
+    assert played == ['ab']
+    assert manager.activeTokens() == []
+
+
+def test_cancel_grammar(natlink, manager):
+    manager.cancelOnSpeech = False
+    gramObj = FakeGramObj()
+    manager.setCancelGrammar(gramObj)
+    token = manager.newToken()
+    natlink.begin(('app', 'title', 0))
+    assert not token.cancelled
+    gramObj.callback('other', None)
+    assert not token.cancelled
+    gramObj.callback(['stop'], None)
+    assert token.cancelled and token.reason == 'cancel grammar'
+    with pytest.raises(Cancelled):
+        execScript(['a', 'b'], token, natlinkModule=natlink)
+    assert natlink.scripts == []
+
+
+def test_sleep_wakes_up_on_cancel(manager):
+    token = manager.newToken()
+    threading.Timer(0.05, manager.cancelAll).start()
+    start = time.monotonic()
+    with pytest.raises(Cancelled):
+        sleep(5, token)
+    assert time.monotonic() - start < 2
@@ -0,0 +1,67 @@
+"""tests for the event bus
+"""
+#pylint:disable=C0116, W0621
+import pytest
+from eventbus import EventBus
+
+
+@pytest.fixture
+def bus(natlink, timer):
+    return EventBus(natlinkModule=natlink, setTimer=timer)
+
+
+def test_slots_taken_only_with_subscribers(bus, natlink, timer):
+    assert natlink.begin is None and natlink.change is None
+    sub = bus.subscribe('begin', lambda info: None)
+    assert natlink.begin is not None and natlink.change is None
+    bus.subscribe('timer', lambda: None)
+    assert timer.callback is not None
+    sub.unsubscribe()
+    assert natlink.begin is None
+    bus.close()
+    assert timer.callback is None
+
+
+def test_fan_out_by_type_and_predicate(bus, natlink):
+    got = []
+    bus.subscribe('mic', lambda what, state: got.append(('mic', state)))
+    bus.subscribe('mic', lambda what, state: got.append(('off', state)),
+                  predicate=lambda what, state: state == 'off')
+    bus.subscribe('change', lambda what, value: got.append(('any', what)))
+    bus.subscribe('user', lambda what, value: got.append(('user', value)))
+    natlink.change('mic', 'on')
+    natlink.change('mic', 'off')
+    natlink.change('user', ('name', 'dir'))
+    assert got == [('any', 'mic'), ('mic', 'on'),
+                   ('any', 'mic'), ('mic', 'off'), ('off', 'off'),
+                   ('any', 'user'), ('user', ('name', 'dir'))]
+
+
+def test_priority_order_and_errors(bus, natlink, capsys):
+    got = []
+    bus.subscribe('begin', lambda info: got.append('second'), name='second')
+    bus.subscribe('begin', lambda info: 1 / 0, name='broken', priority=-2)
+    bus.subscribe('begin', lambda info: got.append('first'), priority=-1)
+    assert [s.name for s in bus.subscribers('begin')][0] == 'broken'
+    natlink.begin(('app', 'title', 1))
+    assert got == ['first', 'second']
+    assert "'begin' subscriber 'broken'" in capsys.readouterr().out
+    stats = {s['name']: s for s in bus.getStats(reset=True)}
+    assert stats['broken']['errors'] == 1 and stats['second']['calls'] == 1
+    assert all(s['calls'] == 0 for s in bus.getStats())
+
+
+def test_tray_icon(bus, natlink):
+    got = []
+    bus.setTrayIcon('right', 'natlink')
+    assert natlink.trayIcon == 'right' and natlink.tray is None
+    bus.subscribe('tray', got.append)
+    natlink.tray(0x201)
+    assert got == [0x201]
+    bus.setTrayIcon('')
+    assert natlink.trayIcon is None
+
+
+def test_unknown_event_type(bus):
+    with pytest.raises(ValueError):
+        bus.subscribe('results', print)
@@ -0,0 +1,101 @@
+"""tests for the idle work queue
+"""
+#pylint:disable=C0116, W0621
+import sys
+import types
+import pytest
+from idlequeue import IdleQueue
+
+
+@pytest.fixture
+def idle(timer, clock):
+    clock.step = 0.001      # a slice runs out after some reads of the clock
+    return IdleQueue(setTimer=timer, clock=clock, sliceTime=0.01, micState='off')
+
+
+def test_runs_only_while_idle(idle, timer):
+    got = []
+    idle.add(lambda: got.append('work'))
+    assert timer.callback == idle.runSlice
+    idle.noteChange('mic', 'on')
+    idle.runSlice()
+    assert not got
+    idle.noteChange('mic', 'sleeping')
+    idle.runSlice()
+    assert got == ['work']
+    assert timer.callback is None and len(idle) == 0
+
+
+def test_not_during_utterance(idle):
+    got = []
+    idle.add(lambda: got.append('work'))
+    idle.noteUtteranceStart(('app', 'title', 0))
+    idle.runSlice()
+    assert not got
+    idle.noteUtteranceEnd(['hello'], None)
+    idle.runSlice()
+    assert got == ['work']
+
+
+def test_priorities_and_slices(idle):
+    got = []
+
+    def steps():
+        for i in range(30):
+            got.append(i)
+            yield
+
+    idle.add(steps(), priority=5, name='steps')
+    idle.add(lambda: got.append('urgent'), priority=0)
+    idle.runSlice()
+    assert got[0] == 'urgent'
+    assert 0 < len(got) < 31            # the slice ran out
+    while len(idle):
+        idle.runSlice()
+    assert got[1:] == list(range(30))
+
+
+def test_deadline_runs_with_mic_on(idle, clock):
+    got = []
+    idle.noteChange('mic', 'on')
+    idle.add(lambda: got.append('late'), deadline=5)
+    idle.add(lambda: got.append('whenever'))
+    idle.runSlice()
+    assert not got
+    clock.now += 10
+    idle.runSlice()
+    assert got == ['late']
+    idle.noteUtteranceStart()
+    clock.now += 100                    # the utterance end was never seen
+    idle.runSlice()
+    assert got == ['late']
+    idle.noteChange('mic', 'off')
+    idle.runSlice()
+    assert got == ['late', 'whenever']
+
+
+def test_mic_state_from_natlink(timer, clock, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'natlink', types.SimpleNamespace(getMicState=lambda: 'on'))
+    idle = IdleQueue(setTimer=timer, clock=clock)
+    got = []
+    idle.add(lambda: got.append('work'))
+    idle.runSlice()
+    assert idle.micState == 'on' and not got
+
+
+def test_quiet_time_cancel_and_errors(timer, clock, capsys):
+    idle = IdleQueue(setTimer=timer, clock=clock, quietTime=2.0, micState='on')
+    got = []
+    task = idle.add(lambda: got.append('cancelled'))
+    idle.add(lambda: 1 / 0, name='broken')
+    idle.add(lambda: got.append('quiet'))
+    assert idle.cancel(task) and not idle.cancel(task)
+    idle.noteUtteranceEnd()
+    idle.runSlice()
+    assert not got
+    clock.now += 3
+    idle.runSlice()
+    assert got == ['quiet']
+    assert "idle task 'broken'" in capsys.readouterr().out
+    with pytest.raises(TypeError):
+        idle.add(42)
@@ -0,0 +1,137 @@
+"""tests for compiled keystroke programs
+"""
+#pylint:disable=C0116, W0621
+import ctypes
+import types
+import pytest
+from keyprogram import (ProgramCache, KeyCompileError, INPUT, KEYEVENTF_KEYUP,
+                        KEYEVENTF_UNICODE, KEYEVENTF_EXTENDEDKEY, KEYS_UNICODE, VK_CONTROL, VK_SHIFT,
+                        parseKeys, compileKeys, benchmark, bufferedKeys, playKeys,
+                        setBufferedMode, setPlayer, flushKeys)
+from conftest import FakeSendInput
+
+
+def keys(events):
+    """the (vk or character, down) pairs of events"""
+    return [(chr(scan) if flags & KEYEVENTF_UNICODE else vk, not flags & KEYEVENTF_KEYUP)
+            for vk, scan, flags in events]
+
+
+def test_plain_characters_are_virtual_keys():
+    assert keys(parseKeys('hI 2')) == [
+        (ord('H'), True), (ord('H'), False),
+        (VK_SHIFT, True), (ord('I'), True), (ord('I'), False), (VK_SHIFT, False),
+        (0x20, True), (0x20, False), (ord('2'), True), (ord('2'), False)]
+    assert keys(parseKeys('a\nb'))[2:4] == [(0x0D, True), (0x0D, False)]
+    assert not any(flags & KEYEVENTF_UNICODE for _, _, flags in parseKeys('hI 2'))
+
+
+def test_unicode_flag():
+    assert keys(parseKeys('hé', KEYS_UNICODE)) == [('h', True), ('h', False), ('é', True), ('é', False)]
+    assert len(parseKeys('\U0001F600', KEYS_UNICODE)) == 4     # a surrogate pair
+
+
+def test_named_keys_and_counts():
+    assert keys(parseKeys('{Enter 2}')) == [(0x0D, True), (0x0D, False)] * 2
+    assert parseKeys('{left_3}') == parseKeys('{Left 3}')
+    left = parseKeys('{Left}')
+    assert left[0][2] & KEYEVENTF_EXTENDEDKEY
+
+
+def test_modifiers():
+    assert keys(parseKeys('{Ctrl+Shift+c}')) == [
+        (VK_CONTROL, True), (VK_SHIFT, True), (ord('C'), True), (ord('C'), False),
+        (VK_SHIFT, False), (VK_CONTROL, False)]
+    assert keys(parseKeys('{{}{}}', KEYS_UNICODE)) == [
+        ('{', True), ('{', False), ('}', True), ('}', False)]
+
+
+def test_unknown_notation():
+    with pytest.raises(KeyCompileError):
+        parseKeys('{nosuchkey}')
+    with pytest.raises(KeyCompileError):
+        parseKeys('{hyper+a}')
+
+
+def test_program_encoding():
+    program = compileKeys('{Ctrl+a}x')
+    sent = []
+
+    def sendInput(count, inputs, size):
+        sent.append([(inputs[i].u.ki.wVk, inputs[i].u.ki.wScan, inputs[i].u.ki.dwFlags)
+                     for i in range(count)])
+        assert size == ctypes.sizeof(INPUT)
+        return count
+
+    assert program.play(sendInput) == 6
+    assert tuple(sent[0]) == program.events
+
+
+def test_cache():
+    cache = ProgramCache(maxSize=2)
+    first = cache.get('abc')
+    assert cache.get('abc') is first
+    cache.get('def')
+    cache.get('ghi')            # evicts abc
+    assert cache.get('abc') is not first
+    with pytest.raises(KeyCompileError):
+        cache.get('{nosuchkey}')
+    with pytest.raises(KeyCompileError, match='nosuchkey') as second:
+        cache.get('{nosuchkey}')
+    with pytest.raises(KeyCompileError) as third:
+        cache.get('{nosuchkey}')
+    assert third.value is not second.value
+    stats = cache.getStats(reset=True)
+    assert stats['hits'] == 3 and stats['misses'] == 5 and stats['evictions'] == 3
+    assert cache.getStats()['hits'] == 0
+
+
+def test_benchmark():
+    result = benchmark(['{Ctrl+Home}hello{Enter 2}', 'abc{Left 3}'], repeat=20)
+    assert result['hits'] == 38 and result['misses'] == 2
+    assert result['cachedTime'] < result['parseTime']
+
+
+def test_buffered_keys_go_out_as_one_batch():
+    send = FakeSendInput()
+    with bufferedKeys(send):
+        playKeys('{Home}')
+        with bufferedKeys():
+            playKeys('ab')
+        assert not send.batches
+    assert len(send.batches) == 1
+    assert tuple(send.batches[0]) == parseKeys('{Home}ab')
+
+
+def test_buffered_mode():
+    send = FakeSendInput()
+    setPlayer(types.SimpleNamespace(playProgram=lambda program: program.play(send)))
+    state = {'inCallback': True}
+    scheduled = []
+    setBufferedMode(True, inCallback=lambda: state['inCallback'],
+                    schedule=lambda flush, timeout: scheduled.append(flush), sendInput=send)
+    try:
+        playKeys('a')
+        playKeys('b')
+        assert len(scheduled) == 1 and not send.batches
+        scheduled[0]()
+        assert tuple(send.batches[0]) == parseKeys('ab')
+        playKeys('c')
+        assert flushKeys() == 2
+        assert flushKeys() == 0
+        playKeys('d')
+        state['inCallback'] = False
+        playKeys('e')       # flushes d first, then plays e directly
+        assert [tuple(batch) for batch in send.batches[-2:]] == [parseKeys('d'), parseKeys('e')]
+    finally:
+        setBufferedMode(False)
+        setPlayer(None)
+
+
+def test_chunks():
+    program = compileKeys('abcde{Ctrl+c}')
+    assert program.keyCount() == 7
+    chunks = program.chunks(2)
+    assert program.chunks(2) is chunks
+    assert [len(chunk) for chunk in chunks] == [4, 4, 6]     # ctrl is released in its chunk
+    assert sum((chunk.events for chunk in chunks), ()) == program.events
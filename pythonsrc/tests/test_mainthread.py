@@ -0,0 +1,104 @@
+"""tests for the main thread queue
+"""
+#pylint:disable=C0116, W0621
+import threading
+import pytest
+from mainthread import MainThreadQueue
+
+
+class FakeWakeup:
+    """stands in for natlink.postWakeup and setWakeupCallback"""
+    def __init__(self):
+        self.callback = None
+        self.posted = threading.Event()
+        self.posts = 0
+
+    def setWakeupCallback(self, callback):
+        self.callback = callback
+
+    def postWakeup(self):
+        self.posts += 1
+        self.posted.set()
+
+    def pump(self):
+        """what the natlink message loop does with a posted wakeup"""
+        assert self.posted.wait(5)
+        self.posted.clear()
+        self.callback()
+
+
+@pytest.fixture
+def wakeup():
+    return FakeWakeup()
+
+
+def test_calls_run_on_the_main_thread(wakeup):
+    queue = MainThreadQueue(wakeup.postWakeup, wakeup.setWakeupCallback)
+    futures = []
+    thread = threading.Thread(
+        target=lambda: futures.append(queue.runOnMain(threading.get_ident)))
+    thread.start()
+    thread.join()
+    assert not futures[0].done()
+    wakeup.pump()
+    assert futures[0].result(0) == threading.get_ident()
+
+
+def test_exceptions_go_to_the_future(wakeup):
+    queue = MainThreadQueue(wakeup.postWakeup, wakeup.setWakeupCallback)
+    futures = []
+    thread = threading.Thread(target=lambda: futures.append(queue.runOnMain(int, 'x')))
+    thread.start()
+    thread.join()
+    wakeup.pump()
+    with pytest.raises(ValueError):
+        futures[0].result(0)
+
+
+def test_calls_on_the_main_thread_run_at_once(wakeup):
+    queue = MainThreadQueue(wakeup.postWakeup, wakeup.setWakeupCallback)
+    future = queue.runOnMain(lambda a, b=0: a + b, 1, b=2)
+    assert future.result(0) == 3
+    assert wakeup.posts == 0
+
+
+def test_batching(wakeup):
+    queue = MainThreadQueue(wakeup.postWakeup, wakeup.setWakeupCallback, maxBatch=4)
+    done = []
+
+    def submit():
+        for i in range(10):
+            queue.runOnMain(done.append, i)
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    thread.join()
+    assert len(queue) == 10
+    wakeup.pump()
+    assert done == [0, 1, 2, 3]
+    wakeup.pump()
+    wakeup.pump()
+    assert done == list(range(10))
+    assert queue.wakeups == 3
+
+
+def test_close_cancels(wakeup):
+    queue = MainThreadQueue(wakeup.postWakeup, wakeup.setWakeupCallback)
+    futures = []
+    thread = threading.Thread(target=lambda: futures.append(queue.runOnMain(print)))
+    thread.start()
+    thread.join()
+    queue.close()
+    assert wakeup.callback is None
+    assert futures[0].cancelled()
+    with pytest.raises(RuntimeError):
+        queue.runOnMain(print)
+
+
+def test_post_call_waits_for_the_wakeup(wakeup):
+    queue = MainThreadQueue(wakeup.postWakeup, wakeup.setWakeupCallback)
+    done = []
+    future = queue.postCall(done.append, 1)
+    assert done == [] and wakeup.posts == 1
+    wakeup.pump()
+    assert done == [1] and future.done()
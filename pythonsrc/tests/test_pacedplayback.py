@@ -0,0 +1,109 @@
+"""tests for paced playback
+"""
+#pylint:disable=C0116, W0621
+import types
+import pytest
+import pacedplayback
+from keyprogram import ProgramCache
+from cancellation import CancelToken, Cancelled
+from pacedplayback import PacedPlayer, MIN_RATE_FACTOR, WM_NULL, waitForForegroundIdle
+from conftest import FakeSendInput
+
+
+@pytest.fixture
+def send(clock):
+    return FakeSendInput(clock)
+
+
+def makePlayer(clock, send, busy=()):
+    busy = list(busy)
+    return PacedPlayer(chunkKeys=4, getCurrentModule=lambda: (r'C:\apps\Slow.exe', '', 0),
+                       waitForIdle=lambda timeout: not (busy and busy.pop(0)),
+                       programCache=ProgramCache(), sendInput=send,
+                       clock=clock, sleep=clock.sleep)
+
+
+def test_unpaced_apps_get_everything_at_once(clock, send):
+    player = makePlayer(clock, send)
+    assert player.play('abcdefgh') == 16
+    assert send.times == [100.0] and len(send.batches[0]) == 16
+
+
+def test_paced_playback_keeps_the_rate(clock, send):
+    player = makePlayer(clock, send)
+    player.setRate('slow', 40)
+    assert player.getRate('SLOW') == 40
+    player.play('abcdefghijkl')
+    assert [round(t - 100.0, 3) for t in send.times] == [0.0, 0.1, 0.2]
+    player.play('abcd')     # the next call waits for the budget of the previous one
+    assert round(send.times[-1] - 100.0, 3) == 0.3
+    stats = player.getStats()['slow']
+    assert stats['keys'] == 16 and stats['chunks'] == 4
+    assert stats['achievedRate'] == pytest.approx(16 / 0.3)
+
+
+def test_busy_application_slows_down(clock, send):
+    player = makePlayer(clock, send, busy=[True, True, True, True, True, False, False])
+    player.setRate('slow', 100)
+    player.play('a' * 32)
+    stats = player.getStats(reset=True)['slow']
+    assert stats['slowdowns'] == 3      # every busy check after a chunk is followed by a wait
+    assert stats['rate'] >= 100 * MIN_RATE_FACTOR
+    assert stats['rate'] < 100
+    assert player.getStats()['slow']['keys'] == 0
+
+
+def test_foreground_busy_signal(clock, send, monkeypatch):
+    calls = []
+    answers = [0, 0, 1]         # SendMessageTimeout fails while the window is busy
+
+    def sendMessageTimeout(hwnd, message, wParam, lParam, flags, milliseconds, result):
+        calls.append((hwnd.value, message, milliseconds))
+        return answers.pop(0) if answers else 1
+
+    user32 = types.SimpleNamespace(GetForegroundWindow=lambda: 1234,
+                                   SendMessageTimeoutW=sendMessageTimeout)
+    monkeypatch.setattr(pacedplayback, '_user32', lambda: user32)
+    assert not waitForForegroundIdle(0.05)
+    assert calls == [(1234, WM_NULL, 50)]
+    player = PacedPlayer(chunkKeys=4, getCurrentModule=lambda: (r'C:\apps\Slow.exe', '', 0),
+                         programCache=ProgramCache(), sendInput=send,
+                         clock=clock, sleep=clock.sleep)
+    player.setRate('slow', 100)
+    player.play('abcdefgh')
+    assert player.getStats()['slow']['slowdowns'] == 1
+    user32.GetForegroundWindow = lambda: None
+    assert waitForForegroundIdle(0.05)
+
+
+def test_cancel_between_chunks(clock, send):
+    player = makePlayer(clock, send)
+    player.setRate('slow', 40)
+    token = CancelToken()
+
+    def sendAndCancel(count, inputs, size):
+        token.cancel('stop')
+        return count
+
+    player._sendInput = sendAndCancel     #pylint:disable=W0212
+    with pytest.raises(Cancelled):
+        player.play('abcdefgh', token=token)
+    player.setRate('slow', None)
+    assert player.getRate('slow') is None
+
+
+def test_cancel_leaves_no_modifier_down(clock, send):
+    player = makePlayer(clock, send)
+    player.setRate('slow', 40)
+    token = CancelToken()
+
+    def sendAndCancel(count, inputs, size):
+        send(count, inputs, size)
+        token.cancel('stop')
+        return count
+
+    player._sendInput = sendAndCancel     #pylint:disable=W0212
+    with pytest.raises(Cancelled):
+        player.play('{ctrl+a 5}bcd', token=token)
+    assert len(send.batches) == 1
+    assert send.batches[0] == list(ProgramCache().get('{ctrl+a 5}').events)
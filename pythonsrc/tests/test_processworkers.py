@@ -0,0 +1,109 @@
+"""tests for the process handler pool
+
+The handlers are module level functions, so the worker processes can import them.
+"""
+#pylint:disable=C0116, W0621
+import os
+import time
+import pytest
+from processworkers import ProcessHandlerPool, setProcessResultsCallback
+from conftest import FakeGramObj, FakeResObj
+
+
+def upperWords(words, wordInfo):
+    return [word.upper() for word in words], wordInfo, os.getpid()
+
+
+def failing(words, wordInfo):
+    raise ValueError('bad words')
+
+
+def crashing(words, wordInfo):
+    os._exit(3)     #pylint:disable=W0212
+
+
+def sleeping(words, wordInfo):
+    time.sleep(float(words[0]))
+    return words
+
+
+@pytest.fixture
+def pool():
+    pool = ProcessHandlerPool(workers=2, slotCount=2, slotSize=256, taskTimeout=5,
+                              setTimer=lambda callback, milliseconds: None)
+    yield pool
+    pool.close()
+
+
+def test_results_come_back_in_order(pool):
+    done = []
+    for i in range(6):
+        pool.submit(upperWords, ['word', str(i)], {'i': i}, key='gram', onDone=done.append)
+    assert pool.wait(30)
+    assert [value[0] for value in done] == [['WORD', str(i)] for i in range(6)]
+    assert [value[1] for value in done] == [{'i': i} for i in range(6)]
+    assert os.getpid() not in {value[2] for value in done}
+
+
+def test_large_snapshot_goes_through_the_queue(pool):
+    done = []
+    words = ['x' * 100] * 10     # does not fit a 256 byte slot
+    pool.submit(upperWords, words, onDone=done.append)
+    assert pool.wait(30)
+    assert done[0][0] == ['X' * 100] * 10
+    assert len(pool._freeSlots) == 2    #pylint:disable=W0212
+
+
+def test_errors_and_crashes_do_not_stop_the_pool(pool):
+    done, errors = [], []
+    pool.submit(failing, ['a'], onError=errors.append)
+    pool.submit(crashing, ['b'], onError=errors.append)
+    assert pool.wait(30)
+    pool.submit(upperWords, ['c'], onDone=done.append)
+    assert pool.wait(30)
+    assert 'bad words' in errors[0]
+    assert 'stopped' in errors[1]
+    assert done[0][0] == ['C']
+
+
+def test_slow_handler_is_stopped():
+    pool = ProcessHandlerPool(workers=1, taskTimeout=0.5,
+                              setTimer=lambda callback, milliseconds: None)
+    try:
+        errors, done = [], []
+        pool.submit(sleeping, ['30'], onError=errors.append)
+        assert pool.wait(30)
+        assert 'longer than' in errors[0]
+        pool.submit(sleeping, ['0'], onDone=done.append)
+        assert pool.wait(30)
+        assert done == [['0']]
+    finally:
+        pool.close()
+
+
+def test_other_workers_survive_a_stopped_worker():
+    pool = ProcessHandlerPool(workers=2, taskTimeout=3,
+                              setTimer=lambda callback, milliseconds: None)
+    try:
+        errors, done = [], []
+        pool.submit(sleeping, ['30'], onError=errors.append)
+        pool.submit(sleeping, ['0.2'], onDone=done.append)
+        assert pool.wait(30)
+        assert len(errors) == 1 and 'longer than' in errors[0]
+        pool.submit(sleeping, ['0'], onDone=done.append)
+        pool.submit(sleeping, ['0'], onDone=done.append)
+        assert pool.wait(30)
+        assert done == [['0.2'], ['0'], ['0']]
+    finally:
+        pool.close()
+
+
+def test_grammar_callback(pool):
+    gramObj = FakeGramObj()
+    done = []
+    setProcessResultsCallback(gramObj, upperWords, pool, onDone=done.append, wordInfo=True)
+    assert gramObj.asyncResults == 1
+    resObj = FakeResObj(['hello'])
+    gramObj.callback(['hello'], resObj)
+    assert pool.wait(30)
+    assert done[0][:2] == (['HELLO'], resObj.getWordInfo(0))
@@ -0,0 +1,126 @@
+"""tests for the binary result log
+"""
+#pylint:disable=C0116, W0621
+import json
+import pytest
+from resultrecord import ResultLogWriter, ResultLogReader, ResultLogError
+from timerservice import TimerService
+from conftest import FakeResObj
+
+RESULTS = [('hello', 1), ('world', 2), ('\u00e9t\u00e9', 0)]
+WORDINFO = [('hello', 1, 8540, 0, 320, 0x40000000, 'hEl5'),
+            ('world', 2, 0, 320, 790, 0, 'w3ld'),
+            ('\u00e9t\u00e9', 0, -3, 790, 1200, 0, '')]
+MODULE = ('C:\\Program Files\\notepad.exe', 'Untitled - Notepad', 132456)
+RES_OBJ = FakeResObj(results=RESULTS, wordInfo=WORDINFO)
+
+
+@pytest.fixture
+def logPath(tmp_path):
+    return str(tmp_path / 'results.nlr')
+
+
+def test_round_trip(logPath):
+    with ResultLogWriter(logPath) as writer:
+        assert writer.appendResObj(RES_OBJ, MODULE, timeStamp=1000.25) == 0
+        assert writer.append(results=RESULTS[:1], timeStamp=1001.0) == 1
+        assert writer.append(timeStamp=1002.0) == 2
+    with ResultLogReader(logPath) as reader:
+        assert len(reader) == 3
+        first = reader[0]
+        assert first.timeStamp == 1000.25
+        assert first.module == MODULE
+        assert first.results == RESULTS
+        assert first.wordInfo == WORDINFO
+        assert reader[1].results == RESULTS[:1]
+        assert reader[1].wordInfo is None and reader[1].module is None
+        assert reader[-1].results is None
+        assert [r.timeStamp for r in reader] == [1000.25, 1001.0, 1002.0]
+
+
+def test_append_to_existing_log(logPath):
+    with ResultLogWriter(logPath) as writer:
+        writer.append(results=RESULTS)
+    with ResultLogWriter(logPath) as writer:
+        assert writer.append(results=RESULTS, wordInfo=WORDINFO, module=MODULE) == 1
+    with ResultLogReader(logPath) as reader:
+        assert [r.results for r in reader] == [RESULTS, RESULTS]
+        assert reader[1].wordInfo == WORDINFO
+
+
+def test_reader_refresh_and_truncated_record(logPath):
+    writer = ResultLogWriter(logPath)
+    writer.append(results=RESULTS)
+    writer.flush()
+    reader = ResultLogReader(logPath)
+    assert len(reader) == 1
+    writer.append(results=[('again', 3)])
+    writer.close()
+    reader.refresh()
+    assert reader[1].results == [('again', 3)]
+    reader.close()
+    # simulate a writer that died halfway through a record
+    with open(logPath, 'ab') as f:
+        f.write(b'\x40\x01')
+    with ResultLogReader(logPath) as reader:
+        assert len(reader) == 2
+    with ResultLogWriter(logPath) as writer:
+        assert writer.append(results=RESULTS) == 2
+    with ResultLogReader(logPath) as reader:
+        assert reader[2].results == RESULTS
+
+
+def test_smaller_than_json(logPath):
+    with ResultLogWriter(logPath) as writer:
+        for _ in range(100):
+            writer.appendResObj(RES_OBJ, MODULE)
+    with open(logPath, 'rb') as f:
+        size = len(f.read())
+    jsonSize = 100 * len(json.dumps([RESULTS, WORDINFO, MODULE]))
+    assert size * 3 < jsonSize * 2
+
+
+def test_records_are_written_in_batches(logPath):
+    writer = ResultLogWriter(logPath, batchSize=3)
+    writer.append(results=RESULTS, timeStamp=1.0)
+    writer.append(results=[('new', 5)], timeStamp=2.0)
+    with ResultLogReader(logPath) as reader:
+        assert len(reader) == 0
+    writer.append(wordInfo=WORDINFO, timeStamp=3.0)
+    writer.append(module=MODULE, timeStamp=4.0)
+    with ResultLogReader(logPath) as reader:
+        assert [r.timeStamp for r in reader] == [1.0, 2.0, 3.0]
+        assert reader[1].results == [('new', 5)]
+    writer.close()
+    with ResultLogReader(logPath) as reader:
+        assert len(reader) == 4 and reader[3].module == MODULE
+
+
+def test_records_are_encoded_when_appended(logPath):
+    with ResultLogWriter(logPath) as writer:
+        results = [('hello', 1)]
+        writer.append(results=results, timeStamp=1.0)
+        results[0] = ('changed', 2)
+    with ResultLogReader(logPath) as reader:
+        assert reader[0].results == [('hello', 1)]
+
+
+def test_timer_writes_queued_records(logPath, timer, clock):
+    writer = ResultLogWriter(logPath, timerService=TimerService(timer, clock), flushDelay=0.5)
+    writer.append(results=RESULTS, timeStamp=1.0)
+    writer.append(timeStamp=2.0)
+    with ResultLogReader(logPath) as reader:
+        assert len(reader) == 0
+    timer.advance(0.5)
+    with ResultLogReader(logPath) as reader:
+        assert len(reader) == 2
+    writer.close()
+
+
+def test_not_a_log(logPath):
+    with open(logPath, 'wb') as f:
+        f.write(b'something else')
+    with pytest.raises(ResultLogError):
+        ResultLogReader(logPath)
+    with pytest.raises(ResultLogError):
+        ResultLogWriter(logPath)
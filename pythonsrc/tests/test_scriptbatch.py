@@ -0,0 +1,68 @@
+"""tests for batched execScript
+"""
+#pylint:disable=C0116, W0621
+import pytest
+from scriptbatch import execScriptBatch, makeBatches, ScriptBatchError
+
+
+class FakeExecScript:
+    """records the scripts; fails with a NatSpeak style message on failLine"""
+    def __init__(self, failLine=None, error=RuntimeError, action='executing'):
+        self.scripts = []
+        self.failLine = failLine
+        self.error = error
+        self.action = action
+
+    def __call__(self, script):
+        self.scripts.append(script)
+        if self.failLine is not None and len(self.scripts) == 2:
+            raise self.error(f'Error 5 {self.action} script {script.decode()} (line {self.failLine})')
+
+
+def test_statements_are_joined():
+    execScript = FakeExecScript()
+    calls = execScriptBatch(['SendSystemKeys "{Ctrl+c}"', '', b'Wait 100',
+                             'If 1 Then\r\n  Beep\r\nEnd If'], execScript=execScript)
+    assert calls == 1
+    assert execScript.scripts == [b'SendSystemKeys "{Ctrl+c}"\nWait 100\nIf 1 Then\n  Beep\nEnd If']
+
+
+def test_batches_keep_the_limits():
+    statements = [f'Wait {i}' for i in range(7)]
+    batches = makeBatches(statements, maxStatements=3)
+    assert [indices for _, indices, _ in batches] == [(0, 1, 2), (3, 4, 5), (6,)]
+    batches = makeBatches(statements, maxBytes=14)
+    assert [script for script, _, _ in batches][:2] == [b'Wait 0\nWait 1', b'Wait 2\nWait 3']
+    assert makeBatches(['x' * 50], maxBytes=10)[0][1] == (0,)
+    with pytest.raises(ValueError):
+        makeBatches(['SendKeys "中"'])
+
+
+def test_errors_map_back_to_the_statement():
+    statements = ['Wait 1', 'Wait 2', 'Wait 3', 'If 1 Then\nBad\nEnd If', 'SendKeys "(line 4)"']
+    execScript = FakeExecScript(failLine=3)
+    with pytest.raises(ScriptBatchError) as info:
+        execScriptBatch(statements, maxStatements=3, execScript=execScript)
+    # the second batch is the If (lines 1-3) and SendKeys (line 4); the
+    # message holds the script, with its own '(line 4)'
+    assert info.value.index == 3
+    assert info.value.statement == statements[3]
+    assert info.value.executed == 3
+    assert isinstance(info.value.__cause__, RuntimeError)
+
+    class SyntaxError(Exception):     #pylint:disable=W0622
+        """like natlink.SyntaxError"""
+    execScript = FakeExecScript(failLine=4, error=SyntaxError, action='compiling')
+    with pytest.raises(ScriptBatchError) as info:
+        execScriptBatch(statements, maxStatements=3, execScript=execScript)
+    assert info.value.index == 4
+    assert info.value.executed == 3        # nothing of the second batch ran
+
+
+def test_only_natlink_syntax_errors_stop_the_whole_batch():
+    statements = ['Wait 1', 'Wait 2', 'Wait 3', 'Wait 4', 'Wait 5']
+    execScript = FakeExecScript(failLine=2, action='compiling')
+    with pytest.raises(ScriptBatchError) as info:
+        execScriptBatch(statements, maxStatements=3, execScript=execScript)
+    assert info.value.index == 4
+    assert info.value.executed == 4
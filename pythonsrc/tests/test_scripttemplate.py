@@ -0,0 +1,46 @@
+"""tests for script templates
+"""
+#pylint:disable=C0116, W0621
+import pytest
+from scripttemplate import ScriptTemplate, escapeString
+
+
+def test_render_encodes_once_and_splices_values():
+    template = ScriptTemplate('SendSystemKeys("$keys")')
+    assert template.parameters == {'keys'}
+    assert template.render(keys='{Ctrl+s}') == b'SendSystemKeys("{Ctrl+s}")'
+    assert template.render(keys='caf\xe9') == b'SendSystemKeys("caf\xe9")'
+    # a parameter may come back, ${name} and $$ work
+    template = ScriptTemplate('HeardWord "${word}s", "$word"\nx = "$$5"')
+    assert template.render(word='go') == b'HeardWord "gos", "go"\nx = "$5"'
+
+
+def test_quotes_are_doubled_in_strings():
+    template = ScriptTemplate('SendSystemKeys("$keys")')
+    assert template.render(keys='say "hi"') == b'SendSystemKeys("say ""hi""")'
+    assert escapeString('a"b') == 'a""b'
+    with pytest.raises(ValueError):
+        template.render(keys='two\nlines')
+    with pytest.raises(ValueError):
+        template.render(keys='€中')       # no Windows-1252 for the second
+
+
+def test_values_outside_strings():
+    template = ScriptTemplate('SetMousePosition $mode, $x, $y')
+    assert template.render(mode=0, x=100, y=-20) == b'SetMousePosition 0, 100, -20'
+    with pytest.raises(ValueError):
+        template.render(mode=0, x='1: Beep', y=0)
+    with pytest.raises(TypeError):
+        template.render(mode=0, x=[1], y=0)
+    with pytest.raises(KeyError):
+        template.render(mode=0, x=1)
+
+
+def test_bad_scripts_fail_when_made():
+    with pytest.raises(ValueError):
+        ScriptTemplate('SendKeys "$keys')
+    with pytest.raises(ValueError):
+        ScriptTemplate('SendKeys "中$keys"')
+    # quotes doubled inside a string do not end it
+    template = ScriptTemplate('MsgBoxConfirm "a ""$word"" b"')
+    assert template.render(word='x"y') == b'MsgBoxConfirm "a ""x""y"" b"'
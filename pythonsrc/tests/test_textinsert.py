@@ -0,0 +1,154 @@
+"""tests for text insertion by typing or pasting
+"""
+#pylint:disable=C0116, W0621
+import sys
+import types
+import pytest
+from textinsert import TextInserter, ClipboardError, Win32Clipboard, CF_UNICODETEXT
+
+
+class FakeClipboard:
+    def __init__(self, text='saved'):
+        self.text = text
+        self.sequence = 1
+        self.fail = False
+        self.textOnly = True
+
+    def getText(self):
+        return self.text
+
+    def canRestore(self):
+        return self.textOnly
+
+    def setText(self, text):
+        if self.fail:
+            raise ClipboardError('locked')
+        self.text = text
+        self.sequence += 1
+
+    def sequenceNumber(self):
+        return self.sequence
+
+
+@pytest.fixture
+def played():
+    return []
+
+
+@pytest.fixture
+def clipboard():
+    return FakeClipboard()
+
+
+@pytest.fixture
+def inserter(played, clipboard):
+    return TextInserter(threshold=10, playString=played.append,
+                        getCurrentModule=lambda: (r'C:\Program Files\App\Notepad.exe', 'title', 0),
+                        clipboard=clipboard, sleep=lambda seconds: None)
+
+
+def test_short_text_is_typed(inserter, played, clipboard):
+    assert inserter.insertText('short') == 'type'
+    assert played == ['short'] and clipboard.text == 'saved'
+
+
+def test_typed_braces_are_escaped(inserter, played):
+    assert inserter.insertText('f{x}') == 'type'
+    assert played == ['f{{}x{}}']
+
+
+def test_long_text_is_pasted_and_clipboard_restored(inserter, played, clipboard):
+    assert inserter.insertText('a long piece of text') == 'paste'
+    assert played == ['{Ctrl+v}']
+    assert clipboard.text == 'saved'
+
+
+def test_clipboard_changed_by_someone_else_is_kept(inserter, clipboard):
+    def sleep(seconds):
+        clipboard.setText('copied by the user')
+    inserter._sleep = sleep     #pylint:disable=W0212
+    inserter.insertText('a long piece of text')
+    assert clipboard.text == 'copied by the user'
+
+
+def test_policies(inserter, played, clipboard):
+    assert inserter.currentApp() == 'notepad'
+    inserter.setPolicy('Notepad', 'type')
+    assert inserter.insertText('a long piece of text') == 'type'
+    inserter.setPolicy('notepad', 'paste')
+    assert inserter.chooseMethod('x') == 'paste'
+    inserter.setPolicy('notepad', 3)
+    assert inserter.chooseMethod('xyz') == 'paste'
+    inserter.setPolicy('notepad', None)
+    assert inserter.chooseMethod('xyz') == 'type'
+    assert inserter.chooseMethod('a long piece of text', 'other') == 'paste'
+    with pytest.raises(ValueError):
+        inserter.setPolicy('notepad', 'fast')
+
+
+def test_failing_clipboard_types(inserter, played, clipboard):
+    clipboard.fail = True
+    assert inserter.insertText('a long piece of text') == 'type'
+    assert played == ['a long piece of text']
+    assert inserter.getStats() == {'typed': 1, 'pasted': 0, 'pasteFailures': 1}
+
+
+def test_clipboard_with_other_data_is_left_alone(inserter, played, clipboard):
+    clipboard.textOnly = False
+    assert inserter.insertText('a long piece of text') == 'type'
+    assert played == ['a long piece of text']
+    assert clipboard.text == 'saved' and clipboard.sequence == 1
+    assert inserter.getStats()['pasteFailures'] == 0
+
+
+def test_empty_clipboard_is_emptied_again(inserter, clipboard):
+    clipboard.text = None
+    assert inserter.insertText('ein längerer Text, ÄÖÜ') == 'paste'
+    assert clipboard.text is None
+
+
+class FakeWin32Clipboard(types.ModuleType):
+    """stands in for the win32clipboard module, the data is {format: value}"""
+    def __init__(self, data):
+        super().__init__('win32clipboard')
+        self.data = dict(data)
+        self.isOpen = False
+
+    def OpenClipboard(self):
+        self.isOpen = True
+
+    def CloseClipboard(self):
+        self.isOpen = False
+
+    def EmptyClipboard(self):
+        self.data = {}
+
+    def SetClipboardText(self, text, clipFormat):
+        self.data[clipFormat] = text
+
+    def IsClipboardFormatAvailable(self, clipFormat):
+        return clipFormat in self.data
+
+    def GetClipboardData(self, clipFormat):
+        return self.data[clipFormat]
+
+    def EnumClipboardFormats(self, clipFormat):
+        formats = list(self.data)
+        if clipFormat == 0:
+            return formats[0] if formats else 0
+        index = formats.index(clipFormat) + 1
+        return formats[index] if index < len(formats) else 0
+
+
+def test_win32_clipboard(monkeypatch):
+    module = FakeWin32Clipboard({CF_UNICODETEXT: 'grüße', 1: b'gr??e'})
+    monkeypatch.setitem(sys.modules, 'win32clipboard', module)
+    clipboard = Win32Clipboard(sleep=lambda seconds: None)
+    assert clipboard.getText() == 'grüße' and not module.isOpen
+    assert clipboard.canRestore()
+    module.data[2] = 'a bitmap'
+    assert not clipboard.canRestore()
+    clipboard.setText(None)
+    assert clipboard.getText() is None and clipboard.canRestore()
+    clipboard.setText('€')
+    assert module.data == {CF_UNICODETEXT: '€'}
@@ -0,0 +1,85 @@
+"""tests for the timer service
+"""
+#pylint:disable=C0116, W0621
+import pytest
+from timerservice import TimerService
+
+
+@pytest.fixture
+def service(timer, clock):
+    return TimerService(setTimer=timer, clock=clock)
+
+
+def test_one_shot_and_periodic(timer, service):
+    got = []
+    service.callLater(0.25, lambda: got.append('once'))
+    service.callEvery(0.1, lambda: got.append('tick'), name='tick')
+    assert timer.milliseconds == 100
+    timer.advance(0.45)
+    assert got == ['tick', 'tick', 'once', 'tick', 'tick']
+    assert service.timerNames() == ['tick']
+    assert service.cancel('tick')
+    assert timer.callback is None
+    assert not service.cancel('tick')
+
+
+def test_armed_for_next_deadline_only(timer, service):
+    service.callEvery(1.0, lambda: None, name='slow')
+    service.callLater(0.2, lambda: None, name='soon')
+    assert timer.milliseconds == 200
+    timer.advance(0.2)
+    assert timer.milliseconds == 800
+
+
+def test_catch_up_policies(timer, clock, service):
+    got = []
+    service.callEvery(0.1, lambda: got.append('skip'), name='skip')
+    service.callEvery(0.1, lambda: got.append('burst'), name='burst', catchUp='burst')
+    service.callEvery(0.1, lambda: got.append('delay'), name='delay', catchUp='delay')
+    # NatSpeak was busy: the first tick comes 0.35 s late
+    clock.now += 0.45
+    timer.callback()
+    assert got.count('skip') == 1 and got.count('burst') == 4 and got.count('delay') == 1
+    assert service.getTimer('skip').deadline == pytest.approx(100.5)
+    assert service.getTimer('delay').deadline == pytest.approx(100.55)
+    stats = service.getStats(reset=True)
+    assert stats['skip']['missed'] == 3 and stats['skip']['maxLate'] == pytest.approx(350)
+    assert service.getStats()['skip']['runs'] == 0
+
+
+def test_coalescing(timer, clock, service):
+    got = []
+    service.callLater(0.1, lambda: got.append('exact'))
+    service.callLater(0.12, lambda: got.append('lazy'), coalesce=0.05)
+    service.callLater(0.3, lambda: got.append('later'), coalesce=0.05)
+    clock.now += 0.1
+    timer.callback()
+    assert got == ['exact', 'lazy']
+
+
+def test_timer_slot_and_errors(timer, service, capsys):
+    slot = service.timerSlot('legacy')
+    slot(lambda: 1 / 0, 50)
+    assert service.getTimer('legacy').interval == 0.05
+    timer.advance(0.05)
+    assert 'ZeroDivisionError' in capsys.readouterr().err
+    slot(None, 0)
+    assert service.getTimer('legacy') is None
+    with pytest.raises(ValueError):
+        service.callEvery(0, print)
+    with pytest.raises(ValueError):
+        service.callEvery(1, print, catchUp='never')
+
+
+def test_callback_changes_timers(timer, service):
+    got = []
+
+    def first():
+        got.append('first')
+        service.cancel('second')
+        service.callLater(0.05, lambda: got.append('third'))
+
+    service.callLater(0.1, first)
+    service.callLater(0.1, lambda: got.append('second'), name='second')
+    timer.advance(0.2)
+    assert got == ['first', 'third']
@@ -0,0 +1,80 @@
+"""tests for the utterance archive
+"""
+#pylint:disable=C0116, W0621
+import pytest
+from utterancearchive import UtteranceArchive, ArchiveError
+from conftest import FakeResObj
+
+
+@pytest.fixture
+def archivePath(tmp_path):
+    return str(tmp_path / 'utterances.nla')
+
+
+def test_record_and_lookup(archivePath):
+    with UtteranceArchive(archivePath, slotCount=4, slotSize=1024) as archive:
+        uttId = archive.record(FakeResObj(['hello', 'world'], b'\x01\x02' * 10), timeStamp=100.0)
+        archive.flush()
+        utt = archive.getUtterance(uttId)
+        assert utt.words == ['hello', 'world']
+        assert utt.rules == [1, 1]
+        assert utt.timings == [(0, 90), (100, 190)]
+        assert utt.wave == b'\x01\x02' * 10
+        assert not utt.truncated
+        assert archive.getUtterance(uttId + 1) is None
+
+
+def test_ring_overwrites_oldest(archivePath):
+    with UtteranceArchive(archivePath, slotCount=3, slotSize=512) as archive:
+        ids = [archive.record(FakeResObj([f'word{i}']), timeStamp=float(i)) for i in range(5)]
+        archive.flush()
+        assert archive.utteranceIds() == ids[2:]
+        assert archive.getUtterance(ids[0]) is None
+        assert [u.words for u in archive.recent(2)] == [['word4'], ['word3']]
+        assert [u.utteranceId for u in archive.findByTime(3.0)] == ids[3:]
+        assert [u.utteranceId for u in archive.findByTime(2.0, 4.0)] == ids[2:4]
+
+
+def test_truncated_audio(archivePath):
+    with UtteranceArchive(archivePath, slotCount=2, slotSize=256) as archive:
+        uttId = archive.record(FakeResObj(['long'], b'x' * 1000))
+        archive.flush()
+        utt = archive.getUtterance(uttId)
+        assert utt.truncated
+        assert 0 < len(utt.wave) < 1000
+
+
+def test_reopen_rebuilds_index(archivePath):
+    with UtteranceArchive(archivePath, slotCount=3, slotSize=512) as archive:
+        ids = [archive.record(FakeResObj([f'word{i}']), timeStamp=float(i)) for i in range(4)]
+    with UtteranceArchive(archivePath) as archive:
+        assert archive.utteranceIds() == ids[1:]
+        newId = archive.record(FakeResObj(['again']), timeStamp=10.0)
+        archive.flush()
+        assert newId == ids[-1] + 1
+        assert archive.getUtterance(ids[1]) is None
+    with pytest.raises(ArchiveError):
+        UtteranceArchive(archivePath, slotCount=5)
+
+
+def test_missing_audio_only(archivePath):
+    class BrokenResObj(FakeResObj):
+        def getWave(self):
+            raise RuntimeError('the results object is no longer valid')
+
+    with UtteranceArchive(archivePath, slotCount=2, slotSize=256) as archive:
+        with pytest.raises(RuntimeError):
+            archive.record(BrokenResObj(['hello']))
+        uttId = archive.record(FakeResObj(['hello']))
+        archive.flush()
+        assert archive.getUtterance(uttId).wave == b''
+
+
+def test_write_error_raised_by_flush(archivePath):
+    with UtteranceArchive(archivePath, slotCount=2, slotSize=256) as archive:
+        badId = archive.recordData([object()], [1], [], b'')
+        with pytest.raises(ArchiveError, match=f'utterance {badId}'):
+            archive.flush()
+        goodId = archive.recordData(['fine'], [1], [], b'')
+        archive.flush()
+        assert archive.getUtterance(goodId).words == ['fine']
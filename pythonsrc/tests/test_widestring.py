@@ -0,0 +1,76 @@
+"""tests for the UTF-16 conversion of NatlinkSource/WideString.cpp
+
+The file is built on its own as the module _widestring_test (with
+WIDESTRING_TEST_MODULE defined); the tests are skipped when there is no C++
+compiler, and on Windows, where the module is built with natlink itself.
+"""
+#pylint:disable=C0116, W0621
+import importlib.machinery
+import importlib.util
+import shutil
+import subprocess
+import sys
+import sysconfig
+from pathlib import Path
+
+import pytest
+
+SOURCE = Path(__file__).resolve().parents[2] / 'NatlinkSource' / 'WideString.cpp'
+
+# SRPHRASE buffers as ISRResBasic::PhraseGet and PhraseFinish give them
+HELLO_WORLD = bytes.fromhex(
+    '2c00000014000000b1040000680065006c006c006f000000140000001b05000077006f0072006c0064000000')
+LATIN = bytes.fromhex(
+    '54000000140000002b4e0000630061006600e900000000001c000000090000005c004300610070005c0063'
+    '00610070000000000014000000295100006e006100ef007600650000000c000000844e0000ac200000')
+SURROGATES = bytes.fromhex(
+    '2400000010000000317500003dd800de00000000100000003275000000d8780000000000')
+
+
+@pytest.fixture(scope='module')
+def widestring(tmp_path_factory):
+    compiler = shutil.which('c++') or shutil.which('g++') or shutil.which('clang++')
+    if sys.platform == 'win32' or compiler is None:
+        pytest.skip('needs a C++ compiler (not on Windows)')
+    target = tmp_path_factory.mktemp('widestring') / (
+        '_widestring_test' + sysconfig.get_config_var('EXT_SUFFIX'))
+    command = [compiler, '-std=c++17', '-shared', '-fPIC', '-O1', '-DWIDESTRING_TEST_MODULE',
+               '-DPY_SSIZE_T_CLEAN', '-I' + sysconfig.get_paths()['include'],
+               str(SOURCE), '-o', str(target)]
+    if sys.platform == 'darwin':
+        command[1:1] = ['-undefined', 'dynamic_lookup']
+    result = subprocess.run(command, capture_output=True, text=True, check=False)
+    if result.returncode:
+        pytest.fail(f'building WideString.cpp failed:\n{result.stderr}')
+    loader = importlib.machinery.ExtensionFileLoader('_widestring_test', str(target))
+    spec = importlib.util.spec_from_file_location('_widestring_test', str(target), loader=loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def test_strings(widestring):
+    for text in ['', 'hello', 'café', '€ 5', 'Ünïcödé \\Cap', '中文', '😀 ok']:
+        assert widestring.stringFromUtf16(text.encode('utf-16-le')) == text
+    # a surrogate without its other half, like WideCharToMultiByte
+    assert widestring.stringFromUtf16(b'a\x00\x00\xd8b\x00') == 'a�b'
+    # the string ends at the NUL
+    assert widestring.stringFromUtf16('ab\0cd'.encode('utf-16-le')) == 'ab'
+
+
+def test_recorded_phrases(widestring):
+    assert widestring.wordsFromPhrase(HELLO_WORLD) == ['hello', 'world']
+    assert widestring.wordsFromPhrase(LATIN) == ['café', '\\Cap\\cap', 'naïve', '€']
+    assert widestring.wordsFromPhrase(SURROGATES) == ['😀', '�x']
+    assert widestring.wordsFromPhrase(b'\x04\x00\x00\x00') == []
+
+
+def test_broken_phrases_end_the_list(widestring):
+    # a word with size 0, and a word larger than the phrase
+    zeroSize = HELLO_WORLD[:24] + b'\x00' * 20
+    assert widestring.wordsFromPhrase(zeroSize) == ['hello']
+    tooLarge = HELLO_WORLD[:24] + b'\xff\x00\x00\x00' + HELLO_WORLD[28:]
+    assert widestring.wordsFromPhrase(tooLarge) == ['hello']
+    # a word without a NUL ends at its size
+    noNul = bytes.fromhex('10000000' '0c000000' '01000000' '68006900')
+    assert widestring.wordsFromPhrase(noNul) == ['hi']
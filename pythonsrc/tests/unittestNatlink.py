@@ -55,6 +55,8 @@
 #   - added testParser, testGramimar, testDictGram, testSelectGram
 #pylint:disable=C0209, R0904, R0915, W0612, C0321, W0702
 import sys
+import array
+import threading
 import unittest
 import os
 import os.path
@@ -415,6 +417,15 @@ class UnittestNatlink(unittest.TestCase):
             t = doSleep or 0.1
         time.sleep(t)
 
+    def pumpUntil(self, condition, timeout=5):
+        """handle the messages of this thread until condition() is true, or timeout seconds
+        """
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            win32gui.PumpWaitingMessages()
+            time.sleep(0.01)
+        return condition()
+
 
     #---------------------------------------------------------------------------
     # These test should be run before we call natConnect (now in unittestPrePost.py)
@@ -1139,6 +1150,217 @@ class UnittestNatlink(unittest.TestCase):
         testCommandRecognition(['mimic', 'two', 'green'], shouldWork=1, testGram=testGram)  
 
 
+    #---------------------------------------------------------------------------
+
+    def testResultsFilterAfterSharedResults(self):
+        """test setResultsFilter with a winning grammar, when another allResults
+        grammar gets its results synchronously first
+
+        The synchronous grammar makes the shared ResObj of the recognition, the
+        filtered grammar must still know which grammar won.
+        """
+        class TestGrammar(GrammarBase):
+
+            def __init__(self, gramSpec, allResults):
+                GrammarBase.__init__(self)
+                self.gramSpec = gramSpec
+                self.allResults = allResults
+                self.recogType = None
+
+            def initialize(self):
+                self.load(self.gramSpec, allResults=self.allResults)
+                self.activateAll()
+
+            def gotBegin(self,moduleInfo):
+                self.recogType = None
+
+            def gotResultsObject(self,recogType,resObj):
+                self.recogType = recogType
+
+        self.log("test resultsFilterAfterSharedResults", 1)
+        winnerGram = TestGrammar('<winner> exported = filter winner;', 0)
+        otherGram = TestGrammar('<other> exported = filter other;', 0)
+        syncGram = TestGrammar('<sync> exported = filter sync;', 1)
+        filterGram = TestGrammar('<filtered> exported = filter filtered;', 1)
+        grams = [winnerGram, otherGram, syncGram, filterGram]
+        try:
+            for gram in grams:
+                gram.initialize()
+            filterGram.gramObj.setResultsFilter('other', [winnerGram.gramObj])
+
+            natlink.recognitionMimic(['filter', 'winner'])
+            self.wait()
+            self.assertEqual('other', syncGram.recogType, 'synchronous grammar, winner')
+            self.assertEqual('other', filterGram.recogType, 'filtered grammar, winner')
+
+            natlink.recognitionMimic(['filter', 'other'])
+            self.wait()
+            self.assertEqual('other', syncGram.recogType, 'synchronous grammar, other')
+            self.assertEqual(None, filterGram.recogType, 'filtered grammar, other')
+
+            # the winner of the previous recognition does not stick
+            natlink.recognitionMimic(['filter', 'sync'])
+            self.wait()
+            self.assertEqual('self', syncGram.recogType, 'synchronous grammar, sync')
+            self.assertEqual(None, filterGram.recogType, 'filtered grammar, sync')
+        finally:
+            for gram in grams:
+                gram.unload()
+
+
+    #---------------------------------------------------------------------------
+
+    def testAlternates(self):
+        """test ResObj.alternates against getResults with increasing choices
+        """
+        class TestGrammar(GrammarBase):
+
+            gramSpec = """
+                <start> exported = alternates (one | two | three);
+            """
+            def initialize(self):
+                self.load(self.gramSpec, allResults=1)
+                self.activateAll()
+                self.alternates = self.limited = self.choices = None
+
+            def gotResultsObject(self,recogType,resObj):
+                self.alternates = resObj.alternates()
+                self.limited = resObj.alternates(1)
+                self.choices = []
+                try:
+                    while True:
+                        self.choices.append(resObj.getResults(len(self.choices)))
+                except natlink.OutOfRange:
+                    pass
+
+        self.log("test alternates", 1)
+        testGram = TestGrammar()
+        testGram.initialize()
+        try:
+            natlink.recognitionMimic(['alternates', 'two'])
+            self.wait()
+            self.assertEqual(testGram.choices, testGram.alternates, 'alternates and getResults')
+            self.assertEqual(['alternates', 'two'], [w for w, _ in testGram.alternates[0]],
+                             'first alternate is the recognition')
+            self.assertEqual(testGram.alternates[:1], testGram.limited, 'alternates(1)')
+        finally:
+            testGram.unload()
+
+    #---------------------------------------------------------------------------
+
+    def testPlayEventsBuffer(self):
+        """test playEvents with a buffer of integers, like with a list of tuples
+        """
+        self.log("test playEvents with a buffer", 1)
+        if DNSVersion >= 16:
+            self.log("playEvents is disabled for Dragon 16 and later")
+            return
+        testForException = self.doTestForException
+        vkA, vkB = 0x41, 0x42
+        self.clearDragonPad()
+        natlink.playEvents([(0x100, vkA, 1), (0x101, vkA, 1)])
+        natlink.playEvents(array.array('I', [0x100, vkB, 1, 0x101, vkB, 1]))
+        self.doTestWindowContents('ab', 'playEvents with a list and a buffer')
+        testForException(TypeError, "natlink.playEvents(array.array('I', [0x100, 0x41]))")
+        testForException(TypeError, "natlink.playEvents(array.array('d', [0.0, 0.0, 0.0]))")
+
+    #---------------------------------------------------------------------------
+
+    def testExecScriptAsync(self):
+        """test _execScriptAsync with setExecutionCallback, and the futures of execScriptAsync
+        """
+        self.log("test execScriptAsync", 1)
+        testForException = self.doTestForException
+        events = []
+
+        def gotExecution(clientCode, event, code, line):
+            events.append((clientCode, event))
+
+        testForException(natlink.NatError, "natlink._execScriptAsync(b'Wait 1')")
+        natlink.setExecutionCallback(gotExecution)
+        try:
+            clientCode = natlink._execScriptAsync(b'Wait 100')
+            self.assertTrue(self.pumpUntil(lambda: (clientCode, 'done') in events),
+                            'the execution callback reports the script done')
+            testForException(natlink.SyntaxError, "natlink._execScriptAsync(b'NoSuchCommand 1')")
+        finally:
+            natlink.setExecutionCallback(None)
+
+        future = natlink.execScriptAsync('Wait 100', timeout=10)
+        self.assertTrue(self.pumpUntil(future.done), 'the future of execScriptAsync is done')
+        self.assertEqual(None, future.result(0), 'result of execScriptAsync')
+
+    #---------------------------------------------------------------------------
+
+    def testPostWakeup(self):
+        """test postWakeup from this thread and from another thread
+        """
+        self.log("test postWakeup", 1)
+        testForException = self.doTestForException
+        wakeups = []
+        testForException(natlink.NatError, "natlink.postWakeup()")
+        natlink.setWakeupCallback(lambda: wakeups.append(threading.get_ident()))
+        try:
+            self.assertEqual(1, natlink.postWakeup(), 'first postWakeup posts')
+            self.assertEqual(0, natlink.postWakeup(), 'second postWakeup does not')
+            self.assertTrue(self.pumpUntil(lambda: wakeups), 'the wakeup callback runs')
+            self.wait()
+            win32gui.PumpWaitingMessages()
+            self.assertEqual([threading.get_ident()], wakeups, 'one wakeup, on this thread')
+
+            thread = threading.Thread(target=natlink.postWakeup)
+            thread.start()
+            thread.join()
+            self.assertTrue(self.pumpUntil(lambda: len(wakeups) == 2),
+                            'a wakeup posted from another thread')
+            self.assertEqual(threading.get_ident(), wakeups[1], 'runs on this thread')
+        finally:
+            natlink.setWakeupCallback(None)
+
+    #---------------------------------------------------------------------------
+
+    def testCallbackStats(self):
+        """test getCallbackStats after a recognition, and reset
+        """
+        class TestGrammar(GrammarBase):
+
+            gramSpec = """
+                <start> exported = callback statistics;
+            """
+            def initialize(self):
+                self.load(self.gramSpec)
+                self.activateAll()
+                self.results = 0
+
+            def gotResults_start(self, words, fullResults):
+                self.results += 1
+
+        self.log("test getCallbackStats", 1)
+        testGram = TestGrammar()
+        testGram.initialize()
+        try:
+            natlink.getCallbackStats(1)
+            natlink.recognitionMimic(['callback', 'statistics'])
+            self.wait()
+            self.assertEqual(1, testGram.results, 'the grammar got its results')
+            stats = natlink.getCallbackStats(1)
+            self.assertTrue(stats['all']['callback']['count'] >= 1, 'callbacks of all grammars')
+            gramStats = stats[testGram.gramObj]
+            self.assertEqual(['callback', 'queue', 'sink', 'total'], sorted(gramStats),
+                             'stages of a callback')
+            self.assertEqual(1, gramStats['callback']['count'], 'one callback of the grammar')
+            for key in ('min', 'max', 'mean', 'p50', 'p90', 'p99', 'p999'):
+                self.assertTrue(key in gramStats['total'], f'{key} in the statistics')
+            self.assertTrue(gramStats['total']['max'] >= gramStats['callback']['min'],
+                            'the total includes the callback')
+            stats = natlink.getCallbackStats()
+            self.assertTrue(testGram.gramObj not in stats or
+                            stats[testGram.gramObj]['callback']['count'] == 0,
+                            'the statistics were reset')
+        finally:
+            testGram.unload()
+
+
     #---------------------------------------------------------------------------
        
     def tttestRecognitionMimic(self):